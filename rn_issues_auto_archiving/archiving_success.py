@@ -8,6 +8,34 @@ from shared.send_comment import send_comment
 from issue_processor.git_service_client import GitlabClient, GithubClient
 
 
+def send_archived_success_comment(
+    issue_info: IssueInfo, token: str, issue_repository: str
+) -> None:
+    http_header: dict[str, str]
+    if issue_info.platform_type == GithubClient.name:
+        http_header = GithubClient.create_http_header(token=token)
+    elif issue_info.platform_type == GitlabClient.name:
+        http_header = GitlabClient.create_http_header(token=token)
+    else:
+        raise ValueError(
+            Log.unknown_platform_type.format(platform_type=issue_info.platform_type)
+        )
+    try:
+        send_comment(
+            comment_url=issue_info.links.comment_url,
+            http_header=http_header,
+            message=Log.issue_archived_success.format(
+                issue_id=issue_info.issue_id, issue_repository=issue_repository
+            ),
+        )
+    except Exception as exc:
+        # 归档成功评论发送失败并不重要，失败就失败了
+        # 如果是一开始流水线就有权限或者是链路问题，
+        # 那么前面的流程就会报错
+        # 也不会执行到这里
+        print(Log.send_comment_failed.format(exc=str(exc)))
+
+
 def main():
     if should_run_in_local():
         print(Log.non_platform_action_env)
@@ -32,29 +60,7 @@ def main():
     if not issue_info.should_archived_success():
         return
 
-    http_header: dict[str, str]
-    if issue_info.platform_type == GithubClient.name:
-        http_header = GithubClient.create_http_header(token=token)
-    elif issue_info.platform_type == GitlabClient.name:
-        http_header = GitlabClient.create_http_header(token=token)
-    else:
-        raise ValueError(
-            Log.unknown_platform_type.format(platform_type=issue_info.platform_type)
-        )
-    try:
-        send_comment(
-            comment_url=issue_info.links.comment_url,
-            http_header=http_header,
-            message=Log.issue_archived_success.format(
-                issue_id=issue_info.issue_id, issue_repository=issue_repository
-            ),
-        )
-    except Exception as exc:
-        # 归档成功评论发送失败并不重要，失败就失败了
-        # 如果是一开始流水线就有权限或者是链路问题，
-        # 那么前面的流程就会报错
-        # 也不会执行到这里
-        print(Log.send_comment_failed.format(exc=str(exc)))
+    send_archived_success_comment(issue_info, token, issue_repository)
     print(Log.job_done)
 
 
@@ -1,5 +1,38 @@
+import os
+
+from auto_archiving.archive_index import (
+    ArchiveIndex,
+    DEFAULT_TABLE_SEPARATOR,
+    get_record_key,
+)
+from shared.atomic_write import atomic_write_text
 from shared.json_config import IssueType, ProcessingActionJson
 from shared.log import Log
+from shared.metrics import timed
+
+TAIL_BLOCK_SIZE = 8192
+"""从文件末尾向前读取时每次读取的字节数"""
+
+
+def read_last_line(path: str, block_size: int = TAIL_BLOCK_SIZE) -> tuple[int, bytes]:
+    """从文件末尾逐块向前读取，直到读到最后一个非空行的开头，
+    返回 (最后一个非空行开头的字节偏移, 从该偏移到文件末尾的内容) ，
+    整个文件都没有非空行时返回整个文件的内容"""
+    with open(path, "rb") as file:
+        position = file.seek(0, os.SEEK_END)
+        buffer = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            file.seek(position)
+            buffer = file.read(read_size) + buffer
+            # 换行符之后一定是完整的utf-8字符，可以安全地解码
+            newline_index = buffer.rfind(b"\n")
+            while newline_index != -1:
+                if buffer[newline_index + 1 :].decode("utf-8").strip():
+                    return position + newline_index + 1, buffer[newline_index + 1 :]
+                newline_index = buffer.rfind(b"\n", 0, newline_index)
+        return 0, buffer
 
 
 class ArchiveDocument:
@@ -8,29 +41,97 @@ class ArchiveDocument:
         self.__lines: list[str] = []
         self.__new_lines: list[str] = []
         self.__reverse_lines: list[str] = []
-        self.__lines_set: set[str] = set()
+        self.__index: ArchiveIndex = ArchiveIndex()
+        self.__loaded_size: int = -1
+        """读取时归档文件的字节数，为-1时无法使用增量写入"""
+        self.__has_replaced_line: bool = False
+        self.__table_separator: str = DEFAULT_TABLE_SEPARATOR
+        self.__is_tail_mode: bool = False
+        """为True时__lines中只有文件末尾的最后一个非空行及其后面的空行"""
+        self.__is_index_loaded: bool = False
 
-    def file_load(self, path: str):
+    @timed()
+    def file_load(self, path: str, table_separator: str = DEFAULT_TABLE_SEPARATOR):
         print(
             Log.getting_something_from.format(
                 another=path, something=Log.archive_document_content
             )
         )
         self.__path = path
-        with open(path, "r", encoding="utf-8") as file:
-            self.__lines = file.readlines()
-            self.__reverse_lines = self.__lines[::-1]
-            self.__lines_set = set(self.__lines)
+        self.__table_separator = table_separator
+        self.__load_full()
         print(
             Log.getting_something_from_success.format(
                 another=path, something=Log.archive_document_content
             )
         )
 
+    @timed()
+    def file_load_tail(
+        self, path: str, table_separator: str = DEFAULT_TABLE_SEPARATOR
+    ) -> None:
+        """只读取文件末尾的最后一个非空行（即表格的最后一行），
+        追加新行时内存占用和耗时与归档文件长度无关。\n
+        只有在需要全部内容时（例如替换模式、索引已过期时的查重）才会读取整个文件
+        """
+        print(
+            Log.getting_something_from.format(
+                another=path, something=Log.archive_document_tail
+            )
+        )
+        self.__path = path
+        self.__table_separator = table_separator
+        try:
+            offset, tail = read_last_line(path)
+            text = tail.decode("utf-8")
+        except UnicodeDecodeError:
+            text = "\r"
+        if "\r" in text or offset == 0:
+            # "\r\n"换行的文件无法按字节偏移写入，
+            # 文件只有一行时也没有必要只读取末尾
+            self.__load_full()
+        else:
+            self.__lines = text.splitlines(keepends=True)
+            self.__reverse_lines = self.__lines[::-1]
+            self.__loaded_size = offset + len(tail)
+            self.__has_replaced_line = False
+            self.__is_tail_mode = True
+            self.__index = ArchiveIndex(table_separator)
+            self.__is_index_loaded = self.__index.load_by_stat(path)
+        print(
+            Log.getting_something_from_success.format(
+                another=path, something=Log.archive_document_tail
+            )
+        )
+
+    def __load_full(self) -> None:
+        """读取整个归档文件，本次运行中添加的新行会被保留"""
+        path = self.__path
+        if self.__is_tail_mode:
+            print(Log.load_full_archive_document.format(path=path))
+        with open(path, "r", encoding="utf-8") as file:
+            self.__lines = file.readlines()
+            self.__reverse_lines = self.__lines[::-1]
+            # 文本模式会把"\r\n"转换成"\n"，
+            # 只有换行符全是"\n"时内存中的内容才能与文件字节一一对应
+            self.__loaded_size = -1
+            if file.newlines in (None, "\n"):
+                try:
+                    self.__loaded_size = os.fstat(file.fileno()).st_size
+                except (OSError, ValueError):
+                    pass
+        self.__has_replaced_line = False
+        self.__is_tail_mode = False
+        self.__index = ArchiveIndex(self.__table_separator)
+        self.__index.load(path, self.__lines)
+        self.__is_index_loaded = True
+
     def show_new_line(self) -> list[str]:
         return self.__new_lines.copy()
 
     def show_lines(self) -> list[str]:
+        if self.__is_tail_mode:
+            self.__load_full()
         return self.__lines.copy()
 
     def add_new_line(self, line: str) -> None:
@@ -47,7 +148,11 @@ class ArchiveDocument:
                 line_index=index,
             )
         )
+        if self.__lines[index] == line:
+            return
         self.__lines[index] = line
+        self.__index.replace_line(index, line)
+        self.__has_replaced_line = True
 
     def __get_table_last_line_index(self) -> int:
         # 后面的写入到归档文件函数会把归档序号+1，所以这里得0
@@ -75,6 +180,12 @@ class ArchiveDocument:
         return result
 
     def __get_last_table_number(self, table_separator: str) -> int:
+        # 一次运行中归档多个issue时（例如批量归档），
+        # 新行还没有写入__lines，归档序号需要接着最后一个新行递增
+        if len(self.__new_lines) != 0:
+            return self.__find_table_number_in_line(
+                self.__new_lines[-1], table_separator
+            )
         return self.__get_table_number_by_line_index(
             self.__get_table_last_line_index(), table_separator
         )
@@ -102,11 +213,12 @@ class ArchiveDocument:
         issue_repository: str,
         issue_id: int,
     ) -> bool:
-        sub_string = f"{issue_repository}#{issue_id}]"
-        for line in self.__lines_set:
-            if sub_string in line:
-                print(Log.issue_id_found_in_archive_record.format(issue_id=issue_id))
-                return True
+        if not self.__is_index_loaded:
+            # 索引已过期时需要读取整个文件来更新索引
+            self.__load_full()
+        if self.__index.find(issue_repository, issue_id) is not None:
+            print(Log.issue_id_found_in_archive_record.format(issue_id=issue_id))
+            return True
         print(Log.issue_id_not_found_in_archive_record.format(issue_id=issue_id))
         return False
 
@@ -120,19 +232,37 @@ class ArchiveDocument:
     def __find_line_index_by_issue_id(
         self, issue_id: int, issue_repository: str
     ) -> int:
-        """O(n)查询速度去根据记录中匹配issue_id的行号
+        """通过索引查询记录中匹配issue_id的行号
         查不到会返回 -1
         """
-        # 虽然这里是 O(n) 的查询速度
-        # 但是我相信归档文件不会有10万行的内容的
-        sub_string = f"{issue_repository}#{issue_id}"
-        for index, line in enumerate(self.__lines):
-            if sub_string in line:
-                print(Log.issue_id_found_in_archive_record.format(issue_id=issue_id))
-                return index
+        # 替换已有的行时需要重写整个文件
+        if self.__is_tail_mode:
+            self.__load_full()
+        record = self.__index.find(issue_repository, issue_id)
+        if record is not None and (
+            record[0] >= len(self.__lines)
+            or self.__index.parse_record_key(self.__lines[record[0]])
+            != get_record_key(issue_repository, issue_id)
+        ):
+            # 替换前确认索引指向的行确实是这条记录，避免替换掉错误的行
+            self.__index.rebuild(self.__lines)
+            record = self.__index.find(issue_repository, issue_id)
+        if record is not None:
+            print(Log.issue_id_found_in_archive_record.format(issue_id=issue_id))
+            return record[0]
         print(Log.issue_id_not_found_in_archive_record.format(issue_id=issue_id))
         return -1
 
+    def __find_new_line_index_by_issue_id(
+        self, issue_id: int, issue_repository: str
+    ) -> int:
+        """查询本次运行中新添加的行，查不到会返回 -1"""
+        key = get_record_key(issue_repository, issue_id)
+        for index, line in enumerate(self.__new_lines):
+            if ArchiveIndex.parse_record_key(line) == key:
+                return index
+        return -1
+
     def archive_issue(
         self,
         rjust_space_width: int,
@@ -157,6 +287,7 @@ class ArchiveDocument:
 
         table_id: int = 0
         line_index: int = -1
+        new_line_index: int = -1
         if (
             replace_mode
             and (
@@ -174,6 +305,24 @@ class ArchiveDocument:
             table_id = self.__find_table_number_in_line(
                 self.__lines[line_index], table_separator
             )
+        elif (
+            replace_mode
+            and (
+                new_line_index := self.__find_new_line_index_by_issue_id(
+                    issue_id, issue_repository
+                )
+            )
+            != -1
+        ):
+            # 同一次运行中已经归档过的issue（例如批量归档），替换掉之前添加的新行
+            print(
+                Log.replace_old_issue_record.format(
+                    issue_id=issue_id, issue_repository=issue_repository
+                )
+            )
+            table_id = self.__find_table_number_in_line(
+                self.__new_lines[new_line_index], table_separator
+            )
         else:
             table_id = self.__get_last_table_number(table_separator) + 1
 
@@ -204,17 +353,156 @@ class ArchiveDocument:
 
         if replace_mode and line_index != -1:
             self.__replace_line(line_index, new_content)
+        elif replace_mode and new_line_index != -1:
+            self.__new_lines[new_line_index] = new_content
         else:
             self.__add_line(new_content)
 
+    def find_record_line(self, issue_repository: str, issue_id: int) -> str | None:
+        """返回归档文件中这个issue的记录行（包括本次运行中添加的新行），
+        没有记录时返回None"""
+        new_line_index = self.__find_new_line_index_by_issue_id(
+            issue_id, issue_repository
+        )
+        if new_line_index != -1:
+            return self.__new_lines[new_line_index]
+        line_index = self.__find_line_index_by_issue_id(issue_id, issue_repository)
+        if line_index == -1:
+            return None
+        return self.__lines[line_index]
+
+    @staticmethod
+    def __replace_table_number_in_line(
+        line: str, table_id: int, table_separator: str
+    ) -> str:
+        start = line.find(table_separator)
+        end = line.find(table_separator, start + 1)
+        if start == -1 or end == -1 or not line[start + 1 : end].isdigit():
+            return line
+        return line[: start + 1] + str(table_id) + line[end:]
+
+    def apply_record_line(
+        self, issue_repository: str, issue_id: int, line: str
+    ) -> None:
+        """把另一份归档文件中已经格式化好的记录行写入这份归档文件（内存中），
+        已有这个issue的记录时替换并保留原来的归档序号，
+        否则追加到末尾并接着最后一行的归档序号递增"""
+        table_separator = self.__table_separator
+        line_index = self.__find_line_index_by_issue_id(issue_id, issue_repository)
+        if line_index != -1:
+            self.__replace_line(
+                line_index,
+                self.__replace_table_number_in_line(
+                    line,
+                    self.__find_table_number_in_line(
+                        self.__lines[line_index], table_separator
+                    ),
+                    table_separator,
+                ),
+            )
+            return
+        self.__add_line(
+            self.__replace_table_number_in_line(
+                line, self.__get_last_table_number(table_separator) + 1, table_separator
+            )
+        )
+
+    def __can_append(self) -> bool:
+        """替换模式修改了已有的行时只能重写整个文件，
+        读取后文件被其他程序修改过时也不能增量写入"""
+        if (
+            self.__has_replaced_line
+            or self.__loaded_size == -1
+            or len(self.__new_lines) == 0
+        ):
+            return False
+        try:
+            return os.stat(self.__path).st_size == self.__loaded_size
+        except OSError:
+            return False
+
+    def __write_from_offset(self, offset: int, content: bytes) -> None:
+        """只写入变化的内容：
+        写入位置在文件末尾时使用O_APPEND一次os.write追加，
+        否则（表格后面还有空行）seek到写入位置后覆盖写入
+        """
+        if offset == self.__loaded_size:
+            fd = os.open(
+                self.__path, os.O_WRONLY | os.O_APPEND | getattr(os, "O_BINARY", 0)
+            )
+            try:
+                written = 0
+                while written < len(content):
+                    written += os.write(fd, content[written:])
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            return
+        with open(self.__path, "r+b") as file:
+            file.seek(offset)
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def is_changed(self) -> bool:
+        return len(self.__new_lines) != 0 or self.__has_replaced_line
+
+    @timed()
     def save(self) -> None:
+        """增量写入只会在文件末尾追加内容，
+        需要重写整个文件时先写入临时文件再替换，
+        写入途中进程被终止也不会留下被截断的归档文件"""
+        if not self.is_changed():
+            print(Log.document_not_changed_skip_save)
+            return
         print(Log.write_content_to_document)
-        if not self.__lines[-1].endswith("\n"):
+        can_append = self.__can_append()
+        if self.__is_tail_mode and not can_append:
+            # 读取后文件被修改过，只能读取整个文件后重写
+            self.__load_full()
+            can_append = self.__can_append()
+        insert_index = self.__get_table_last_line_index() + 1
+        # 表格最后一行之后只可能是空行，新行插入后它们的位置会后移
+        original_tail = "".join(self.__lines[insert_index:])
+        missing_newline = not self.__lines[-1].endswith("\n")
+        if missing_newline:
             self.__lines[-1] += "\n"
+        # 末尾模式下__lines之前还有 (索引记录的总行数 - __lines行数) 行
+        line_offset = 0
+        if self.__is_tail_mode:
+            line_offset = self.__index.line_count - len(self.__lines)
         if len(self.__new_lines) != 0:
-            self.__lines.insert(
-                self.__get_table_last_line_index() + 1, *self.__new_lines
+            # list.insert只能插入一个元素，多个新行需要用切片插入
+            self.__lines[insert_index:insert_index] = self.__new_lines
+            self.__index.insert_lines(line_offset + insert_index, self.__new_lines)
+
+        if can_append:
+            print(Log.append_content_to_document)
+            # 从插入位置开始，文件内容变成 新行 + 原来的空行
+            content = "".join(self.__lines[insert_index:])
+            if missing_newline and original_tail == "":
+                # 最后一行补上的换行符在插入位置之前
+                content = "\n" + content
+            self.__write_from_offset(
+                self.__loaded_size - len(original_tail.encode("utf-8")),
+                content.encode("utf-8"),
             )
-        with open(self.__path, "w", encoding="utf-8") as file:
-            file.writelines(self.__lines)
+        else:
+            atomic_write_text(self.__path, "".join(self.__lines))
+        if self.__loaded_size != -1:
+            self.__loaded_size = os.stat(self.__path).st_size
+
+        if not self.__is_tail_mode:
+            self.__index.update_content(self.__lines)
+            self.__index.dump(self.__path)
+        elif self.__is_index_loaded:
+            # 不重新计算整个文件的sha256，写入的耗时与归档文件长度无关
+            self.__index.update_line_count(line_offset + len(self.__lines))
+            self.__index.dump(self.__path)
+        # 末尾模式下索引已过期时不更新索引，下次读取整个文件时会重新建立索引
+
+        # 新行已经写入文件，重复调用save不会重复写入
+        self.__new_lines = []
+        self.__has_replaced_line = False
+        self.__reverse_lines = self.__lines[::-1]
         print(Log.write_content_to_document_success)
@@ -0,0 +1,245 @@
+import os
+import re
+import json
+import hashlib
+from pathlib import Path
+from typing import TypedDict
+
+from shared.log import Log
+
+ARCHIVE_INDEX_VERSION = 1
+
+DEFAULT_TABLE_SEPARATOR = "|"
+
+ISSUE_RECORD_REGEX = re.compile(r"([^\[\]#\s|()]+)#(\d+)\]")
+"""匹配归档记录中的 "{issue_repository}#{issue_id}]" ，
+issue标题在记录之前，所以一行中有多个匹配时以最后一个为准"""
+
+
+class ArchiveIndexJson(TypedDict):
+    version: int
+    size: int
+    mtime_ns: int
+    sha256: str
+    hashed_line_count: int
+    """sha256对应的是归档文件的前多少行，
+    只读取文件末尾追加新行时不重新计算sha256，之后的行只记录在line_count中"""
+    line_count: int
+    ends_with_newline: bool
+    """前 hashed_line_count 行的最后一行是否以换行符结尾"""
+    table_separator: str
+    records: dict[str, list[int]]
+    """键为 "{issue_repository}#{issue_id}" ，值为 [行号, 归档序号]"""
+
+
+def get_index_path(document_path: str) -> str:
+    return document_path + ".index.json"
+
+
+def get_record_key(issue_repository: str, issue_id: int) -> str:
+    return f"{issue_repository}#{issue_id}"
+
+
+def get_lines_sha256(lines: list[str]) -> str:
+    sha256 = hashlib.sha256()
+    for line in lines:
+        sha256.update(line.encode("utf-8"))
+    return sha256.hexdigest()
+
+
+class ArchiveIndex:
+    """归档文件的索引，记录每个归档记录所在的行号和归档序号，
+    索引会保存在归档文件旁边的sidecar文件中，
+    根据归档文件的大小、修改时间和sha256值判断索引是否过期，
+    过期时如果归档文件只是在末尾追加了内容，只需要解析新增的行。\n
+    sha256只对应前 hashed_line_count 行，只读取文件末尾追加新行时
+    不需要为了更新sha256读取整个文件
+    """
+
+    def __init__(self, table_separator: str = DEFAULT_TABLE_SEPARATOR):
+        self.table_separator = table_separator
+        self.records: dict[str, list[int]] = {}
+        self.line_count: int = 0
+        self.sha256: str = str()
+        self.hashed_line_count: int = 0
+        self.ends_with_newline: bool = True
+
+    @staticmethod
+    def parse_record_key(line: str) -> str | None:
+        matches = ISSUE_RECORD_REGEX.findall(line)
+        if len(matches) == 0:
+            return None
+        issue_repository, issue_id = matches[-1]
+        return get_record_key(issue_repository, int(issue_id))
+
+    def parse_table_number(self, line: str) -> int:
+        """与ArchiveDocument解析归档序号的规则一致，解析失败时为0"""
+        start = line.find(self.table_separator)
+        end = line.find(self.table_separator, start + 1)
+        if (temp := line[start + 1 : end]).isdigit():
+            return int(temp)
+        return 0
+
+    def add_line(self, index: int, line: str) -> None:
+        key = self.parse_record_key(line)
+        # 同一个issue出现在多行时以第一行为准
+        if key is not None and key not in self.records:
+            self.records[key] = [index, self.parse_table_number(line)]
+
+    def build(self, lines: list[str], start: int = 0) -> None:
+        """从第start行开始解析归档记录"""
+        for index in range(start, len(lines)):
+            self.add_line(index, lines[index])
+        self.update_content(lines)
+
+    def update_line_count(self, line_count: int) -> None:
+        """只读取了归档文件末尾并追加新行时使用，
+        sha256和 hashed_line_count 保持不变，仍然对应原来的前几行，
+        下次读取整个文件时前几行没有变化就只需要解析之后的行"""
+        self.line_count = line_count
+
+    def rebuild(self, lines: list[str]) -> None:
+        self.records = {}
+        self.build(lines)
+
+    def update_content(self, lines: list[str]) -> None:
+        """记录索引对应的归档文件内容，用于判断索引是否过期"""
+        self.line_count = len(lines)
+        self.sha256 = get_lines_sha256(lines)
+        self.hashed_line_count = len(lines)
+        self.ends_with_newline = len(lines) == 0 or lines[-1].endswith("\n")
+
+    def insert_lines(self, index: int, new_lines: list[str]) -> None:
+        """在第index行插入新行后，更新插入位置之后的行号"""
+        for record in self.records.values():
+            if record[0] >= index:
+                record[0] += len(new_lines)
+        for offset, line in enumerate(new_lines):
+            self.add_line(index + offset, line)
+
+    def replace_line(self, index: int, line: str) -> None:
+        self.records = {
+            key: record for key, record in self.records.items() if record[0] != index
+        }
+        self.add_line(index, line)
+
+    def find(self, issue_repository: str, issue_id: int) -> tuple[int, int] | None:
+        """返回 (行号, 归档序号) ，找不到时返回None"""
+        record = self.records.get(get_record_key(issue_repository, issue_id))
+        if record is None:
+            return None
+        return record[0], record[1]
+
+    def __read(self, document_path: str) -> bool | None:
+        """读取sidecar索引文件，
+        返回索引记录的文件大小和修改时间是否与归档文件一致，
+        索引文件不存在、版本不一致或已经损坏时返回None"""
+        index_path = Path(get_index_path(document_path))
+        try:
+            stat = os.stat(document_path)
+            raw_json: ArchiveIndexJson = json.loads(
+                index_path.read_text(encoding="utf-8")
+            )
+            if (
+                raw_json["version"] != ARCHIVE_INDEX_VERSION
+                or raw_json["table_separator"] != self.table_separator
+            ):
+                raise ValueError(raw_json["version"])
+            self.records = dict(raw_json["records"])
+            self.line_count = int(raw_json["line_count"])
+            self.sha256 = str(raw_json["sha256"])
+            # 没有这个字段的旧索引文件的sha256对应整个文件
+            self.hashed_line_count = int(
+                raw_json.get("hashed_line_count", self.line_count)
+            )
+            self.ends_with_newline = bool(raw_json["ends_with_newline"])
+            return (
+                raw_json["size"] == stat.st_size
+                and raw_json["mtime_ns"] == stat.st_mtime_ns
+            )
+        except (OSError, KeyError, TypeError, ValueError):
+            print(Log.archive_index_not_found.format(index_path=index_path))
+            self.records = {}
+            return None
+
+    def load_by_stat(self, document_path: str) -> bool:
+        """只根据文件大小和修改时间判断索引是否可用，不需要读取归档文件内容，
+        索引不可用时返回False"""
+        if self.__read(document_path) is True:
+            print(
+                Log.archive_index_loaded.format(
+                    index_path=get_index_path(document_path)
+                )
+            )
+            return True
+        self.records = {}
+        return False
+
+    def load(self, document_path: str, lines: list[str]) -> None:
+        """读取sidecar索引文件，索引不存在或过期时重新建立索引并写回"""
+        index_path = get_index_path(document_path)
+        is_same_stat = self.__read(document_path)
+        if is_same_stat is None:
+            self.rebuild(lines)
+            self.dump(document_path)
+            return
+
+        if is_same_stat:
+            print(Log.archive_index_loaded.format(index_path=index_path))
+            return
+
+        hashed_line_count = self.hashed_line_count
+        is_prefix_unchanged = (
+            len(lines) >= hashed_line_count
+            and (self.ends_with_newline or len(lines) == hashed_line_count)
+            and get_lines_sha256(lines[:hashed_line_count]) == self.sha256
+        )
+        if is_prefix_unchanged and len(lines) == hashed_line_count == self.line_count:
+            # 文件内容没有变化，只是修改时间变了（例如重新checkout）
+            print(Log.archive_index_loaded.format(index_path=index_path))
+        elif is_prefix_unchanged:
+            # 只在末尾追加了内容，只需要解析sha256对应的行之后的行，
+            # 之前只读取文件末尾追加的新行也会在这里重新解析
+            print(
+                Log.archive_index_incremental_rebuild.format(
+                    index_path=index_path,
+                    line_count=len(lines) - hashed_line_count,
+                )
+            )
+            self.records = {
+                key: record
+                for key, record in self.records.items()
+                if record[0] < hashed_line_count
+            }
+            self.build(lines, hashed_line_count)
+        else:
+            print(Log.archive_index_rebuild.format(index_path=index_path))
+            self.rebuild(lines)
+        self.dump(document_path)
+
+    def dump(self, document_path: str) -> None:
+        """写入sidecar索引文件，写入失败不影响归档流程"""
+        index_path = Path(get_index_path(document_path))
+        try:
+            stat = os.stat(document_path)
+            index_path.write_text(
+                json.dumps(
+                    ArchiveIndexJson(
+                        version=ARCHIVE_INDEX_VERSION,
+                        size=stat.st_size,
+                        mtime_ns=stat.st_mtime_ns,
+                        sha256=self.sha256,
+                        hashed_line_count=self.hashed_line_count,
+                        line_count=self.line_count,
+                        ends_with_newline=self.ends_with_newline,
+                        table_separator=self.table_separator,
+                        records=self.records,
+                    ),
+                    ensure_ascii=False,
+                ),
+                encoding="utf-8",
+            )
+        except OSError as exc:
+            print(
+                Log.save_archive_index_failed.format(index_path=index_path, exc=exc)
+            )
@@ -1,132 +1,268 @@
-# import json
-# import re
-# from typing import TypedDict
-# from pathlib import Path
-# import datetime
-
-# import json_repair
-
-# from shared.log import Log
-# from shared.json_dumps import json_dumps
-
-
-# DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
-
-
-# class FailedREcordJson(TypedDict):
-#     issue_id: int
-#     issue_title: int
-#     issue_repository: str
-#     '''内容 ： 外部Issue / 内部Issue'''
-#     record_time: str
-#     reason: str
-
-
-# class FailedRecord():
-#     '''在这个类里的读取的json内容以及函数
-#     都（需要）考虑了json内容“不正常”的情况
-#     因为无法容忍这个归档失败记录json的内容因为各种原因丢失
-#     '''
-
-#     def __init__(self, path: str):
-#         self.__raw_path = path
-#         print(Log.read_failed_recording
-#               .format(failed_record_path=self.__raw_path))
-#         self.__path = Path(path)
-#         self.__records: list[FailedREcordJson] = []
-#         if not self.__path.exists():
-#             print(Log.create_failed_recording
-#                   .format(failed_record_path=self.__raw_path))
-#             self.__path.touch()
-#             self.__path.write_text("[]")
-#         self.__records = json_repair.repair_json(
-#             self.__path.read_text(encoding="utf-8"),
-#             ensure_ascii=False,
-#             return_objects=True
-#         )
-#         # 如果json文件烂完了（json_repair都无法修复）
-#         # 那么会json_repair.repair_json函数会返回一个空字符串
-#         if self.__records == '':
-#             print(Log.failed_record_json_broken
-#                   .format(failed_record_path=self.__raw_path))
-#             self.__records = []
-
-#     def get_all_issue_id(self) -> list[int]:
-#         result: list[int] = []
-#         for record in self.__records:
-#             issue_id: int | str = record['issue_id']
-#             result.append(self.__parse_issue_id(issue_id))
-#         return result
-
-#     def __parse_issue_id(self, issue_id: int | str) -> int:
-#         '''
-#         由于不清楚issue_id是否可能因为json损坏的问题而
-#         导致类型错乱或者有奇怪的内容混进来了
-#         才有了这个在字符串中提取数字的处理方法
-#         '''
-#         default_id = 0
-#         if isinstance(issue_id, int):
-#             return issue_id
-#         elif isinstance(issue_id, str):
-#             if issue_id.isdigit():
-#                 issue_id = int(issue_id)
-#             else:
-#                 digits = re.findall(
-#                     r'\d+', issue_id
-#                 )
-#                 # 由于issue_id可能在修复json时被某些混进来的字符拆开了
-#                 # 所以这里只能用字符串拼接的方式
-#                 # 尝试把issue_id中能识别的数字提取出来
-#                 if len(digits) > 0:
-#                     issue_id = int("".join(digits))
-#                 else:
-#                     print(Log.unrecognized_issue_id)
-#                     issue_id = default_id
-
-#         else:
-#             print(Log.unrecognized_issue_id)
-#             issue_id = default_id
-#         return issue_id
-
-#     def remove_record(self, issue_id: int | str) -> None:
-#         issue_id = self.__parse_issue_id(issue_id)
-#         for record in self.__records:
-#             if record['issue_id'] == issue_id:
-#                 print(Log.remove_failed_record_item
-#                       .format(record=json_dumps(
-#                           record,
-#                       )))
-
-#                 self.__records.remove(record)
-
-#                 print(Log.remove_failed_record_item_success
-#                       .format(record=json_dumps(
-#                           record,
-#                       )))
-#                 return
-#         print(Log.failed_record_issue_id_not_found
-#               .format(issue_id=issue_id))
-#         return None
-
-#     def add_record(self,
-#                    issue_id: int,
-#                    issue_title: str,
-#                    issue_repository: str,
-#                    reason: str
-#                    ) -> None:
-#         record = FailedREcordJson(
-#             issue_id=issue_id,
-#             issue_title=issue_title,
-#             issue_repository=issue_repository,
-#             record_time=datetime.datetime.now().strftime(DATETIME_FORMAT),
-#             reason=reason
-#         )
-#         self.__records.append(record)
-
-#     def save(self) -> None:
-#         self.__path.write_text(
-#             json_dumps(
-#                 self.__records,
-#             )
-#             ,encoding="utf-8"
-#         )
+import os
+import json
+import datetime
+from pathlib import Path
+from typing import Literal, TypedDict
+
+from auto_archiving.archive_index import get_record_key
+from shared.atomic_write import atomic_write_bytes
+from shared.ci_event_type import CiEventType
+from shared.log import Log
+
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+COMPACT_MIN_DEAD_LINES = 100
+"""失效的行少于这个数量时不压缩，避免频繁重写文件"""
+COMPACT_DEAD_RATIO = 1.0
+"""失效的行超过有效记录数量的这个倍数时压缩"""
+
+
+class FailedRecordJson(TypedDict):
+    op: Literal["add", "remove"]
+    """add为归档失败记录，remove为删除记录的墓碑"""
+    issue_id: int
+    issue_title: str
+    issue_repository: str
+    """内容 ： 外部Issue / 内部Issue"""
+    record_time: str
+    reason: str
+    attempts: int
+    """已经尝试归档的次数"""
+    ci_event_type: str
+    """归档失败时流水线的触发方式，重试时按这个触发方式的流程归档"""
+
+
+def get_attempts(record: FailedRecordJson) -> int:
+    """没有attempts字段的记录视为只尝试过一次"""
+    return int(record.get("attempts", 1))
+
+
+def get_ci_event_type(record: FailedRecordJson) -> str:
+    """没有ci_event_type字段的记录视为issue事件触发的流水线记录的"""
+    return record.get("ci_event_type") or CiEventType.issue_event[0]
+
+
+class FailedRecord:
+    """归档失败记录，使用只追加的JSON Lines文件保存，每行是一条记录或墓碑，
+    同一个issue以最后一行为准。\n
+    内存中保存了每个issue的有效记录所在的字节偏移，
+    查询只需要读取一行，新增和删除只需要在文件末尾追加一行；
+    失效的行（被覆盖的记录和墓碑）过多时重写文件只保留有效记录。\n
+    写入途中被中断时只有最后一行可能不完整，读取时截掉这一行，
+    不会因为一条损坏的记录丢失其他记录
+    """
+
+    def __init__(self, path: str):
+        self.__path = path
+        self.__offsets: dict[str, int] = {}
+        """键为 "{issue_repository}#{issue_id}" ，值为有效记录所在行的字节偏移"""
+        self.__dead_lines: int = 0
+        print(Log.read_failed_recording.format(failed_record_path=path))
+        if not Path(path).exists():
+            print(Log.create_failed_recording.format(failed_record_path=path))
+            Path(path).touch()
+        self.__load()
+        self.compact_if_needed()
+
+    def __load(self) -> None:
+        self.__offsets = {}
+        self.__dead_lines = 0
+        with open(self.__path, "rb") as file:
+            offset = 0
+            for line in file:
+                record = self.__parse_line(line)
+                if record is None:
+                    if not line.endswith(b"\n"):
+                        # 只有最后一行可能没有换行符，写入途中被中断，截掉这一行
+                        print(
+                            Log.failed_record_torn_line.format(
+                                failed_record_path=self.__path, offset=offset
+                            )
+                        )
+                        self.__truncate(offset)
+                        break
+                    print(
+                        Log.failed_record_broken_line.format(
+                            failed_record_path=self.__path, offset=offset
+                        )
+                    )
+                    self.__dead_lines += 1
+                else:
+                    self.__apply(record, offset)
+                    if not line.endswith(b"\n"):
+                        # 记录完整但换行符没有写入，补上换行符以免下一条记录接在同一行
+                        self.__write_newline()
+                offset += len(line)
+
+    @staticmethod
+    def __parse_line(line: bytes) -> FailedRecordJson | None:
+        try:
+            record: FailedRecordJson = json.loads(line)
+            if record["op"] not in ("add", "remove"):
+                raise ValueError(record["op"])
+            int(record["issue_id"])
+            str(record["issue_repository"])
+            return record
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def __apply(self, record: FailedRecordJson, offset: int) -> None:
+        key = get_record_key(record["issue_repository"], int(record["issue_id"]))
+        if key in self.__offsets:
+            self.__dead_lines += 1
+        if record["op"] == "add":
+            self.__offsets[key] = offset
+        else:
+            self.__offsets.pop(key, None)
+            self.__dead_lines += 1
+
+    def __truncate(self, offset: int) -> None:
+        with open(self.__path, "r+b") as file:
+            file.truncate(offset)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def __write_newline(self) -> None:
+        with open(self.__path, "ab") as file:
+            file.write(b"\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def __append(self, record: FailedRecordJson) -> None:
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        with open(self.__path, "ab") as file:
+            offset = file.seek(0, os.SEEK_END)
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        self.__apply(record, offset)
+
+    def __read_record(self, offset: int) -> FailedRecordJson:
+        with open(self.__path, "rb") as file:
+            file.seek(offset)
+            return json.loads(file.readline())
+
+    def __len__(self) -> int:
+        return len(self.__offsets)
+
+    def __contains__(self, key: tuple[str, int]) -> bool:
+        issue_repository, issue_id = key
+        return get_record_key(issue_repository, issue_id) in self.__offsets
+
+    def get_record(
+        self, issue_repository: str, issue_id: int
+    ) -> FailedRecordJson | None:
+        offset = self.__offsets.get(get_record_key(issue_repository, issue_id))
+        if offset is None:
+            return None
+        return self.__read_record(offset)
+
+    def get_records(self) -> list[FailedRecordJson]:
+        """按文件中的顺序返回所有有效记录"""
+        return [
+            self.__read_record(offset) for offset in sorted(self.__offsets.values())
+        ]
+
+    def get_all_issue_id(self, issue_repository: str) -> list[int]:
+        return [
+            int(record["issue_id"])
+            for record in self.get_records()
+            if record["issue_repository"] == issue_repository
+        ]
+
+    def add_record(
+        self,
+        issue_id: int,
+        issue_title: str,
+        issue_repository: str,
+        reason: str,
+        attempts: int = 1,
+        ci_event_type: str = "",
+    ) -> None:
+        """同一个issue已经有记录时覆盖原来的记录"""
+        print(Log.failed_recording)
+        self.__append(
+            FailedRecordJson(
+                op="add",
+                issue_id=issue_id,
+                issue_title=issue_title,
+                issue_repository=issue_repository,
+                record_time=datetime.datetime.now().strftime(DATETIME_FORMAT),
+                reason=reason,
+                attempts=attempts,
+                ci_event_type=ci_event_type,
+            )
+        )
+        self.compact_if_needed()
+
+    def record_attempt(
+        self,
+        issue_id: int,
+        issue_title: str,
+        issue_repository: str,
+        reason: str,
+        ci_event_type: str = "",
+    ) -> int:
+        """记录一次失败的归档尝试，返回包括这一次在内已经尝试的次数，
+        没有传入流水线的触发方式时沿用原来的记录中的触发方式"""
+        record = self.get_record(issue_repository, issue_id)
+        attempts = 1 if record is None else get_attempts(record) + 1
+        if ci_event_type == "" and record is not None:
+            ci_event_type = record.get("ci_event_type", "")
+        self.add_record(
+            issue_id, issue_title, issue_repository, reason, attempts, ci_event_type
+        )
+        return attempts
+
+    def remove_record(self, issue_repository: str, issue_id: int) -> bool:
+        """追加一条墓碑，返回是否找到了需要删除的记录"""
+        record = self.get_record(issue_repository, issue_id)
+        if record is None:
+            print(Log.failed_record_issue_id_not_found.format(issue_id=issue_id))
+            return False
+        print(
+            Log.remove_failed_record_item.format(
+                record=json.dumps(record, ensure_ascii=False)
+            )
+        )
+        self.__append(
+            FailedRecordJson(
+                op="remove",
+                issue_id=issue_id,
+                issue_title=record["issue_title"],
+                issue_repository=issue_repository,
+                record_time=datetime.datetime.now().strftime(DATETIME_FORMAT),
+                reason="",
+                attempts=get_attempts(record),
+                ci_event_type=record.get("ci_event_type", ""),
+            )
+        )
+        self.compact_if_needed()
+        return True
+
+    def should_compact(self) -> bool:
+        return self.__dead_lines >= COMPACT_MIN_DEAD_LINES and (
+            self.__dead_lines > len(self.__offsets) * COMPACT_DEAD_RATIO
+        )
+
+    def compact_if_needed(self) -> None:
+        if self.should_compact():
+            self.compact()
+
+    def compact(self) -> None:
+        """重写文件只保留有效记录，通过临时文件替换，
+        中途被中断时原文件保持不变"""
+        print(
+            Log.failed_record_compact.format(
+                failed_record_path=self.__path,
+                dead_lines=self.__dead_lines,
+                count=len(self.__offsets),
+            )
+        )
+        lines = [
+            json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+            for record in self.get_records()
+        ]
+        atomic_write_bytes(self.__path, b"".join(lines))
+        self.__load()
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+from pathlib import Path
+from typing import TypedDict
+
+from issue_processor.git_service_client import GitServiceClient
+from issue_processor.issues_processor import IssueProcessor
+from issue_processor.issue_data_source import issue_number_to_int
+from auto_archiving.archive_document import ArchiveDocument
+from shared.config_manager import ConfigManager
+from shared.config_data_source import EnvConfigDataSource, JsonConfigDataSource
+from shared.ci_event_type import CiEventType
+from shared.archive_status import ArchiveStatus
+from shared.issue_info import IssueInfo, IssueInfoJson
+from shared.json_config import Config
+from shared.json_dumps import json_dumps
+from shared.env import Env, should_run_in_local
+from shared.get_args import get_value_from_args
+from shared.log import Log
+from shared.exception import ArchiveBaseError, ErrorMessage
+from pipeline import prepare_issue_info, write_issue_to_document
+
+
+class BatchResultJson(TypedDict):
+    issue_id: int
+    issue_repository: str
+    status: str
+    """值为 ArchiveStatus 中的状态"""
+    message: str
+
+
+def parse_issue_ids(raw_issue_ids: str) -> list[int]:
+    """将以逗号分隔的Issue单号转换成整数列表，
+    重复的单号只保留第一次出现的位置"""
+    issue_ids = [
+        issue_number_to_int(item.strip())
+        for item in raw_issue_ids.split(",")
+        if item.strip() != ""
+    ]
+    return list(dict.fromkeys(issue_ids))
+
+
+def load_issue_infos_from_file(
+    issue_info_file: str,
+    platform: GitServiceClient,
+) -> list[IssueInfo]:
+    """读取 IssueInfoJson 格式的json文件，
+    文件内容可以是单个issue信息，也可以是issue信息的数组"""
+    raw_json: IssueInfoJson | list[IssueInfoJson] = json.loads(
+        Path(issue_info_file).read_text(encoding="utf-8")
+    )
+    if isinstance(raw_json, dict):
+        raw_json = [raw_json]
+
+    issue_infos: list[IssueInfo] = []
+    for issue_info_json in raw_json:
+        issue_info = IssueInfo()
+        issue_info.from_dict(issue_info_json)
+        # 以本次流水线的触发方式和平台为准，
+        # 而不是生成json文件时的流水线
+        issue_info.update(
+            ci_event_type=os.environ[Env.CI_EVENT_TYPE],
+            platform_type=platform.name,
+            archived_success=False,
+        )
+        issue_infos.append(issue_info)
+    return issue_infos
+
+
+def notify_archive_failed(
+    issue_info: IssueInfo,
+    platform: GitServiceClient,
+    exc: ArchiveBaseError,
+) -> None:
+    print(Log.archiving_condition_not_satisfied)
+    try:
+        platform.reopen_issue(issue_info.links.issue_url)
+        platform.send_comment(issue_info.links.comment_url, str(exc))
+    except Exception as notify_exc:
+        # 批量归档时单个issue的告警失败不应该中断其他issue的归档
+        print(ErrorMessage.reopen_issue_failed.format(exc=str(notify_exc)))
+
+
+def archive_issues(
+    issue_infos: list[IssueInfo],
+    platform: GitServiceClient,
+    config: Config,
+    archive_document: ArchiveDocument,
+) -> list[BatchResultJson]:
+    """按顺序将issue写入同一个归档文件（内存中），
+    单个issue归档失败不会中断批量归档流程"""
+    results: list[BatchResultJson] = []
+    count = len(issue_infos)
+    for index, issue_info in enumerate(issue_infos, 1):
+        print(
+            Log.batch_archiving_issue.format(
+                index=index,
+                count=count,
+                issue_repository=issue_info.issue_repository,
+                issue_id=issue_info.issue_id,
+            )
+        )
+        result = BatchResultJson(
+            issue_id=issue_info.issue_id,
+            issue_repository=issue_info.issue_repository,
+            status=ArchiveStatus.failed,
+            message="",
+        )
+        try:
+            result["status"] = prepare_issue_info(issue_info, platform, config)
+            if result["status"] == ArchiveStatus.pending:
+                result["status"] = write_issue_to_document(
+                    issue_info, platform, config, archive_document
+                )
+        except Exception as exc:
+            result["status"] = ArchiveStatus.failed
+            result["message"] = str(exc)
+            print(
+                Log.batch_archiving_issue_failed.format(
+                    issue_repository=issue_info.issue_repository,
+                    issue_id=issue_info.issue_id,
+                    exc=str(exc),
+                )
+            )
+            if isinstance(exc, ArchiveBaseError):
+                notify_archive_failed(issue_info, platform, exc)
+        results.append(result)
+    return results
+
+
+def save_batch_report(results: list[BatchResultJson], report_path: str) -> None:
+    print(Log.save_batch_report.format(report_path=report_path))
+    Path(report_path).write_text(json_dumps(results), encoding="utf-8")
+
+
+def main() -> None:
+    start_time = time.time()
+
+    if should_run_in_local():
+        print(Log.non_platform_action_env)
+        from dotenv import load_dotenv
+
+        load_dotenv()
+
+    test_platform_type = get_value_from_args(
+        short_arg="-pt",
+        long_arg="--platform-type",
+    )
+    config_path = get_value_from_args(
+        short_arg="-c",
+        long_arg="--config",
+    )
+    raw_issue_ids = get_value_from_args(
+        short_arg="-i",
+        long_arg="--issue-ids",
+    )
+    issue_info_file = get_value_from_args(
+        short_arg="-if",
+        long_arg="--issue-info-file",
+    )
+    report_path = get_value_from_args(
+        short_arg="-r",
+        long_arg="--report",
+    )
+
+    if config_path is None:
+        print(Log.config_path_not_found)
+        return
+
+    if raw_issue_ids is None and issue_info_file is None:
+        print(Log.batch_issue_not_found)
+        return
+
+    # 批量归档相当于对每个issue执行一次手动归档流程
+    if not CiEventType.should_ci_running_in_manual():
+        print(Log.batch_archiving_need_manual)
+        return
+
+    config = IssueProcessor.init_config(
+        ConfigManager([EnvConfigDataSource(), JsonConfigDataSource(config_path)])
+    )
+
+    platform = IssueProcessor.init_git_service_client(test_platform_type, config)
+
+    results: list[BatchResultJson] = []
+    try:
+        issue_infos: list[IssueInfo] = []
+        if issue_info_file is not None:
+            issue_infos.extend(load_issue_infos_from_file(issue_info_file, platform))
+        if raw_issue_ids is not None:
+            issue_infos.extend(
+                IssueProcessor.init_issue_info_by_issue_id(platform, issue_id)
+                for issue_id in parse_issue_ids(raw_issue_ids)
+            )
+        print(Log.batch_archiving_start.format(count=len(issue_infos)))
+
+        archive_document = ArchiveDocument()
+        archive_document.file_load_tail(
+            config.archived_document_path, config.archived_document.table_separator
+        )
+        results = archive_issues(issue_infos, platform, config, archive_document)
+        # 所有issue处理完毕后只写入一次归档文件
+        archive_document.save()
+    finally:
+        platform.close()
+
+        print(Log.batch_archiving_summary.format(summary=json_dumps(results)))
+        if report_path is not None:
+            save_batch_report(results, report_path)
+
+        print(Log.time_used.format(time="{:.4f}".format(time.time() - start_time)))
+
+        print(Log.job_done)
+
+
+if __name__ == "__main__":
+    main()
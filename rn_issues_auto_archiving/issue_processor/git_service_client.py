@@ -1,12 +1,14 @@
 import os
 import json
+from typing import Any
 from dataclasses import dataclass
 from abc import abstractmethod, ABC
 from http import HTTPStatus
+from concurrent.futures import ThreadPoolExecutor
 
 import httpx
 
-from .github_response_json import GithubCommentJson
+from .github_response_json import GithubCommentJson, GithubGraphqlIssueJson
 from .gitlab_response_json import GitlabCommentJson
 from shared.log import Log
 from shared.env import Env
@@ -17,6 +19,39 @@ from shared.ci_event_type import CiEventType
 from shared.json_dumps import json_dumps
 from shared.api_path import ApiPath
 from shared.json_config import Config
+from shared.http_cache import HttpCache, HttpCacheEntry, build_cache_key
+from shared.metrics import get_metrics, timed
+from shared.retry_policy import RetryPolicy
+from shared.http_request import get_http_client
+from shared.rate_limit import RateLimitBudget, get_rate_limit_budget, get_rate_limit_key
+
+
+COMMENTS_PER_PAGE = 100
+"""github和gitlab分页接口允许的最大单页数量"""
+
+MAX_PAGE_WORKERS = 4
+"""同时请求评论分页的最大线程数"""
+
+GITHUB_GRAPHQL_ISSUE_QUERY = """
+query($owner: String!, $name: String!, $number: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    issue(number: $number) {
+      number
+      title
+      state
+      body
+      url
+      labels(first: 100) { nodes { name } }
+      comments(first: %d, after: $cursor) {
+        pageInfo { hasNextPage endCursor }
+        nodes { author { login } body }
+      }
+    }
+  }
+}
+""" % COMMENTS_PER_PAGE
+"""一次请求获取issue信息、标签和评论，
+评论超过一页时只需要带上游标再次请求"""
 
 
 def get_issue_id_from_url(url: str) -> int:
@@ -31,6 +66,8 @@ class Issue:
     body: str
     labels: list[str]
     issue_web_url: str
+    updated_at: str = str()
+    """ISO 8601格式的最后更新时间，列出issue时用于增量查询"""
 
 
 @dataclass()
@@ -52,6 +89,38 @@ class GitServiceClient(ABC):
     ) -> list[IssueInfo.Comment]:
         pass
 
+    @staticmethod
+    @abstractmethod
+    def get_next_page(
+        response: httpx.Response, page: int, page_item_count: int
+    ) -> int | None:
+        """根据分页响应头获取下一页页码，没有下一页时返回None"""
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def get_last_page(response: httpx.Response) -> int | None:
+        """根据分页响应头获取总页数，响应头中没有总页数时返回None"""
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def parse_issue(raw_json: dict[str, Any]) -> Issue:
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def build_closed_issues_params(
+        labels: list[str], updated_after: str | None
+    ) -> dict[str, str]:
+        """列出已关闭issue的查询参数，结果按更新时间升序排列"""
+        pass
+
+    @staticmethod
+    def should_issue_item(raw_json: dict[str, Any]) -> bool:
+        """列出issue的接口返回的条目是否是issue"""
+        return True
+
     @abstractmethod
     def reopen_issue(self, issue_url: str) -> None:
         pass
@@ -95,57 +164,197 @@ class GitServiceClient(ABC):
     def __init__(
         self,
         token: str,
+        http_cache: HttpCache | None = None,
     ):
         self._token: str = token
         self._platform_type: str
         self._http_header: dict[str, str]
-        self._http_client: httpx.Client
+        self._http_client: httpx.Client | None = None
+        """为None时使用shared/http_request.py中按主机复用的客户端，
+        与推送归档文件和发送评论的请求共用同一个连接池"""
+        self._http_cache: HttpCache | None = http_cache
+        self.retry_policy: RetryPolicy = RetryPolicy()
+        self._rate_limit_budgets: dict[str, RateLimitBudget] = {}
+
+    @property
+    def rate_limit_budgets(self) -> dict[str, RateLimitBudget]:
+        """此客户端请求过的接口对应的剩余请求预算，键为 "协议://主机" """
+        return self._rate_limit_budgets
+
+    @property
+    def rate_limit_remaining(self) -> int | None:
+        """已知的最少的剩余请求数，还没有从响应头中获取到时为None"""
+        # 其他线程可能同时加入新的预算，先复制一份再遍历
+        remaining = [
+            budget.remaining
+            for budget in list(self._rate_limit_budgets.values())
+            if budget.remaining is not None
+        ]
+        return min(remaining) if len(remaining) != 0 else None
+
+    def _get_http_client(self, url: str) -> httpx.Client:
+        if self._http_client is not None:
+            return self._http_client
+        return get_http_client(url)
+
+    def _close_http_client(self) -> None:
+        """按主机复用的客户端在进程退出时统一关闭，这里只关闭单独指定的客户端"""
+        if self._http_client is not None:
+            self._http_client.close()
+
+    def _get_rate_limit_budget(self, url: str) -> RateLimitBudget:
+        budget = get_rate_limit_budget(url)
+        self._rate_limit_budgets[get_rate_limit_key(url)] = budget
+        return budget
 
     def http_request(
         self,
         url: str,
         method: str = "GET",
         params: dict[str, str] | None = None,
-        json_content: dict[str, str] | None = None,
+        json_content: dict[str, Any] | None = None,
         retry_times: int = 3,
+        idempotent: bool | None = None,
     ) -> httpx.Response:
-        error: Exception = Exception()
-        for _ in range(retry_times):
-            try:
-                response = self._http_client.request(
-                    method=method,
-                    url=url,
-                    params=params,
-                    json=json_content,
-                    follow_redirects=True,
-                )
-                if response.status_code == HTTPStatus.NOT_FOUND:
-                    print(Log.http_404_not_found)
-                response.raise_for_status()
-                return response
-            except httpx.HTTPStatusError:
-                reason = Log.unknown
+        """idempotent为None时根据请求方法判断请求能否重复发送"""
+        # 只有GET请求可以使用缓存，
+        # 有缓存时发送条件请求，平台返回304时直接使用缓存内容
+        cache_key: str | None = None
+        cache_entry: HttpCacheEntry | None = None
+        if self._http_cache is not None and method == "GET":
+            cache_key = build_cache_key(url, params)
+            cache_entry = self._http_cache.get(cache_key)
+
+        with get_metrics().http_request(method, url) as request_span:
+            budget = self._get_rate_limit_budget(url)
+            error: Exception = Exception()
+            for attempt in range(retry_times):
                 try:
-                    reason = json_dumps(
-                        response.json(),
+                    budget.wait(url)
+                    request_span.retries = attempt
+                    response = self._get_http_client(url).request(
+                        method=method,
+                        url=url,
+                        params=params,
+                        json=json_content,
+                        headers=(
+                            {**self._http_header, **cache_entry.conditional_headers()}
+                            if cache_entry is not None
+                            else self._http_header
+                        ),
+                        follow_redirects=True,
+                    )
+                    request_span.set_response(response)
+                    budget.update(response.headers)
+                    if (
+                        cache_entry is not None
+                        and response.status_code == HTTPStatus.NOT_MODIFIED
+                    ):
+                        print(Log.http_cache_hit.format(url=cache_key))
+                        return cache_entry.to_response(response.request)
+                    if response.status_code == HTTPStatus.NOT_FOUND:
+                        print(Log.http_404_not_found)
+                    if (
+                        attempt + 1 < retry_times
+                        and self.retry_policy.should_retry_response(
+                            method, response, idempotent
+                        )
+                    ):
+                        delay = self.retry_policy.get_delay(attempt, response)
+                        if delay is not None:
+                            self.retry_policy.wait(
+                                attempt, delay, str(response.status_code)
+                            )
+                            continue
+                    response.raise_for_status()
+                    if cache_key is not None and self._http_cache is not None:
+                        new_cache_entry = HttpCacheEntry.from_response(response)
+                        if new_cache_entry is not None:
+                            self._http_cache.set(cache_key, new_cache_entry)
+                    return response
+                except httpx.HTTPStatusError:
+                    reason = Log.unknown
+                    try:
+                        reason = json_dumps(
+                            response.json(),
+                        )
+                    except Exception:
+                        pass
+                    print(
+                        Log.http_status_error.format(
+                            reason=reason,
+                        )
                     )
-                except Exception:
-                    pass
-                print(
-                    Log.http_status_error.format(
-                        reason=reason,
+                    raise
+                except Exception as e:
+                    error = e
+                    if (
+                        attempt + 1 >= retry_times
+                        or not self.retry_policy.should_retry_exception(
+                            method, e, idempotent
+                        )
+                    ):
+                        break
+                    self.retry_policy.wait(
+                        attempt, self.retry_policy.get_backoff_delay(attempt), repr(e)
                     )
-                )
-                raise
-            except Exception as e:
-                error = e
-        raise error
+            raise error
+
+    def _get_all_pages(self, url: str) -> list[Any]:
+        """请求第一页后，分页响应头中有总页数时同时请求剩下的页，
+        否则只能根据下一页页码逐页请求，结果按页码顺序拼接"""
+
+        def get_page(page: int) -> httpx.Response:
+            return self.http_request(
+                url=url,
+                params={"page": str(page), "per_page": str(COMMENTS_PER_PAGE)},
+            )
+
+        response = get_page(1)
+        items: list[Any] = list(response.json())
+        last_page = self.get_last_page(response)
+        if last_page is not None:
+            if last_page > 1:
+                with ThreadPoolExecutor(
+                    max_workers=min(last_page - 1, MAX_PAGE_WORKERS)
+                ) as executor:
+                    for page_response in executor.map(
+                        get_metrics().bind_span(get_page), range(2, last_page + 1)
+                    ):
+                        items.extend(page_response.json())
+            return items
+
+        page = self.get_next_page(response, 1, len(items))
+        while page is not None:
+            response = get_page(page)
+            raw_json: list[Any] = response.json()
+            items.extend(raw_json)
+            page = self.get_next_page(response, page, len(raw_json))
+        return items
+
+    def _get_issue_and_comments_from_platform(
+        self, issue_url: str, comment_url: str
+    ) -> tuple[Issue, list[IssueInfo.Comment]]:
+        """issue信息与评论互不依赖，同时请求"""
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            issue_future = executor.submit(
+                get_metrics().bind_span(self._get_issue_info_from_platform), issue_url
+            )
+            comments = self._get_comments_from_platform(comment_url)
+            return issue_future.result(), comments
 
+    @timed()
     def enrich_missing_issue_info(self, issue_info: IssueInfo) -> None:
-        issue_info.issue_comments = self._get_comments_from_platform(
-            issue_info.links.comment_url
+        new_issue_info, issue_info.issue_comments = (
+            self._get_issue_and_comments_from_platform(
+                issue_info.links.issue_url, issue_info.links.comment_url
+            )
         )
-        new_issue_info = self._get_issue_info_from_platform(issue_info.links.issue_url)
+        self.update_issue_info(issue_info, new_issue_info)
+
+    @staticmethod
+    def update_issue_info(issue_info: IssueInfo, new_issue_info: Issue) -> None:
+        """用从平台获取到的Issue信息补全issue_info"""
         issue_info.issue_labels = new_issue_info.labels
         issue_info.links.issue_web_url = new_issue_info.issue_web_url
         if CiEventType.should_ci_running_in_manual():
@@ -155,6 +364,45 @@ class GitServiceClient(ABC):
             if issue_info.issue_body == "":
                 issue_info.issue_body = new_issue_info.body
 
+    def get_comments(self, comment_url: str) -> list[IssueInfo.Comment]:
+        return self._get_comments_from_platform(comment_url)
+
+    def get_issue_and_comments(
+        self, issue_url: str, comment_url: str
+    ) -> tuple[Issue, list[IssueInfo.Comment]]:
+        """获取issue的最新信息和评论，与流水线的触发方式无关"""
+        return self._get_issue_and_comments_from_platform(issue_url, comment_url)
+
+    def list_closed_issues(
+        self,
+        issues_url: str,
+        labels: list[str],
+        updated_after: str | None = None,
+    ) -> list[Issue]:
+        """分页列出包含所有指定标签的已关闭issue，
+        传入updated_after时只列出在这个时间之后更新过的issue"""
+        print(Log.listing_closed_issues.format(updated_after=updated_after))
+        issues: list[Issue] = []
+        page: int | None = 1
+        while page is not None:
+            response = self.http_request(
+                url=issues_url,
+                params={
+                    **self.build_closed_issues_params(labels, updated_after),
+                    "page": str(page),
+                    "per_page": str(COMMENTS_PER_PAGE),
+                },
+            )
+            raw_json: list[dict[str, Any]] = response.json()
+            issues.extend(
+                self.parse_issue(item)
+                for item in raw_json
+                if self.should_issue_item(item)
+            )
+            page = self.get_next_page(response, page, len(raw_json))
+        print(Log.listing_closed_issues_success.format(count=len(issues)))
+        return issues
+
     def send_comment(self, comment_url: str, comment_body: str) -> None:
         """api结构详见：\n
         Github ： https://docs.github.com/zh/rest/issues/comments?apiVersion=2022-11-28#create-an-issue-comment \n
@@ -196,15 +444,173 @@ class GithubClient(GitServiceClient):
     def close_issue_body(self) -> dict[str, str]:
         return {"state": "closed"}
 
+    @staticmethod
+    def get_next_page(
+        response: httpx.Response, page: int, page_item_count: int
+    ) -> int | None:
+        """github通过Link响应头分页，最后一页不会包含 rel="next" ，详见：
+        https://docs.github.com/en/rest/using-the-rest-api/using-pagination-in-the-rest-api
+        """
+        if "next" in response.links:
+            return page + 1
+        return None
+
+    @staticmethod
+    def get_last_page(response: httpx.Response) -> int | None:
+        """有下一页时Link响应头中 rel="last" 的链接带有最后一页的页码"""
+        if "next" not in response.links or "last" not in response.links:
+            return None
+        page = httpx.URL(response.links["last"]["url"]).params.get("page", "")
+        return int(page) if page.isdigit() else None
+
+    @staticmethod
+    def build_closed_issues_params(
+        labels: list[str], updated_after: str | None
+    ) -> dict[str, str]:
+        """api结构详见：
+        https://docs.github.com/en/rest/issues/issues?apiVersion=2022-11-28#list-repository-issues
+        """
+        params = {
+            "state": "closed",
+            "labels": ",".join(labels),
+            "sort": "updated",
+            "direction": "asc",
+        }
+        if updated_after is not None:
+            params["since"] = updated_after
+        return params
+
+    @staticmethod
+    def should_issue_item(raw_json: dict[str, Any]) -> bool:
+        # github列出issue的接口也会返回pull request
+        return "pull_request" not in raw_json
+
+    @staticmethod
+    def parse_comments(raw_json: list[GithubCommentJson]) -> list[IssueInfo.Comment]:
+        return [
+            IssueInfo.Comment(author=comment["user"]["login"], body=comment["body"])
+            for comment in raw_json
+        ]
+
+    @staticmethod
+    def parse_issue(raw_json: dict[str, Any]) -> Issue:
+        return Issue(
+            # 与gitlab的iid一致，使用仓库内的issue单号而不是全局id
+            id=raw_json["number"],
+            title=raw_json["title"],
+            state=parse_issue_state(raw_json["state"]),
+            body=raw_json["body"] or "",
+            labels=[label["name"] for label in raw_json["labels"]],
+            issue_web_url=raw_json["html_url"],
+            updated_at=raw_json.get("updated_at", ""),
+        )
+
+    @staticmethod
+    def build_graphql_url(issue_url: str) -> str:
+        """graphql接口地址详见：
+        https://docs.github.com/en/graphql/guides/forming-calls-with-graphql#the-graphql-endpoint \n
+        github.com 为 https://api.github.com/graphql ，
+        github enterprise server 为 https://HOST/api/graphql
+        """
+        api_base_url = issue_url.split("/repos/")[0]
+        if api_base_url.endswith("/api/v3"):
+            return api_base_url.removesuffix("/v3") + "/graphql"
+        return api_base_url + "/graphql"
+
+    @staticmethod
+    def parse_issue_url(issue_url: str) -> tuple[str, str, int]:
+        """从 {api_base_url}/repos/{owner}/{repo}/issues/{number}
+        中解析出仓库所有者、仓库名和issue单号"""
+        owner, name, _, number = issue_url.split("/repos/")[1].split("/")[:4]
+        return owner, name, int(number)
+
+    @staticmethod
+    def parse_graphql_comments(
+        raw_json: GithubGraphqlIssueJson,
+    ) -> list[IssueInfo.Comment]:
+        return [
+            IssueInfo.Comment(
+                # 评论者账号被删除时github会将其显示为ghost用户
+                author=(comment["author"] or {"login": "ghost"})["login"],
+                body=comment["body"],
+            )
+            for comment in raw_json["comments"]["nodes"]
+        ]
+
+    @staticmethod
+    def parse_graphql_issue(raw_json: GithubGraphqlIssueJson) -> Issue:
+        return Issue(
+            id=raw_json["number"],
+            title=raw_json["title"],
+            state=parse_issue_state(raw_json["state"]),
+            body=raw_json["body"],
+            labels=[label["name"] for label in raw_json["labels"]["nodes"]],
+            issue_web_url=raw_json["url"],
+        )
+
     def _init_http_client(self) -> None:
         self._http_header = self.create_http_header(self._token)
-        self._http_client = httpx.Client(headers=self._http_header)
 
-    def __init__(self, token: str):
-        super().__init__(token)
+    def __init__(
+        self,
+        token: str,
+        http_cache: HttpCache | None = None,
+        use_graphql: bool = False,
+    ):
+        super().__init__(token, http_cache)
         self._platform_type = GithubClient.name
+        self._use_graphql = use_graphql
         self._init_http_client()
 
+    def _graphql_request(
+        self, url: str, variables: dict[str, Any]
+    ) -> GithubGraphqlIssueJson:
+        """graphql接口出错时http状态码依然可能是200，
+        需要检查响应中的errors字段"""
+        # 查询请求不会修改数据，可以重复发送
+        response = self.http_request(
+            method="POST",
+            url=url,
+            json_content={"query": GITHUB_GRAPHQL_ISSUE_QUERY, "variables": variables},
+            idempotent=True,
+        )
+        raw_json: dict[str, Any] = response.json()
+        if raw_json.get("errors"):
+            errors = json_dumps(raw_json["errors"])
+            print(Log.graphql_error.format(errors=errors))
+            raise GraphqlError(errors)
+        return raw_json["data"]["repository"]["issue"]
+
+    def _get_issue_and_comments_from_platform(
+        self, issue_url: str, comment_url: str
+    ) -> tuple[Issue, list[IssueInfo.Comment]]:
+        """graphql模式下一次请求获取issue信息和前100条评论，
+        评论超过100条时才根据游标继续请求，详见：
+        https://docs.github.com/en/graphql/reference/objects#issue
+        """
+        if not self._use_graphql:
+            return super()._get_issue_and_comments_from_platform(
+                issue_url, comment_url
+            )
+        print(Log.getting_issue_info)
+        url = self.build_graphql_url(issue_url)
+        owner, name, number = self.parse_issue_url(issue_url)
+        variables: dict[str, Any] = {
+            "owner": owner,
+            "name": name,
+            "number": number,
+            "cursor": None,
+        }
+        raw_json = self._graphql_request(url, variables)
+        issue = self.parse_graphql_issue(raw_json)
+        comments = self.parse_graphql_comments(raw_json)
+        while raw_json["comments"]["pageInfo"]["hasNextPage"]:
+            variables["cursor"] = raw_json["comments"]["pageInfo"]["endCursor"]
+            raw_json = self._graphql_request(url, variables)
+            comments.extend(self.parse_graphql_comments(raw_json))
+        print(Log.getting_issue_info_success)
+        return issue, comments
+
     def _get_comments_from_platform(
         self,
         url: str,
@@ -212,25 +618,8 @@ class GithubClient(GitServiceClient):
         """api结构详见：
         https://docs.github.com/en/rest/issues/comments?apiVersion=2022-11-28#list-issue-comments-for-a-repository"""
         print(Log.getting_something.format(something=Log.issue_comment))
-        comments: list[IssueInfo.Comment] = []
-        page = 1
-        while True:
-            response: httpx.Response = self.http_request(
-                url=url, params={"page": str(page)}
-            )
-            raw_json: list[GithubCommentJson] = response.json()
-            if len(raw_json) == 0:
-                break
-            comments.extend(
-                [
-                    IssueInfo.Comment(
-                        author=comment["user"]["login"], body=comment["body"]
-                    )
-                    for comment in raw_json
-                ]
-            )
-            page += 1
-
+        raw_json: list[GithubCommentJson] = self._get_all_pages(url)
+        comments = self.parse_comments(raw_json)
         print(Log.getting_something_success.format(something=Log.issue_comment))
         return comments
 
@@ -240,15 +629,7 @@ class GithubClient(GitServiceClient):
         print(Log.getting_issue_info)
         response = self.http_request(url=issue_url, method="GET")
         print(Log.getting_issue_info_success)
-        raw_json = response.json()
-        return Issue(
-            id=raw_json["id"],
-            title=raw_json["title"],
-            state=parse_issue_state(raw_json["state"]),
-            body=raw_json["body"],
-            labels=[label["name"] for label in raw_json["labels"]],
-            issue_web_url=raw_json["html_url"],
-        )
+        return self.parse_issue(response.json())
 
     def reopen_issue(self, issue_url: str) -> None:
         """api结构详见：
@@ -281,7 +662,7 @@ class GithubClient(GitServiceClient):
         )
 
     def close(self):
-        self._http_client.close()
+        self._close_http_client()
 
 
 class GitlabClient(GitServiceClient):
@@ -298,15 +679,19 @@ class GitlabClient(GitServiceClient):
         """
         try:
             webhook_payload = json.loads(os.environ[Env.WEBHOOK_PAYLOAD])
-            if webhook_payload["event_name"] == "issue":
-                print(Log.issue_type_webhook_detected)
-                return True
-            else:
-                print(Log.other_type_webhook_detected)
-                return False
         except KeyError:
             # 如果读取不到环境变量，说明是github流水线环境
             return True
+        return GitlabClient.should_issue_type_webhook_payload(webhook_payload)
+
+    @staticmethod
+    def should_issue_type_webhook_payload(webhook_payload: dict[str, Any]) -> bool:
+        # issue事件的webhook中没有event_name字段，push等事件的webhook才有
+        if webhook_payload.get("event_name", "issue") == "issue":
+            print(Log.issue_type_webhook_detected)
+            return True
+        print(Log.other_type_webhook_detected)
+        return False
 
     @staticmethod
     def create_http_header(token: str) -> dict[str, str]:
@@ -330,12 +715,68 @@ class GitlabClient(GitServiceClient):
     def close_issue_body(self) -> dict[str, str]:
         return {"state_event": "close"}
 
+    @staticmethod
+    def get_next_page(
+        response: httpx.Response, page: int, page_item_count: int
+    ) -> int | None:
+        """gitlab通过X-Next-Page响应头返回下一页页码，最后一页时值为空，详见：
+        https://docs.gitlab.com/ee/api/rest/index.html#other-pagination-headers
+        """
+        next_page = response.headers.get("X-Next-Page")
+        if next_page is None:
+            # 没有分页响应头时（例如经过了会丢弃响应头的代理），
+            # 只能根据当前页是否装满来判断是否还有下一页
+            return page + 1 if page_item_count >= COMMENTS_PER_PAGE else None
+        if next_page.strip().isdigit():
+            return int(next_page)
+        return None
+
+    @staticmethod
+    def get_last_page(response: httpx.Response) -> int | None:
+        """gitlab在结果不超过一万条时通过X-Total-Pages响应头返回总页数"""
+        total_pages = response.headers.get("X-Total-Pages", "").strip()
+        return int(total_pages) if total_pages.isdigit() else None
+
+    @staticmethod
+    def build_closed_issues_params(
+        labels: list[str], updated_after: str | None
+    ) -> dict[str, str]:
+        """api结构详见：
+        https://docs.gitlab.com/ee/api/issues.html#list-project-issues"""
+        params = {
+            "state": "closed",
+            "labels": ",".join(labels),
+            "order_by": "updated_at",
+            "sort": "asc",
+        }
+        if updated_after is not None:
+            params["updated_after"] = updated_after
+        return params
+
+    @staticmethod
+    def parse_comments(raw_json: list[GitlabCommentJson]) -> list[IssueInfo.Comment]:
+        return [
+            IssueInfo.Comment(author=comment["author"]["username"], body=comment["body"])
+            for comment in raw_json
+        ]
+
+    @staticmethod
+    def parse_issue(raw_json: dict[str, Any]) -> Issue:
+        return Issue(
+            id=raw_json["iid"],
+            title=raw_json["title"],
+            state=parse_issue_state(raw_json["state"]),
+            body=raw_json["description"] or "",
+            labels=raw_json["labels"],
+            issue_web_url=raw_json["web_url"],
+            updated_at=raw_json.get("updated_at", ""),
+        )
+
     def _init_http_client(self) -> None:
         self._http_header = self.create_http_header(self._token)
-        self._http_client = httpx.Client(headers=self._http_header)
 
-    def __init__(self, token: str):
-        super().__init__(token)
+    def __init__(self, token: str, http_cache: HttpCache | None = None):
+        super().__init__(token, http_cache)
         self._platform_type = GitlabClient.name
         self._init_http_client()
 
@@ -349,24 +790,8 @@ class GitlabClient(GitServiceClient):
         https://docs.gitlab.com/ee/api/rest/index.html#pagination
         """
         print(Log.getting_something.format(something=Log.issue_comment))
-        comments: list[IssueInfo.Comment] = []
-        page = 1
-        while True:
-            response: httpx.Response = self.http_request(
-                url=url, params={"page": str(page)}
-            )
-            raw_json: list[GitlabCommentJson] = response.json()
-            if len(raw_json) == 0:
-                break
-            comments.extend(
-                [
-                    IssueInfo.Comment(
-                        author=comment["author"]["username"], body=comment["body"]
-                    )
-                    for comment in raw_json
-                ]
-            )
-            page += 1
+        raw_json: list[GitlabCommentJson] = self._get_all_pages(url)
+        comments = self.parse_comments(raw_json)
         print(Log.getting_something_success.format(something=Log.issue_comment))
         return comments
 
@@ -376,15 +801,7 @@ class GitlabClient(GitServiceClient):
         print(Log.getting_issue_info)
         response = self.http_request(method="GET", url=issue_url)
         print(Log.getting_issue_info_success)
-        raw_json = response.json()
-        return Issue(
-            id=raw_json["iid"],
-            title=raw_json["title"],
-            state=parse_issue_state(raw_json["state"]),
-            body=raw_json["description"],
-            labels=raw_json["labels"],
-            issue_web_url=raw_json["web_url"],
-        )
+        return self.parse_issue(response.json())
 
     def reopen_issue(self, issue_url: str) -> None:
         """api结构详见：
@@ -417,4 +834,4 @@ class GitlabClient(GitServiceClient):
         )
 
     def close(self):
-        self._http_client.close()
+        self._close_http_client()
@@ -33,3 +33,29 @@ class GithubCommentJson(TypedDict):
     updated_at: str
     url: str
     user: GithubUserJson
+
+
+class GithubGraphqlPageInfoJson(TypedDict):
+    hasNextPage: bool
+    endCursor: str | None
+
+
+class GithubGraphqlCommentJson(TypedDict):
+    author: dict[str, str] | None
+    """评论者账号被删除时为null"""
+    body: str
+
+
+class GithubGraphqlCommentsJson(TypedDict):
+    pageInfo: GithubGraphqlPageInfoJson
+    nodes: list[GithubGraphqlCommentJson]
+
+
+class GithubGraphqlIssueJson(TypedDict):
+    number: int
+    title: str
+    state: str
+    body: str
+    url: str
+    labels: dict[str, list[dict[str, str]]]
+    comments: GithubGraphqlCommentsJson
@@ -1,6 +1,7 @@
 import os
 from abc import ABC, abstractmethod
 import json
+from typing import Any
 
 from shared.issue_info import IssueInfo, AUTO_ISSUE_TYPE
 from shared.ci_event_type import CiEventType
@@ -11,6 +12,8 @@ from shared.json_dumps import json_dumps
 from shared.exception import MissingIssueNumber, WebhookPayloadError
 from shared.api_path import ApiPath
 
+GITHUB_DEFAULT_API_URL = "https://api.github.com"
+
 
 def issue_number_to_int(issue_number: str):
     if not issue_number.isdigit():
@@ -25,8 +28,68 @@ class IssusDataSource(ABC):
     def load(self, issue_info: IssueInfo) -> None:
         pass
 
+    @abstractmethod
+    def load_by_issue_id(self, issue_info: IssueInfo, issue_id: int) -> None:
+        """只根据Issue单号初始化issue_info，
+        其余Issue信息需要通过平台API补全"""
+        pass
+
+    @abstractmethod
+    def load_webhook_payload(
+        self, issue_info: IssueInfo, webhook_payload: dict[str, Any]
+    ) -> None:
+        """根据issue事件webhook的内容初始化issue_info，
+        webhook服务直接收到webhook时使用，不需要通过环境变量传递"""
+        pass
+
+    @abstractmethod
+    def load_issues_url(self) -> str:
+        """列出仓库所有issue的API地址"""
+        pass
+
 
 class GithubIssueDataSource(IssusDataSource):
+    @staticmethod
+    def build_issue_url(issue_id: int, api_base_url: str, repository: str) -> str:
+        return f"{api_base_url}/repos/{repository}/{ApiPath.issues}/{issue_id}"
+
+    def load_issues_url(self) -> str:
+        api_base_url = os.environ.get(Env.GITHUB_API_URL, GITHUB_DEFAULT_API_URL)
+        repository = os.environ[Env.GITHUB_REPOSITORY]
+        return f"{api_base_url}/repos/{repository}/{ApiPath.issues}"
+
+    def load_by_issue_id(self, issue_info: IssueInfo, issue_id: int) -> None:
+        issue_info.ci_event_type = os.environ[Env.CI_EVENT_TYPE]
+        issue_info.issue_repository = os.environ[Env.ISSUE_REPOSITORY]
+        issue_info.issue_id = issue_id
+        issue_url = self.build_issue_url(
+            issue_id,
+            os.environ.get(Env.GITHUB_API_URL, GITHUB_DEFAULT_API_URL),
+            os.environ[Env.GITHUB_REPOSITORY],
+        )
+        issue_info.links.issue_url = issue_url
+        issue_info.links.comment_url = issue_url + "/" + ApiPath.comments
+
+    def load_webhook_payload(
+        self, issue_info: IssueInfo, webhook_payload: dict[str, Any]
+    ) -> None:
+        """webhook结构详见：
+        https://docs.github.com/zh/webhooks/webhook-events-and-payloads#issues"""
+        issue = webhook_payload["issue"]
+        issue_info.ci_event_type = os.environ[Env.CI_EVENT_TYPE]
+        issue_info.issue_repository = os.environ[Env.ISSUE_REPOSITORY]
+        issue_info.issue_id = issue["number"]
+        issue_info.issue_title = issue["title"]
+        issue_info.issue_state = parse_issue_state(issue["state"])
+        # issue描述为空时webhook中的body为null
+        issue_info.issue_body = issue["body"] or ""
+        issue_info.issue_labels = []
+        issue_info.introduced_version = ""
+        issue_info.archive_version = ""
+        issue_info.issue_type = AUTO_ISSUE_TYPE
+        issue_info.links.issue_url = issue["url"]
+        issue_info.links.comment_url = issue["comments_url"]
+
     def load(self, issue_info: IssueInfo) -> None:
         print(Log.loading_something.format(something=Log.env))
 
@@ -85,6 +148,15 @@ class GitlabIssueDataSource(IssusDataSource):
     def build_issue_url(issue_id: int, api_base_url: str) -> str:
         return f"{api_base_url}{ApiPath.issues}/{issue_id}"
 
+    def load_issues_url(self) -> str:
+        return f"{os.environ[Env.API_BASE_URL]}{ApiPath.issues}"
+
+    def load_by_issue_id(self, issue_info: IssueInfo, issue_id: int) -> None:
+        issue_info.ci_event_type = os.environ[Env.CI_EVENT_TYPE]
+        issue_info.issue_repository = os.environ[Env.ISSUE_REPOSITORY]
+        issue_info.issue_id = issue_id
+        self.set_links(issue_info, issue_id)
+
     def load(self, issue_info: IssueInfo) -> None:
         print(Log.loading_something.format(something=Log.env))
 
@@ -134,23 +206,41 @@ class GitlabIssueDataSource(IssusDataSource):
                 print(Log.webhook_payload_not_found)
                 raise WebhookPayloadError(Log.webhook_payload_not_found)
 
-            # webhook里是json，iid一定是int
-            issue_info.issue_id = issue_id = webhook_payload["object_attributes"]["iid"]
-            issue_info.issue_title = webhook_payload["object_attributes"]["title"]
-            issue_info.issue_state = parse_issue_state(
-                webhook_payload["object_attributes"]["action"]
-            )
-            issue_info.issue_body = webhook_payload["object_attributes"]["description"]
-            issue_info.issue_labels = [
-                label_json["title"]
-                for label_json in webhook_payload["object_attributes"]["labels"]
-            ]
-            issue_info.introduced_version = ""
-            issue_info.archive_version = ""
-            issue_info.issue_type = AUTO_ISSUE_TYPE
+            self.parse_webhook_payload(issue_info, webhook_payload)
+            issue_id = issue_info.issue_id
+
+        self.set_links(issue_info, issue_id)
+
+        print(Log.loading_something_success.format(something=Log.env))
 
+    @staticmethod
+    def parse_webhook_payload(
+        issue_info: IssueInfo, webhook_payload: dict[str, Any]
+    ) -> None:
+        # webhook里是json，iid一定是int
+        issue_info.issue_id = webhook_payload["object_attributes"]["iid"]
+        issue_info.issue_title = webhook_payload["object_attributes"]["title"]
+        issue_info.issue_state = parse_issue_state(
+            webhook_payload["object_attributes"]["action"]
+        )
+        issue_info.issue_body = webhook_payload["object_attributes"]["description"]
+        issue_info.issue_labels = [
+            label_json["title"]
+            for label_json in webhook_payload["object_attributes"]["labels"]
+        ]
+        issue_info.introduced_version = ""
+        issue_info.archive_version = ""
+        issue_info.issue_type = AUTO_ISSUE_TYPE
+
+    def set_links(self, issue_info: IssueInfo, issue_id: int) -> None:
         issue_url = self.build_issue_url(issue_id, os.environ[Env.API_BASE_URL])
         issue_info.links.issue_url = issue_url
         issue_info.links.comment_url = issue_url + "/" + ApiPath.notes
 
-        print(Log.loading_something_success.format(something=Log.env))
+    def load_webhook_payload(
+        self, issue_info: IssueInfo, webhook_payload: dict[str, Any]
+    ) -> None:
+        issue_info.ci_event_type = os.environ[Env.CI_EVENT_TYPE]
+        issue_info.issue_repository = os.environ[Env.ISSUE_REPOSITORY]
+        self.parse_webhook_payload(issue_info, webhook_payload)
+        self.set_links(issue_info, issue_info.issue_id)
@@ -1,3 +1,4 @@
+from typing import Any
 from dataclasses import dataclass
 
 from issue_processor.git_service_client import GitServiceClient
@@ -7,6 +8,7 @@ from issue_processor.issue_data_source import (
 )
 from issue_processor.git_service_client import GithubClient, GitlabClient
 from shared.ci_event_type import CiEventType
+from shared.comment_regex_matcher import CommentRegexMatcher
 from shared.config_manager import ConfigManager
 from shared.env import should_run_in_github_action, should_run_in_gitlab_ci
 from shared.issue_state import IssueState
@@ -15,6 +17,8 @@ from shared.issue_info import AUTO_ISSUE_TYPE, IssueInfo
 from shared.json_config import Config
 from shared.log import Log
 from shared.exception import UnexpectedPlatform
+from shared.http_cache import DirectoryHttpCache, HttpCache
+from shared.metrics import timed
 
 
 class IssueProcessor:
@@ -25,6 +29,7 @@ class IssueProcessor:
         issue_type: str = str()
 
     @staticmethod
+    @timed()
     def init_config(config_manager: ConfigManager) -> Config:
         config = Config()
         try:
@@ -35,6 +40,14 @@ class IssueProcessor:
         return config
 
     @staticmethod
+    def init_http_cache(config: Config) -> HttpCache | None:
+        if config.http_cache_dir == "":
+            return None
+        print(Log.http_cache_enabled.format(cache_dir=config.http_cache_dir))
+        return DirectoryHttpCache(config.http_cache_dir, config.http_cache_max_size_mb)
+
+    @staticmethod
+    @timed()
     def init_git_service_client(
         test_platform_type: str | None, config: Config
     ) -> GithubClient | GitlabClient:
@@ -44,9 +57,15 @@ class IssueProcessor:
                 Log.get_test_platform_type.format(test_platform_type=test_platform_type)
             )
         if test_platform_type == GithubClient.name or should_run_in_github_action():
-            service_client = GithubClient(token=config.token)
+            service_client = GithubClient(
+                token=config.token,
+                http_cache=IssueProcessor.init_http_cache(config),
+                use_graphql=config.github_use_graphql,
+            )
         elif test_platform_type == GitlabClient.name or should_run_in_gitlab_ci():
-            service_client = GitlabClient(token=config.token)
+            service_client = GitlabClient(
+                token=config.token, http_cache=IssueProcessor.init_http_cache(config)
+            )
         else:
             raise UnexpectedPlatform(
                 Log.unexpected_platform_type.format(platform_type=test_platform_type)
@@ -54,6 +73,7 @@ class IssueProcessor:
         return service_client
 
     @staticmethod
+    @timed()
     def init_issue_info(
         platform: GitServiceClient,
     ) -> IssueInfo:
@@ -72,13 +92,66 @@ class IssueProcessor:
         return issue_info
 
     @staticmethod
+    @timed()
+    def init_issue_info_by_issue_id(
+        platform: GitServiceClient,
+        issue_id: int,
+    ) -> IssueInfo:
+        issue_info = IssueInfo()
+
+        if isinstance(platform, GithubClient):
+            GithubIssueDataSource().load_by_issue_id(issue_info, issue_id)
+            issue_info.update(platform_type=platform.name)
+        elif isinstance(platform, GitlabClient):
+            GitlabIssueDataSource().load_by_issue_id(issue_info, issue_id)
+            issue_info.update(platform_type=platform.name)
+        else:
+            raise UnexpectedPlatform(
+                Log.unexpected_platform_type.format(platform_type=type(platform))
+            )
+        return issue_info
+
+    @staticmethod
+    @timed()
+    def init_issue_info_by_webhook_payload(
+        platform: GitServiceClient,
+        webhook_payload: dict[str, Any],
+    ) -> IssueInfo:
+        issue_info = IssueInfo()
+
+        if isinstance(platform, GithubClient):
+            GithubIssueDataSource().load_webhook_payload(issue_info, webhook_payload)
+            issue_info.update(platform_type=platform.name)
+        elif isinstance(platform, GitlabClient):
+            GitlabIssueDataSource().load_webhook_payload(issue_info, webhook_payload)
+            issue_info.update(platform_type=platform.name)
+        else:
+            raise UnexpectedPlatform(
+                Log.unexpected_platform_type.format(platform_type=type(platform))
+            )
+        return issue_info
+
+    @staticmethod
+    def init_issues_url(platform: GitServiceClient) -> str:
+        if isinstance(platform, GithubClient):
+            return GithubIssueDataSource().load_issues_url()
+        elif isinstance(platform, GitlabClient):
+            return GitlabIssueDataSource().load_issues_url()
+        else:
+            raise UnexpectedPlatform(
+                Log.unexpected_platform_type.format(platform_type=type(platform))
+            )
+
+    @staticmethod
+    @timed()
     def should_skip_archived_process(
         issue_info: IssueInfo,
-        skip_archived_reges_for_comments: list[str],
+        skip_archived_comment_matcher: CommentRegexMatcher,
     ) -> bool:
-        return issue_info.should_skip_archived_process(skip_archived_reges_for_comments)
+        return issue_info.should_skip_archived_process(skip_archived_comment_matcher)
 
     @staticmethod
+    @timed()
     def verify_not_archived_object(issue_info: IssueInfo, config: Config) -> bool:
         # gitlab的issue webhook是会响应issue reopen事件的
         # gitlab的reopen issue事件应该被跳过
@@ -98,7 +171,7 @@ class IssueProcessor:
         not_input_archive_version = issue_info.archive_version == ""
         if (running_in_manual and not_input_archive_version) or not running_in_manual:
             not_archived_issue = not issue_info.should_archive_issue(
-                config.archive_version_reges_for_comments,
+                config.archive_version_comment_matcher,
                 config.raw_archive_version_reges_for_comments,
                 config.archive_necessary_labels,
             )
@@ -115,6 +188,7 @@ class IssueProcessor:
         return False
 
     @staticmethod
+    @timed()
     def gather_info_from_issue(issue_info: IssueInfo, config: Config) -> GatherInfo:
         gather_info = IssueProcessor.GatherInfo(
             issue_type=issue_info.issue_type,
@@ -137,7 +211,7 @@ class IssueProcessor:
             )
 
         gather_info.archive_version = issue_info.get_archive_version_from_comments(
-            config.archive_version_reges_for_comments
+            config.archive_version_comment_matcher
         )
 
         return gather_info
@@ -153,6 +227,7 @@ class IssueProcessor:
         )
 
     @staticmethod
+    @timed()
     def parse_issue_info_for_archived(issue_info: IssueInfo, config: Config) -> None:
         issue_info.update(
             issue_title=issue_info.remove_issue_type_in_issue_title(
@@ -161,6 +236,7 @@ class IssueProcessor:
         )
 
     @staticmethod
+    @timed()
     def close_issue_if_not_closed(
         issue_info: IssueInfo,
         platform: GitServiceClient,
@@ -0,0 +1,370 @@
+import os
+import time
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from issue_processor.git_service_client import (
+    GitServiceClient,
+    GitlabClient,
+)
+from issue_processor.issues_processor import IssueProcessor
+from auto_archiving.archive_document import ArchiveDocument
+from auto_archiving.archive_index import DEFAULT_TABLE_SEPARATOR
+from shared.config_manager import ConfigManager
+from shared.config_data_source import EnvConfigDataSource, JsonConfigDataSource
+from shared.ci_event_type import CiEventType
+from shared.env import Env, should_run_in_local
+from shared.log import Log
+from shared.get_args import get_value_from_args
+from shared.exception import ArchiveBaseError, WebhookPayloadError
+from shared.archive_status import ArchiveStatus
+from shared.issue_info import IssueInfo
+from shared.json_config import Config
+from shared.transient_error import is_transient_error
+from shared.metrics import get_metrics, get_metrics_path, timed
+from auto_archiving.failed_record import FailedRecord
+
+PUSH_DOCUMENT_SH = str(Path(__file__).parent / "push_document.sh")
+
+MAX_COMMENT_WORKERS = 4
+"""同时发送归档成功评论的最大线程数"""
+
+
+@timed()
+def prepare_issue_info(
+    issue_info: IssueInfo,
+    platform: GitServiceClient,
+    config: Config,
+) -> str:
+    """补全并处理归档所需的issue信息，
+    issue需要写入归档文件时返回 ArchiveStatus.pending ，
+    否则返回跳过归档的原因"""
+    platform.enrich_missing_issue_info(issue_info)
+
+    if IssueProcessor.should_skip_archived_process(
+        issue_info, config.skip_archived_comment_matcher
+    ):
+        print(Log.manually_skip_archived_process)
+        IssueProcessor.close_issue_if_not_closed(issue_info, platform)
+        return ArchiveStatus.skipped
+
+    if IssueProcessor.verify_not_archived_object(issue_info, config):
+        return ArchiveStatus.not_archived_object
+
+    IssueProcessor.update_issue_info_with_gather_info(
+        issue_info, IssueProcessor.gather_info_from_issue(issue_info, config)
+    )
+    IssueProcessor.parse_issue_info_for_archived(issue_info, config)
+    IssueProcessor.close_issue_if_not_closed(issue_info, platform)
+    return ArchiveStatus.pending
+
+
+@timed()
+def write_issue_to_document(
+    issue_info: IssueInfo,
+    platform: GitServiceClient,
+    config: Config,
+    archive_document: ArchiveDocument,
+) -> str:
+    """将已处理的issue信息写入归档文件（内存中），
+    不会保存归档文件，按issue信息中的流水线触发方式决定是否查重和替换"""
+    if (
+        issue_info.ci_event_type in CiEventType.issue_event
+        and archive_document.should_issue_record_exists(
+            issue_info.issue_repository, issue_info.issue_id
+        )
+    ):
+        comment_message = Log.issue_already_archived.format(
+            issue_id=issue_info.issue_id,
+            issue_repository=issue_info.issue_repository,
+        )
+        print(comment_message)
+        platform.send_comment(issue_info.links.comment_url, comment_message)
+        return ArchiveStatus.already_archived
+
+    archive_document.archive_issue(
+        # 归档内容格式规则
+        rjust_space_width=config.archived_document.rjust_space_width,
+        rjust_character=config.archived_document.rjust_character,
+        table_separator=config.archived_document.table_separator,
+        archive_template=config.archived_document.archive_template,
+        fill_issue_url_by_repository_type=config.archived_document.fill_issue_url_by_repository_type,
+        issue_title_processing_rules=config.archived_document.issue_title_processing_rules,
+        # 归档所需issue数据
+        issue_id=issue_info.issue_id,
+        issue_type=issue_info.issue_type,
+        issue_title=issue_info.issue_title,
+        issue_repository=issue_info.issue_repository,
+        introduced_version=issue_info.introduced_version,
+        issue_url=issue_info.links.issue_web_url,
+        archive_version=issue_info.archive_version,
+        replace_mode=(issue_info.ci_event_type in CiEventType.manual),
+    )
+    issue_info.set_archived_success()
+    return ArchiveStatus.archived
+
+
+@timed()
+def save_archive_document(
+    archive_document: ArchiveDocument,
+    issue_infos: list[IssueInfo],
+    document_path: str,
+) -> None:
+    """写入归档文件，并在issue信息中记录本次运行是否修改了归档文件，
+    替换模式下新内容与原来的记录一致时归档文件不会变化，推送流程可以直接跳过。\n
+    这里不计算归档文件的sha256值，追加写入的耗时与归档文件长度无关，
+    推送流程读取归档文件时才计算"""
+    document_changed = archive_document.is_changed()
+    archive_document.save()
+    for issue_info in issue_infos:
+        issue_info.set_document_changed(document_changed)
+
+
+def init_retry_queue(config: Config) -> FailedRecord | None:
+    """没有设置RETRY_QUEUE_PATH时不使用重试队列，
+    所有错误都与之前一样重新打开issue并发送告警评论"""
+    if config.retry_queue_path == "":
+        return None
+    return FailedRecord(config.retry_queue_path)
+
+
+def enqueue_transient_failure(
+    issue_infos: list[IssueInfo],
+    exc: Exception,
+    retry_queue: FailedRecord | None,
+) -> bool:
+    """将暂时性错误导致归档失败的issue记录到重试队列，由retry_failed.py稍后重试，
+    返回是否已经记录（不需要重新打开issue）"""
+    if retry_queue is None or not is_transient_error(exc):
+        return False
+    for issue_info in issue_infos:
+        attempts = retry_queue.record_attempt(
+            issue_info.issue_id,
+            issue_info.issue_title,
+            issue_info.issue_repository,
+            str(exc),
+            issue_info.ci_event_type,
+        )
+        print(
+            Log.transient_error_queued.format(
+                issue_repository=issue_info.issue_repository,
+                issue_id=issue_info.issue_id,
+                attempts=attempts,
+                exc=repr(exc),
+            )
+        )
+    return True
+
+
+@timed()
+def run_archive_stage(
+    issue_info: IssueInfo,
+    platform: GitServiceClient,
+    config: Config,
+    retry_queue: FailedRecord | None = None,
+) -> bool:
+    """流水线的第一步：处理issue信息并写入归档文件，返回是否归档成功，
+    归档条件不满足时重新打开issue并发送告警评论，
+    网络异常等暂时性错误在传入重试队列时记录到队列中"""
+    try:
+        if prepare_issue_info(issue_info, platform, config) != ArchiveStatus.pending:
+            return False
+
+        # 将issue内容写入归档文件
+        archive_document = ArchiveDocument()
+        archive_document.file_load_tail(
+            config.archived_document_path, config.archived_document.table_separator
+        )
+
+        if (
+            write_issue_to_document(issue_info, platform, config, archive_document)
+            != ArchiveStatus.archived
+        ):
+            return False
+        # 只有成功归档时才写入归档文件，
+        # 提前返回或者出现异常时归档文件保持原样
+        save_archive_document(
+            archive_document, [issue_info], config.archived_document_path
+        )
+        return True
+    except ArchiveBaseError as exc:
+        print(Log.archiving_condition_not_satisfied)
+        platform.reopen_issue(issue_info.links.issue_url)
+        platform.send_comment(issue_info.links.comment_url, str(exc))
+        raise
+    except Exception as exc:
+        if enqueue_transient_failure([issue_info], exc, retry_queue):
+            return False
+        raise
+
+
+@timed()
+def run_push_stage(
+    issue_infos: list[IssueInfo],
+    table_separator: str = DEFAULT_TABLE_SEPARATOR,
+    retry_queue: FailedRecord | None = None,
+) -> bool:
+    """流水线的第二步：将这一批issue的归档内容合并成一次提交推送，
+    gitlab通过RESTful API提交，github执行push_document.sh。\n
+    返回是否推送成功（或者不需要推送），
+    暂时性错误在传入重试队列时记录到队列中并返回False"""
+    import push_document
+
+    if not any(issue_info.should_document_changed() for issue_info in issue_infos):
+        print(Log.document_not_changed_skip_push)
+        return True
+    issue_ids = [issue_info.issue_id for issue_info in issue_infos]
+    is_gitlab = issue_infos[0].platform_type == GitlabClient.name
+    try:
+        if is_gitlab:
+            push_document.push_archived_document(
+                issue_infos, table_separator, notify_failure=retry_queue is None
+            )
+        else:
+            subprocess.run(
+                ["bash", PUSH_DOCUMENT_SH],
+                env={**os.environ, Env.ISSUE_NUMBER: ",".join(map(str, issue_ids))},
+                check=True,
+            )
+    except Exception as exc:
+        if enqueue_transient_failure(issue_infos, exc, retry_queue):
+            return False
+        if retry_queue is not None and is_gitlab:
+            push_document.notify_push_failed(issue_ids, exc)
+        raise
+    return True
+
+
+@timed()
+def run_success_stage(issue_infos: list[IssueInfo], token: str) -> None:
+    """流水线的第三步：发送归档成功评论，各issue的评论互不依赖，同时发送"""
+    from archiving_success import send_archived_success_comment
+
+    with ThreadPoolExecutor(
+        max_workers=max(min(len(issue_infos), MAX_COMMENT_WORKERS), 1)
+    ) as executor:
+        futures = [
+            (
+                issue_info,
+                executor.submit(
+                    send_archived_success_comment,
+                    issue_info,
+                    token,
+                    issue_info.issue_repository,
+                ),
+            )
+            for issue_info in issue_infos
+        ]
+    # 等待所有评论发送完毕后逐个检查结果，
+    # 某个issue失败不影响其他issue，全部输出错误后抛出第一个错误
+    first_exc: Exception | None = None
+    for issue_info, future in futures:
+        try:
+            future.result()
+        except Exception as exc:
+            print(
+                Log.send_archived_success_comment_failed.format(
+                    issue_repository=issue_info.issue_repository,
+                    issue_id=issue_info.issue_id,
+                    exc=repr(exc),
+                )
+            )
+            if first_exc is None:
+                first_exc = exc
+    if first_exc is not None:
+        raise first_exc
+
+
+def run_pipeline(
+    issue_info: IssueInfo,
+    platform: GitServiceClient,
+    config: Config,
+) -> bool:
+    """在同一个进程内依次执行归档、推送和发送归档成功评论，
+    三个阶段共用同一个issue信息对象和按主机复用的HTTP连接，
+    不需要通过issue信息json文件在进程之间传递。返回是否归档成功"""
+    retry_queue = init_retry_queue(config)
+    if not run_archive_stage(issue_info, platform, config, retry_queue):
+        return False
+    if not run_push_stage(
+        [issue_info], config.archived_document.table_separator, retry_queue
+    ):
+        return False
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # 归档成功评论与输出issue信息文件互不依赖，同时进行
+        future = executor.submit(
+            run_success_stage, [issue_info], os.environ[Env.TOKEN]
+        )
+        # 输出issue信息文件以便排查问题，与分开执行脚本时一致
+        issue_info.json_dump(config.issue_output_path)
+        future.result()
+    return True
+
+
+def init_pipeline() -> tuple[IssueInfo, GitServiceClient, Config] | None:
+    """读取命令行参数和环境变量，初始化配置、平台客户端和issue信息，
+    不需要执行归档流程时返回None"""
+    if os.environ[Env.CI_EVENT_TYPE] in CiEventType.manual:
+        print(Log.running_ci_by_manual)
+    else:
+        print(Log.running_ci_by_automated)
+
+    if should_run_in_local():
+        print(Log.non_platform_action_env)
+        from dotenv import load_dotenv
+
+        load_dotenv()
+
+    test_platform_type = get_value_from_args(
+        short_arg="-pt",
+        long_arg="--platform-type",
+    )
+    config_path = get_value_from_args(
+        short_arg="-c",
+        long_arg="--config",
+    )
+
+    if config_path is None:
+        print(Log.config_path_not_found)
+        return None
+
+    if not GitlabClient.should_issue_type_webhook():
+        return None
+
+    config = IssueProcessor.init_config(
+        ConfigManager([EnvConfigDataSource(), JsonConfigDataSource(config_path)])
+    )
+
+    platform = IssueProcessor.init_git_service_client(test_platform_type, config)
+
+    try:
+        issue_info = IssueProcessor.init_issue_info(platform)
+    except WebhookPayloadError:
+        platform.close()
+        return None
+    return issue_info, platform, config
+
+
+def main() -> None:
+    start_time = time.time()
+
+    initialized = init_pipeline()
+    if initialized is None:
+        return
+    issue_info, platform, config = initialized
+
+    try:
+        run_pipeline(issue_info, platform, config)
+    finally:
+        platform.close()
+
+        get_metrics().save(get_metrics_path(config.issue_output_path))
+
+        print(Log.time_used.format(time="{:.4f}".format(time.time() - start_time)))
+
+        print(Log.job_done)
+
+
+if __name__ == "__main__":
+    main()
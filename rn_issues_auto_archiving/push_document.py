@@ -1,29 +1,92 @@
 import os
 import json
+import base64
+from http import HTTPStatus
 from pathlib import Path
-import hashlib
+from dataclasses import dataclass
 
 import httpx
 
+from auto_archiving.archive_document import ArchiveDocument
+from auto_archiving.archive_index import DEFAULT_TABLE_SEPARATOR
 from shared.env import Env
 from shared.log import Log
-from shared.exception import ErrorMessage
+from shared.exception import ErrorMessage, PushConflictError
 from shared.send_comment import send_comment
 from shared.reopen_issue import reopen_issue
 from shared.http_request import http_request
+from shared.atomic_write import atomic_write_text
+from shared.file_sha256 import (
+    get_content_sha256,
+    read_file_with_sha256,
+)
 from issue_processor.git_service_client import GitlabClient
-from shared.issue_info import IssueInfoJson
+from shared.issue_info import IssueInfo
 
+MAX_PUSH_ATTEMPTS = 5
+"""提交时文件已经被其他流水线修改过，重新获取并写入本次归档内容的最大次数"""
 
-def get_issue_id_from_issue_info(webhook_path: str) -> int:
+FILE_CHANGED_MESSAGE = "has changed since you started editing it"
+"""gitlab在last_commit_id与文件最后一次提交不一致时返回的错误信息"""
+
+
+@dataclass
+class RemoteFileMetadata:
+    sha256: str | None
+    last_commit_id: str | None
+
+
+@dataclass
+class CommitAction:
+    file_path: str
+    content: str
+    action: str = "update"
+    """文件不存在时为create"""
+    last_commit_id: str | None = None
+
+
+@dataclass
+class RemoteFile:
+    content: str
+    sha256: str
+    last_commit_id: str
+
+
+def get_sync_path(document_path: str) -> str:
+    """记录本地归档文件与远程仓库哪次提交一致的sidecar文件"""
+    return document_path + ".sync.json"
+
+
+def load_synced_commit_id(document_path: str) -> str | None:
+    """返回本地归档文件上一次推送（或与远程仓库同步）时的提交，
+    文件不存在或已经损坏时返回None"""
     try:
-        payload: IssueInfoJson = json.loads(
-            Path(webhook_path).read_text(encoding="utf-8")
+        raw_json = json.loads(
+            Path(get_sync_path(document_path)).read_text(encoding="utf-8")
         )
-        return payload["issue_id"]
+        commit_id = raw_json["last_commit_id"]
+        return commit_id if isinstance(commit_id, str) and commit_id != "" else None
+    except (OSError, KeyError, TypeError, ValueError):
+        return None
+
+
+def save_synced_commit_id(document_path: str, commit_id: str) -> None:
+    """写入失败不影响推送结果，下次推送时先获取远程文件即可"""
+    sync_path = get_sync_path(document_path)
+    try:
+        atomic_write_text(sync_path, json.dumps({"last_commit_id": commit_id}))
+    except OSError as exc:
+        print(Log.save_synced_commit_failed.format(sync_path=sync_path, exc=exc))
+
+
+def load_issue_info(issue_output_path: str) -> IssueInfo | None:
+    try:
+        issue_info = IssueInfo()
+        issue_info.json_load(issue_output_path)
+        return issue_info
     except FileNotFoundError:
         print(Log.issue_output_not_found_skip_push)
-        return -1
+        return None
 
 
 def should_no_change(
@@ -33,114 +96,224 @@ def should_no_change(
     return local_sha256 == remote_sha256
 
 
-def get_file_sha256(file_path: str) -> str:
-    print(Log.get_local_file_sha256.format(file_path=file_path))
-    # 不能直接把read_bytes的内容去计算sha256
-    # 即使两边内容一样，read_bytes算出来的sha256与
-    # 远端文件的sha256值还是不一致的
-    # 用utf-8编码读取再用utf-8去解码就能和远端文件sha256值一致
-    result = hashlib.sha256(
-        string=Path(file_path).read_text(encoding="utf-8").encode("utf-8"),
-        usedforsecurity=True,
-    ).hexdigest()
-    print(
-        Log.get_local_file_sha256_success.format(file_path=file_path, sha256=result),
-    )
-    return result
-
-
-def get_remote_file_sha256(
+def get_remote_file_metadata(
     http_header: dict[str, str],
     gitlab_host: str,
     project_id: int,
     file_path: str,
-    branch_name: str,
-) -> str:
-    """获取某仓库某分支下某文件的元数据：
+    ref: str,
+) -> RemoteFileMetadata:
+    """获取某仓库某分支（或某次提交）下某文件的元数据：
     https://docs.gitlab.com/ee/api/repository_files.html#get-file-metadata-only"""
     print(Log.get_remote_file_sha256.format(file_path=file_path))
 
     response: httpx.Response = http_request(
         method="HEAD",
-        url=f"https://{gitlab_host}/api/v4/projects/{project_id}/repository/files/{file_path}?ref={branch_name}",
+        url=f"https://{gitlab_host}/api/v4/projects/{project_id}/repository/files/{file_path}?ref={ref}",
         headers=http_header,
     )
-    result = response.headers.get("X-Gitlab-Content-Sha256")
-    print(Log.get_remote_file_sha256_success.format(file_path=file_path, sha256=result))
+    result = RemoteFileMetadata(
+        sha256=response.headers.get("X-Gitlab-Content-Sha256"),
+        last_commit_id=response.headers.get("X-Gitlab-Last-Commit-Id"),
+    )
+    print(
+        Log.get_remote_file_sha256_success.format(
+            file_path=file_path, sha256=result.sha256
+        )
+    )
     return result
 
 
-def push_document(
+def get_remote_file(
     http_header: dict[str, str],
     gitlab_host: str,
     project_id: int,
     file_path: str,
-    file_content: str,
-    branch_name: str,
-    author_email: str,
-    author_name: str,
-    commit_message: str,
-) -> None:
-    """更新仓库内文件的文档：
-    https://docs.gitlab.com/ee/api/repository_files.html#update-existing-file-in-repository
-    """
-    print(Log.pushing_document)
-    http_request(
-        headers=http_header,
-        method="PUT",
+    ref: str,
+) -> RemoteFile:
+    """获取某仓库某分支下某文件的内容和元数据：
+    https://docs.gitlab.com/ee/api/repository_files.html#get-file-from-repository"""
+    print(Log.get_remote_file.format(file_path=file_path))
+    response: httpx.Response = http_request(
+        method="GET",
         url=f"https://{gitlab_host}/api/v4/projects/{project_id}/repository/files/{file_path}",
-        json_content={
-            "branch": branch_name,
-            "author_email": author_email,
-            "author_name": author_name,
-            "content": file_content,
-            "commit_message": commit_message,
-        },
+        params={"ref": ref},
+        headers=http_header,
+    )
+    payload = response.json()
+    return RemoteFile(
+        content=base64.b64decode(payload["content"]).decode("utf-8"),
+        sha256=payload["content_sha256"],
+        last_commit_id=payload["last_commit_id"],
     )
-    print(Log.pushing_document_success)
 
 
-def main():
-    issue_id = get_issue_id_from_issue_info(os.environ[Env.ISSUE_OUTPUT_PATH])
-    if issue_id == -1:
-        return
+class CommitBuilder:
+    """把多个文件的修改合并成一次提交：
+    https://docs.gitlab.com/ee/api/commits.html#create-a-commit-with-multiple-files-and-actions \n
+    一次请求中的所有文件要么全部提交成功，要么全部不提交。
+    与远程仓库内容一致的文件不会加入提交，所有文件都一致时不发送提交请求
+    """
 
-    archived_document_path = os.environ[Env.ARCHIVED_DOCUMENT_PATH]
-    gitlab_host = os.environ[Env.GITLAB_HOST]
-    project_id = int(os.environ[Env.PROJECT_ID])
-    token = os.environ[Env.TOKEN]
-    http_header = GitlabClient.create_http_header(token)
+    def __init__(
+        self,
+        http_header: dict[str, str],
+        gitlab_host: str,
+        project_id: int,
+        branch_name: str,
+    ):
+        self.http_header = http_header
+        self.gitlab_host = gitlab_host
+        self.project_id = project_id
+        self.branch_name = branch_name
+        self.actions: list[CommitAction] = []
 
-    try:
-        local_sha256 = get_file_sha256(archived_document_path)
-        remote_sha256 = get_remote_file_sha256(
-            http_header,
-            gitlab_host,
-            project_id,
-            archived_document_path,
-            os.environ[Env.TARGET_BRANCH],
-        )
-        if should_no_change(local_sha256, remote_sha256):
-            print(
-                Log.not_need_to_push_document.format(file_path=archived_document_path)
+    def add_file(
+        self,
+        file_path: str,
+        content: str,
+        metadata: RemoteFileMetadata | None = None,
+    ) -> bool:
+        """metadata为None时从目标分支获取文件的元数据，
+        传入metadata时以它的sha256和last_commit_id为准。\n
+        文件与远程仓库一致时返回False，不会加入提交"""
+        if metadata is None:
+            try:
+                metadata = get_remote_file_metadata(
+                    self.http_header,
+                    self.gitlab_host,
+                    self.project_id,
+                    file_path,
+                    self.branch_name,
+                )
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code != HTTPStatus.NOT_FOUND:
+                    raise
+                self.actions.append(CommitAction(file_path, content, "create"))
+                return True
+        if metadata.sha256 is not None and should_no_change(
+            get_content_sha256(content), metadata.sha256
+        ):
+            print(Log.not_need_to_push_document.format(file_path=file_path))
+            return False
+        print(Log.need_to_push_document.format(file_path=file_path))
+        # 已有的同一个文件以最后一次添加的内容为准
+        self.actions = [
+            action for action in self.actions if action.file_path != file_path
+        ]
+        self.actions.append(
+            CommitAction(
+                file_path, content, last_commit_id=metadata.last_commit_id
             )
-            return
-        else:
-            print(Log.need_to_push_document.format(file_path=archived_document_path))
+        )
+        return True
 
-        push_document(
-            http_header,
-            gitlab_host,
-            project_id,
-            archived_document_path,
-            Path(archived_document_path).read_text("utf-8"),
-            os.environ[Env.TARGET_BRANCH],
-            os.environ["author_email"],
-            os.environ["author_name"],
-            os.environ["commit_message"].format(issue_id=issue_id),
+    def commit(
+        self,
+        commit_message: str,
+        author_email: str,
+        author_name: str,
+    ) -> str | None:
+        """提交所有文件，返回新提交的id，没有需要提交的文件时返回None"""
+        if len(self.actions) == 0:
+            print(Log.no_file_to_commit)
+            return None
+        print(Log.committing_files.format(count=len(self.actions)))
+        actions: list[dict[str, str]] = []
+        for commit_action in self.actions:
+            action = {
+                "action": commit_action.action,
+                "file_path": commit_action.file_path,
+                "content": commit_action.content,
+            }
+            if commit_action.last_commit_id is not None:
+                action["last_commit_id"] = commit_action.last_commit_id
+            actions.append(action)
+        response = http_request(
+            headers=self.http_header,
+            method="POST",
+            url=f"https://{self.gitlab_host}/api/v4/projects/{self.project_id}/repository/commits",
+            json_content={
+                "branch": self.branch_name,
+                "commit_message": commit_message,
+                "author_email": author_email,
+                "author_name": author_name,
+                "actions": actions,
+            },
+            # 提交请求可能已经成功，重复发送会产生多余的提交，
+            # 所有文件都带上last_commit_id（或者是新建文件）时，
+            # 重复发送的请求只会因为文件已经变化（或已经存在）而失败
+            idempotent=all(
+                action.last_commit_id is not None or action.action == "create"
+                for action in self.actions
+            ),
         )
-    except Exception as exc:
-        print(Log.push_document_failed.format(exc=str(exc)))
+        self.actions = []
+        print(Log.pushing_document_success)
+        return response.json().get("id")
+
+
+def is_push_conflict(exc: Exception) -> bool:
+    if not isinstance(exc, httpx.HTTPStatusError):
+        return False
+    if exc.response.status_code == HTTPStatus.CONFLICT:
+        return True
+    return (
+        exc.response.status_code == HTTPStatus.BAD_REQUEST
+        and FILE_CHANGED_MESSAGE in exc.response.text
+    )
+
+
+def get_record_lines(
+    file_path: str, issue_infos: list[IssueInfo], table_separator: str
+) -> list[tuple[IssueInfo, str]]:
+    """从本地归档文件中取出本次归档的issue的记录行"""
+    archive_document = ArchiveDocument()
+    archive_document.file_load(file_path, table_separator)
+    record_lines: list[tuple[IssueInfo, str]] = []
+    for issue_info in issue_infos:
+        line = archive_document.find_record_line(
+            issue_info.issue_repository, issue_info.issue_id
+        )
+        if line is not None:
+            record_lines.append((issue_info, line))
+    return record_lines
+
+
+def rebase_document(
+    file_path: str,
+    remote_content: str,
+    record_lines: list[tuple[IssueInfo, str]],
+    table_separator: str,
+) -> None:
+    """用远程仓库的最新内容替换本地归档文件，再重新写入本次归档的记录行，
+    新行的归档序号接着远程文件最后一行递增"""
+    atomic_write_text(file_path, remote_content)
+    archive_document = ArchiveDocument()
+    archive_document.file_load(file_path, table_separator)
+    for issue_info, line in record_lines:
+        archive_document.apply_record_line(
+            issue_info.issue_repository, issue_info.issue_id, line
+        )
+    archive_document.save()
+
+
+def build_commit_message(commit_message: str, issue_ids: list[int]) -> str:
+    """只有一个issue时与原来的提交信息一致，
+    合并提交多个issue时标题中列出所有issue单号，正文中每个issue一行"""
+    if len(issue_ids) == 1:
+        return commit_message.format(issue_id=issue_ids[0])
+    title = commit_message.format(issue_id=",".join(map(str, issue_ids)))
+    body = "\n".join(commit_message.format(issue_id=issue_id) for issue_id in issue_ids)
+    return f"{title}\n\n{body}"
+
+
+def notify_push_failed(issue_ids: list[int], exc: Exception) -> None:
+    """推送失败时重新打开本次归档的所有issue并发送告警评论"""
+    gitlab_host = os.environ[Env.GITLAB_HOST]
+    project_id = int(os.environ[Env.PROJECT_ID])
+    http_header = GitlabClient.create_http_header(os.environ[Env.TOKEN])
+    for issue_id in issue_ids:
         base_url = (
             f"https://{gitlab_host}/api/v4/projects/{project_id}/issues/{issue_id}"
         )
@@ -155,8 +328,138 @@ def main():
             comment_url=f"{base_url}/notes",
             message=ErrorMessage.push_document_failed.format(exc=str(exc)),
         )
+
+
+def push_archived_document(
+    issue_infos: list[IssueInfo],
+    table_separator: str = DEFAULT_TABLE_SEPARATOR,
+    notify_failure: bool = True,
+) -> None:
+    """将归档文件推送到文档仓库，推送失败时重新打开本次归档的所有issue并发送告警评论，
+    notify_failure为False时由调用方处理推送失败。\n
+    本地归档文件基于流水线检出的提交（CI_COMMIT_SHA），
+    不在流水线中运行时（webhook服务、手动执行对账或重试）基于上一次推送时记录的提交，
+    提交时带上这个版本的last_commit_id，
+    文件在这之后被其他流水线修改过时，重新获取远程文件并写入本次归档的记录行后再提交，
+    多个归档流水线可以同时运行而不会覆盖彼此的内容。\n
+    不知道本地文件基于哪次提交时不能以目标分支为准，
+    否则会用本地的旧内容覆盖远程仓库中的修改，只能先获取远程文件再写入本次归档的记录行
+    """
+    archived_document_path = os.environ[Env.ARCHIVED_DOCUMENT_PATH]
+    gitlab_host = os.environ[Env.GITLAB_HOST]
+    project_id = int(os.environ[Env.PROJECT_ID])
+    token = os.environ[Env.TOKEN]
+    branch_name = os.environ[Env.TARGET_BRANCH]
+    http_header = GitlabClient.create_http_header(token)
+    issue_ids = [issue_info.issue_id for issue_info in issue_infos]
+
+    try:
+        content, local_sha256 = read_file_with_sha256(archived_document_path)
+        base_commit_id = os.environ.get(Env.CI_COMMIT_SHA) or load_synced_commit_id(
+            archived_document_path
+        )
+        last_commit_id: str | None = None
+        should_rebase = base_commit_id is None
+        if base_commit_id is None:
+            print(
+                Log.document_base_commit_unknown.format(
+                    sync_path=get_sync_path(archived_document_path),
+                    file_path=archived_document_path,
+                )
+            )
+        else:
+            metadata = get_remote_file_metadata(
+                http_header,
+                gitlab_host,
+                project_id,
+                archived_document_path,
+                base_commit_id,
+            )
+            if should_no_change(local_sha256, metadata.sha256):
+                print(
+                    Log.not_need_to_push_document.format(
+                        file_path=archived_document_path
+                    )
+                )
+                return
+            print(Log.need_to_push_document.format(file_path=archived_document_path))
+            last_commit_id = metadata.last_commit_id
+
+        record_lines: list[tuple[IssueInfo, str]] | None = None
+        commit_builder = CommitBuilder(
+            http_header, gitlab_host, project_id, branch_name
+        )
+        for attempt in range(MAX_PUSH_ATTEMPTS):
+            if should_rebase:
+                # 本地文件被替换之前先取出本次归档的记录行
+                if record_lines is None:
+                    record_lines = get_record_lines(
+                        archived_document_path, issue_infos, table_separator
+                    )
+                remote_file = get_remote_file(
+                    http_header,
+                    gitlab_host,
+                    project_id,
+                    archived_document_path,
+                    branch_name,
+                )
+                last_commit_id = remote_file.last_commit_id
+                rebase_document(
+                    archived_document_path,
+                    remote_file.content,
+                    record_lines,
+                    table_separator,
+                )
+                content, local_sha256 = read_file_with_sha256(archived_document_path)
+                if should_no_change(local_sha256, remote_file.sha256):
+                    # 远程文件中已经有本次归档的内容，例如上一次提交其实已经成功了
+                    print(
+                        Log.not_need_to_push_document.format(
+                            file_path=archived_document_path
+                        )
+                    )
+                    save_synced_commit_id(archived_document_path, last_commit_id)
+                    return
+            try:
+                # 本地内容与基准版本不一致，sha256设为None让它一定加入提交
+                commit_builder.add_file(
+                    archived_document_path,
+                    content,
+                    RemoteFileMetadata(sha256=None, last_commit_id=last_commit_id),
+                )
+                commit_id = commit_builder.commit(
+                    build_commit_message(os.environ["commit_message"], issue_ids),
+                    os.environ["author_email"],
+                    os.environ["author_name"],
+                )
+                if commit_id is not None:
+                    save_synced_commit_id(archived_document_path, commit_id)
+                return
+            except Exception as exc:
+                if not is_push_conflict(exc):
+                    raise
+                if attempt + 1 >= MAX_PUSH_ATTEMPTS:
+                    raise PushConflictError(str(exc)) from exc
+            print(Log.push_document_conflict.format(attempt=attempt + 1))
+            should_rebase = True
+    except Exception as exc:
+        print(Log.push_document_failed.format(exc=str(exc)))
+        if notify_failure:
+            notify_push_failed(issue_ids, exc)
         raise
 
 
+def main():
+    issue_info = load_issue_info(os.environ[Env.ISSUE_OUTPUT_PATH])
+    if issue_info is None:
+        return
+    # 归档流程没有修改归档文件时不需要获取远程文件的元数据
+    if not issue_info.should_document_changed():
+        print(Log.document_not_changed_skip_push)
+        return
+
+    push_archived_document([issue_info])
+
+
 if __name__ == "__main__":
     main()
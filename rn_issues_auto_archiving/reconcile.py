@@ -0,0 +1,425 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from issue_processor.git_service_client import GitServiceClient, Issue
+from issue_processor.issues_processor import IssueProcessor
+from auto_archiving.archive_document import ArchiveDocument
+from shared.config_manager import ConfigManager
+from shared.config_data_source import EnvConfigDataSource, JsonConfigDataSource
+from shared.ci_event_type import CiEventType
+from shared.archive_status import ArchiveStatus
+from shared.issue_info import IssueInfo
+from shared.json_config import Config
+from shared.json_dumps import json_dumps
+from shared.env import Env, should_run_in_local
+from shared.get_args import get_value_from_args
+from shared.log import Log
+from shared.scan_checkpoint import (
+    ScanCheckpoint,
+    ScanCheckpointIssueJson,
+    get_issue_content_sha256,
+)
+from batch_archiving import BatchResultJson, save_batch_report
+from pipeline import save_archive_document, run_push_stage, write_issue_to_document
+
+REPORT_MODE = "report"
+"""只输出不在归档文件中的issue及其检查结果，不修改归档文件"""
+APPLY_MODE = "apply"
+"""将满足归档条件的issue写入归档文件并推送"""
+
+MAX_FETCH_WORKERS = 8
+"""同时获取issue评论的最大线程数"""
+
+
+def find_missing_issues(
+    issues: list[Issue],
+    issue_repository: str,
+    archive_document: ArchiveDocument,
+) -> list[Issue]:
+    """通过归档文件索引找出没有归档记录的issue"""
+    return [
+        issue
+        for issue in issues
+        if not archive_document.should_issue_record_exists(issue_repository, issue.id)
+    ]
+
+
+def init_issue_info_by_issue(platform: GitServiceClient, issue: Issue) -> IssueInfo:
+    """用列出的issue初始化issue_info并获取评论，
+    列表中已经有issue的标题、描述和标签，不需要再逐个获取issue信息"""
+    issue_info = IssueProcessor.init_issue_info_by_issue_id(platform, issue.id)
+    GitServiceClient.update_issue_info(issue_info, issue)
+    issue_info.issue_comments = platform.get_comments(issue_info.links.comment_url)
+    return issue_info
+
+
+def init_issue_info_by_checkpoint(
+    platform: GitServiceClient, issue_id: int
+) -> IssueInfo:
+    """增量扫描时没有被列出的issue只有检查点中的记录，需要逐个获取issue信息和评论"""
+    issue_info = IssueProcessor.init_issue_info_by_issue_id(platform, issue_id)
+    platform.enrich_missing_issue_info(issue_info)
+    return issue_info
+
+
+def fetch_issue_infos(
+    platform: GitServiceClient,
+    issues: list[Issue | int],
+    max_workers: int = MAX_FETCH_WORKERS,
+) -> list[IssueInfo | Exception]:
+    """并发获取各issue的评论，结果与issues的顺序一致，
+    获取失败的issue返回对应的异常，不影响其他issue。\n
+    issues中的int是检查点中没有被列出的issue单号，需要同时获取issue信息"""
+
+    def fetch(issue: Issue | int) -> IssueInfo | Exception:
+        try:
+            if isinstance(issue, Issue):
+                return init_issue_info_by_issue(platform, issue)
+            return init_issue_info_by_checkpoint(platform, issue)
+        except Exception as exc:
+            return exc
+
+    with ThreadPoolExecutor(
+        max_workers=max(min(len(issues), max_workers), 1)
+    ) as executor:
+        return list(executor.map(fetch, issues))
+
+
+def check_issue_info(issue_info: IssueInfo, config: Config) -> str:
+    """按归档流程检查issue是否满足归档条件，不会关闭、重新打开issue或发送评论，
+    满足归档条件时返回 ArchiveStatus.pending"""
+    if IssueProcessor.should_skip_archived_process(
+        issue_info, config.skip_archived_comment_matcher
+    ):
+        return ArchiveStatus.skipped
+    if IssueProcessor.verify_not_archived_object(issue_info, config):
+        return ArchiveStatus.not_archived_object
+    IssueProcessor.update_issue_info_with_gather_info(
+        issue_info, IssueProcessor.gather_info_from_issue(issue_info, config)
+    )
+    IssueProcessor.parse_issue_info_for_archived(issue_info, config)
+    return ArchiveStatus.pending
+
+
+def should_use_checkpoint_result(
+    checkpoint_issue: ScanCheckpointIssueJson | None, mode: str
+) -> bool:
+    """apply模式下满足归档条件的issue需要完整的issue信息才能写入归档文件，
+    不能直接使用上次的检查结果"""
+    return checkpoint_issue is not None and not (
+        mode == APPLY_MODE and checkpoint_issue["status"] == ArchiveStatus.pending
+    )
+
+
+def print_result(result: BatchResultJson) -> None:
+    print(
+        Log.reconcile_issue_result.format(
+            issue_repository=result["issue_repository"],
+            issue_id=result["issue_id"],
+            status=result["status"],
+            message=result["message"],
+        )
+    )
+
+
+def load_checkpoint_results(
+    issues: list[Issue],
+    issue_repository: str,
+    archive_document: ArchiveDocument,
+    checkpoint: ScanCheckpoint,
+    updated_after: str | None,
+    mode: str = REPORT_MODE,
+) -> tuple[list[BatchResultJson], list[int]]:
+    """清理检查点中已经归档的issue，全量扫描时同时清理没有被列出的issue
+    （例如重新打开或者去掉了标签）；
+    增量扫描时没有更新过的issue不会被列出，返回它们上次的检查结果，
+    以及apply模式下需要重新获取后写入归档文件的issue单号"""
+    listed_issue_ids = {issue.id for issue in issues}
+    results: list[BatchResultJson] = []
+    pending_issue_ids: list[int] = []
+    for issue_id in checkpoint.get_issue_ids(issue_repository):
+        if archive_document.should_issue_record_exists(issue_repository, issue_id) or (
+            updated_after is None and issue_id not in listed_issue_ids
+        ):
+            checkpoint.remove_issue(issue_repository, issue_id)
+            continue
+        checkpoint_issue = checkpoint.get_issue(issue_repository, issue_id)
+        if issue_id in listed_issue_ids or checkpoint_issue is None:
+            continue
+        if not should_use_checkpoint_result(checkpoint_issue, mode):
+            pending_issue_ids.append(issue_id)
+        else:
+            results.append(
+                BatchResultJson(
+                    issue_id=issue_id,
+                    issue_repository=issue_repository,
+                    status=checkpoint_issue["status"],
+                    message=checkpoint_issue["message"],
+                )
+            )
+    return results, pending_issue_ids
+
+
+def get_scan_cursor(issues: list[Issue], failed_issue_ids: set[int]) -> str | None:
+    """since和updated_after都包含边界，
+    有issue获取失败时停在最早失败的issue，下次扫描会重新列出它"""
+    failed_updated_ats = [
+        issue.updated_at
+        for issue in issues
+        if issue.id in failed_issue_ids and issue.updated_at != ""
+    ]
+    if failed_updated_ats:
+        return min(failed_updated_ats)
+    return get_latest_updated_at(issues)
+
+
+def reconcile_issues(
+    issues: list[Issue],
+    platform: GitServiceClient,
+    config: Config,
+    archive_document: ArchiveDocument,
+    mode: str = REPORT_MODE,
+    max_workers: int = MAX_FETCH_WORKERS,
+    checkpoint: ScanCheckpoint | None = None,
+    updated_after: str | None = None,
+) -> tuple[list[BatchResultJson], list[IssueInfo]]:
+    """检查不在归档文件中的issue，apply模式下将满足归档条件的issue写入归档文件（内存中），
+    返回各issue的检查结果和写入归档文件的issue。\n
+    传入检查点时，更新时间或者标签和评论都没有变化的issue直接使用上次的检查结果，
+    不需要重新获取评论或者重新判断是否满足归档条件"""
+    issue_repository = os.environ[Env.ISSUE_REPOSITORY]
+    missing_issues = find_missing_issues(issues, issue_repository, archive_document)
+    print(Log.reconcile_start.format(count=len(issues), missing=len(missing_issues)))
+
+    results: list[BatchResultJson] = []
+    fetch_issues: list[Issue | int] = []
+    if checkpoint is not None:
+        checkpoint_results, pending_issue_ids = load_checkpoint_results(
+            issues, issue_repository, archive_document, checkpoint, updated_after, mode
+        )
+        results.extend(checkpoint_results)
+        fetch_issues.extend(pending_issue_ids)
+
+    for issue in missing_issues:
+        checkpoint_issue = (
+            checkpoint.get_issue(issue_repository, issue.id) if checkpoint else None
+        )
+        if (
+            should_use_checkpoint_result(checkpoint_issue, mode)
+            and checkpoint_issue is not None
+            and checkpoint_issue["updated_at"] == issue.updated_at
+        ):
+            results.append(
+                BatchResultJson(
+                    issue_id=issue.id,
+                    issue_repository=issue_repository,
+                    status=checkpoint_issue["status"],
+                    message=checkpoint_issue["message"],
+                )
+            )
+        else:
+            fetch_issues.append(issue)
+
+    archived_issue_infos: list[IssueInfo] = []
+    failed_issue_ids: set[int] = set()
+    fetched = fetch_issue_infos(platform, fetch_issues, max_workers)
+    for issue, issue_info in zip(fetch_issues, fetched):
+        issue_id = issue.id if isinstance(issue, Issue) else issue
+        result = BatchResultJson(
+            issue_id=issue_id,
+            issue_repository=issue_repository,
+            status=ArchiveStatus.failed,
+            message="",
+        )
+        checkpoint_issue = (
+            checkpoint.get_issue(issue_repository, issue_id) if checkpoint else None
+        )
+        content_sha256 = ""
+        try:
+            if isinstance(issue_info, Exception):
+                failed_issue_ids.add(issue_id)
+                raise issue_info
+            content_sha256 = get_issue_content_sha256(issue_info)
+            if (
+                should_use_checkpoint_result(checkpoint_issue, mode)
+                and checkpoint_issue is not None
+                and checkpoint_issue["content_sha256"] == content_sha256
+            ):
+                # 只修改了标题等内容，标签和评论都没有变化，检查结果不变
+                result["status"] = checkpoint_issue["status"]
+                result["message"] = checkpoint_issue["message"]
+            else:
+                result["status"] = check_issue_info(issue_info, config)
+            if result["status"] == ArchiveStatus.pending and mode == APPLY_MODE:
+                result["status"] = write_issue_to_document(
+                    issue_info, platform, config, archive_document
+                )
+                if result["status"] == ArchiveStatus.archived:
+                    archived_issue_infos.append(issue_info)
+        except Exception as exc:
+            result["status"] = ArchiveStatus.failed
+            result["message"] = str(exc)
+        print_result(result)
+        results.append(result)
+
+        if checkpoint is None:
+            continue
+        if result["status"] == ArchiveStatus.archived:
+            checkpoint.remove_issue(issue_repository, issue_id)
+        elif not isinstance(issue, Issue):
+            # 没有被列出的issue之后也不会被列出，获取失败时保留检查点中的记录，
+            # 下次apply时重新获取
+            if content_sha256 != "" and checkpoint_issue is not None:
+                checkpoint.set_issue(
+                    issue_repository,
+                    issue_id,
+                    ScanCheckpointIssueJson(
+                        updated_at=checkpoint_issue["updated_at"],
+                        content_sha256=content_sha256,
+                        status=result["status"],
+                        message=result["message"],
+                    ),
+                )
+        else:
+            checkpoint.set_issue(
+                issue_repository,
+                issue_id,
+                ScanCheckpointIssueJson(
+                    # 获取评论失败时不记录更新时间，下次扫描时重新获取
+                    updated_at=issue.updated_at if content_sha256 != "" else "",
+                    content_sha256=content_sha256,
+                    status=result["status"],
+                    message=result["message"],
+                ),
+            )
+
+    if checkpoint is not None:
+        cursor = get_scan_cursor(issues, failed_issue_ids)
+        if cursor is not None:
+            checkpoint.set_cursor(issue_repository, cursor)
+    return results, archived_issue_infos
+
+
+def get_latest_updated_at(issues: list[Issue]) -> str | None:
+    """ISO 8601格式的时间可以直接按字符串比较"""
+    updated_ats = [issue.updated_at for issue in issues if issue.updated_at != ""]
+    return max(updated_ats) if updated_ats else None
+
+
+def main() -> None:
+    start_time = time.time()
+
+    if should_run_in_local():
+        print(Log.non_platform_action_env)
+        from dotenv import load_dotenv
+
+        load_dotenv()
+
+    test_platform_type = get_value_from_args(
+        short_arg="-pt",
+        long_arg="--platform-type",
+    )
+    config_path = get_value_from_args(
+        short_arg="-c",
+        long_arg="--config",
+    )
+    updated_after = get_value_from_args(
+        short_arg="-s",
+        long_arg="--since",
+    )
+    mode = get_value_from_args(
+        short_arg="-m",
+        long_arg="--mode",
+    )
+    max_workers = get_value_from_args(
+        short_arg="-w",
+        long_arg="--workers",
+    )
+    report_path = get_value_from_args(
+        short_arg="-r",
+        long_arg="--report",
+    )
+    checkpoint_path = get_value_from_args(
+        short_arg="-cp",
+        long_arg="--checkpoint",
+    )
+
+    if config_path is None:
+        print(Log.config_path_not_found)
+        return
+
+    mode = mode or REPORT_MODE
+    if mode not in (REPORT_MODE, APPLY_MODE):
+        print(Log.reconcile_mode_error.format(mode=mode))
+        return
+
+    # 对账相当于对每个缺失的issue执行一次手动归档流程
+    if not CiEventType.should_ci_running_in_manual():
+        print(Log.reconcile_need_manual)
+        return
+
+    config = IssueProcessor.init_config(
+        ConfigManager([EnvConfigDataSource(), JsonConfigDataSource(config_path)])
+    )
+
+    platform = IssueProcessor.init_git_service_client(test_platform_type, config)
+
+    checkpoint: ScanCheckpoint | None = None
+    if checkpoint_path is not None:
+        checkpoint = ScanCheckpoint(checkpoint_path)
+        checkpoint.load()
+        # apply模式下没有被列出但上次检查满足归档条件的issue，
+        # 会根据检查点中的记录逐个重新获取
+        if updated_after is None:
+            updated_after = checkpoint.get_cursor(os.environ[Env.ISSUE_REPOSITORY])
+
+    results: list[BatchResultJson] = []
+    try:
+        issues = platform.list_closed_issues(
+            IssueProcessor.init_issues_url(platform),
+            config.archive_necessary_labels,
+            updated_after,
+        )
+
+        archive_document = ArchiveDocument()
+        archive_document.file_load_tail(
+            config.archived_document_path, config.archived_document.table_separator
+        )
+        results, archived_issue_infos = reconcile_issues(
+            issues,
+            platform,
+            config,
+            archive_document,
+            mode,
+            int(max_workers) if max_workers is not None else MAX_FETCH_WORKERS,
+            checkpoint,
+            updated_after,
+        )
+        if archived_issue_infos:
+            save_archive_document(
+                archive_document, archived_issue_infos, config.archived_document_path
+            )
+            run_push_stage(
+                archived_issue_infos, config.archived_document.table_separator
+            )
+        if checkpoint is not None:
+            checkpoint.save()
+
+        latest_updated_at = get_latest_updated_at(issues)
+        if latest_updated_at is not None:
+            print(Log.reconcile_next_since.format(updated_at=latest_updated_at))
+    finally:
+        platform.close()
+
+        print(Log.reconcile_summary.format(summary=json_dumps(results)))
+        if report_path is not None:
+            save_batch_report(results, report_path)
+
+        print(Log.time_used.format(time="{:.4f}".format(time.time() - start_time)))
+
+        print(Log.job_done)
+
+
+if __name__ == "__main__":
+    main()
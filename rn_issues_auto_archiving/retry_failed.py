@@ -0,0 +1,339 @@
+import os
+import time
+import datetime
+
+from issue_processor.git_service_client import GitServiceClient
+from issue_processor.issues_processor import IssueProcessor
+from auto_archiving.archive_document import ArchiveDocument
+from auto_archiving.failed_record import (
+    DATETIME_FORMAT,
+    FailedRecord,
+    FailedRecordJson,
+    get_attempts,
+    get_ci_event_type,
+)
+from shared.config_manager import ConfigManager
+from shared.config_data_source import EnvConfigDataSource, JsonConfigDataSource
+from shared.archive_status import ArchiveStatus
+from shared.issue_info import IssueInfo
+from shared.issue_state import IssueState, parse_issue_state
+from shared.json_config import Config
+from shared.json_dumps import json_dumps
+from shared.env import Env, should_run_in_local
+from shared.get_args import get_value_from_args
+from shared.log import Log
+from shared.exception import ArchiveBaseError, ErrorMessage
+from shared.transient_error import is_transient_error
+from batch_archiving import BatchResultJson, notify_archive_failed, save_batch_report
+from pipeline import (
+    run_push_stage,
+    run_success_stage,
+    save_archive_document,
+    write_issue_to_document,
+)
+
+RETRY_BASE_DELAY = datetime.timedelta(minutes=5)
+"""第一次重试前等待的时间，之后每次重试的等待时间翻倍"""
+RETRY_MAX_DELAY = datetime.timedelta(hours=6)
+
+
+def get_retry_time(record: FailedRecordJson) -> datetime.datetime:
+    """根据最后一次失败的时间和已经尝试的次数计算下一次重试的时间"""
+    delay = min(RETRY_BASE_DELAY * 2 ** (get_attempts(record) - 1), RETRY_MAX_DELAY)
+    return datetime.datetime.strptime(record["record_time"], DATETIME_FORMAT) + delay
+
+
+def get_due_records(
+    retry_queue: FailedRecord,
+    issue_repository: str,
+    now: datetime.datetime,
+) -> list[FailedRecordJson]:
+    records = [
+        record
+        for record in retry_queue.get_records()
+        if record["issue_repository"] == issue_repository
+    ]
+    due_records: list[FailedRecordJson] = []
+    for record in records:
+        retry_time = get_retry_time(record)
+        if retry_time <= now:
+            due_records.append(record)
+        else:
+            print(
+                Log.retry_not_due.format(
+                    issue_repository=issue_repository,
+                    issue_id=record["issue_id"],
+                    retry_time=retry_time.strftime(DATETIME_FORMAT),
+                )
+            )
+    print(Log.retry_start.format(count=len(records), due=len(due_records)))
+    return due_records
+
+
+def init_retry_issue_info(
+    platform: GitServiceClient, record: FailedRecordJson
+) -> IssueInfo:
+    """以记录中第一次归档失败时流水线的触发方式初始化issue_info，
+    不从平台获取issue信息"""
+    issue_info = IssueProcessor.init_issue_info_by_issue_id(
+        platform, int(record["issue_id"])
+    )
+    issue_info.ci_event_type = get_ci_event_type(record)
+    return issue_info
+
+
+def load_retry_issue_info(issue_info: IssueInfo, platform: GitServiceClient) -> None:
+    """从平台获取issue的最新状态、标题、描述、标签和评论，
+    入队之后issue可能已经被重新打开或者修改过"""
+    issue, issue_info.issue_comments = platform.get_issue_and_comments(
+        issue_info.links.issue_url, issue_info.links.comment_url
+    )
+    GitServiceClient.update_issue_info(issue_info, issue)
+    issue_info.update(
+        issue_state=parse_issue_state(issue.state),
+        issue_title=issue.title,
+        issue_body=issue.body,
+    )
+
+
+def check_retry_issue_info(issue_info: IssueInfo, config: Config) -> str:
+    """检查issue现在是否仍然需要归档，不会关闭、重新打开issue或发送评论，
+    需要写入归档文件时返回 ArchiveStatus.pending 。
+
+    手动归档时填写的归档版本号等内容没有记录在重试队列中，
+    所以不论第一次归档时的触发方式，issue都必须已经关闭并且满足自动归档的条件"""
+    if issue_info.issue_state != IssueState.closed:
+        print(
+            Log.retry_issue_not_closed.format(
+                issue_repository=issue_info.issue_repository,
+                issue_id=issue_info.issue_id,
+            )
+        )
+        return ArchiveStatus.not_archived_object
+    if IssueProcessor.should_skip_archived_process(
+        issue_info, config.skip_archived_comment_matcher
+    ):
+        print(
+            Log.retry_issue_skipped.format(
+                issue_repository=issue_info.issue_repository,
+                issue_id=issue_info.issue_id,
+            )
+        )
+        return ArchiveStatus.skipped
+    if not issue_info.should_archive_issue(
+        config.archive_version_comment_matcher,
+        config.raw_archive_version_reges_for_comments,
+        config.archive_necessary_labels,
+    ):
+        print(
+            Log.retry_issue_not_archived_object.format(
+                issue_repository=issue_info.issue_repository,
+                issue_id=issue_info.issue_id,
+            )
+        )
+        return ArchiveStatus.not_archived_object
+    IssueProcessor.update_issue_info_with_gather_info(
+        issue_info, IssueProcessor.gather_info_from_issue(issue_info, config)
+    )
+    IssueProcessor.parse_issue_info_for_archived(issue_info, config)
+    return ArchiveStatus.pending
+
+
+def remove_exhausted_record(
+    issue_info: IssueInfo,
+    platform: GitServiceClient,
+    retry_queue: FailedRecord,
+    max_attempts: int,
+) -> bool:
+    """已经达到最大尝试次数时停止重试，重新打开issue并发送告警评论，
+    返回是否已经停止重试"""
+    record = retry_queue.get_record(issue_info.issue_repository, issue_info.issue_id)
+    if record is None or get_attempts(record) < max_attempts:
+        return False
+    print(
+        Log.retry_exhausted.format(
+            issue_repository=issue_info.issue_repository,
+            issue_id=issue_info.issue_id,
+            attempts=get_attempts(record),
+        )
+    )
+    notify_archive_failed(
+        issue_info,
+        platform,
+        ArchiveBaseError(
+            ErrorMessage.retry_exhausted.format(
+                attempts=get_attempts(record), reason=record["reason"]
+            )
+        ),
+    )
+    retry_queue.remove_record(issue_info.issue_repository, issue_info.issue_id)
+    return True
+
+
+def retry_issues(
+    records: list[FailedRecordJson],
+    platform: GitServiceClient,
+    config: Config,
+    archive_document: ArchiveDocument,
+    retry_queue: FailedRecord,
+) -> tuple[list[BatchResultJson], list[IssueInfo]]:
+    """按第一次归档失败时流水线的触发方式重新归档重试队列中的issue，
+    写入同一个归档文件（内存中），返回各issue的处理结果和写入归档文件的issue。\n
+    已经被重新打开或者不再是归档对象的issue直接从重试队列中删除，不会修改issue；
+    写入归档文件的issue在推送成功后才从重试队列中删除；
+    issue内容不满足归档条件等非暂时性错误不再重试，重新打开issue并发送告警评论；
+    暂时性错误增加尝试次数，达到最大尝试次数后才重新打开issue"""
+    results: list[BatchResultJson] = []
+    archived_issue_infos: list[IssueInfo] = []
+    for record in records:
+        issue_info = init_retry_issue_info(platform, record)
+        result = BatchResultJson(
+            issue_id=issue_info.issue_id,
+            issue_repository=issue_info.issue_repository,
+            status=ArchiveStatus.failed,
+            message="",
+        )
+        try:
+            load_retry_issue_info(issue_info, platform)
+            result["status"] = check_retry_issue_info(issue_info, config)
+            if result["status"] == ArchiveStatus.pending:
+                result["status"] = write_issue_to_document(
+                    issue_info, platform, config, archive_document
+                )
+            if result["status"] == ArchiveStatus.archived:
+                archived_issue_infos.append(issue_info)
+            else:
+                retry_queue.remove_record(
+                    issue_info.issue_repository, issue_info.issue_id
+                )
+        except Exception as exc:
+            result["status"] = ArchiveStatus.failed
+            result["message"] = str(exc)
+            if is_transient_error(exc):
+                retry_queue.record_attempt(
+                    issue_info.issue_id,
+                    issue_info.issue_title or record["issue_title"],
+                    issue_info.issue_repository,
+                    str(exc),
+                    issue_info.ci_event_type,
+                )
+                remove_exhausted_record(
+                    issue_info, platform, retry_queue, config.retry_max_attempts
+                )
+            else:
+                notify_archive_failed(
+                    issue_info,
+                    platform,
+                    (
+                        exc
+                        if isinstance(exc, ArchiveBaseError)
+                        else ArchiveBaseError(
+                            ErrorMessage.archiving_failed.format(exc=str(exc))
+                        )
+                    ),
+                )
+                retry_queue.remove_record(
+                    issue_info.issue_repository, issue_info.issue_id
+                )
+        results.append(result)
+    return results, archived_issue_infos
+
+
+def push_retried_issues(
+    archived_issue_infos: list[IssueInfo],
+    platform: GitServiceClient,
+    config: Config,
+    retry_queue: FailedRecord,
+) -> None:
+    """将重新归档的issue合并成一次提交推送，推送成功后发送归档成功评论，
+    推送因为暂时性错误失败时这些issue留在重试队列中"""
+    try:
+        pushed = run_push_stage(
+            archived_issue_infos, config.archived_document.table_separator, retry_queue
+        )
+    except Exception:
+        # 推送失败时已经重新打开issue并发送了告警评论，不再重试
+        for issue_info in archived_issue_infos:
+            retry_queue.remove_record(issue_info.issue_repository, issue_info.issue_id)
+        raise
+    if not pushed:
+        for issue_info in archived_issue_infos:
+            remove_exhausted_record(
+                issue_info, platform, retry_queue, config.retry_max_attempts
+            )
+        return
+    for issue_info in archived_issue_infos:
+        retry_queue.remove_record(issue_info.issue_repository, issue_info.issue_id)
+    run_success_stage(archived_issue_infos, config.token)
+
+
+def main() -> None:
+    start_time = time.time()
+
+    if should_run_in_local():
+        print(Log.non_platform_action_env)
+        from dotenv import load_dotenv
+
+        load_dotenv()
+
+    test_platform_type = get_value_from_args(
+        short_arg="-pt",
+        long_arg="--platform-type",
+    )
+    config_path = get_value_from_args(
+        short_arg="-c",
+        long_arg="--config",
+    )
+    report_path = get_value_from_args(
+        short_arg="-r",
+        long_arg="--report",
+    )
+
+    if config_path is None:
+        print(Log.config_path_not_found)
+        return
+
+    config = IssueProcessor.init_config(
+        ConfigManager([EnvConfigDataSource(), JsonConfigDataSource(config_path)])
+    )
+    if config.retry_queue_path == "":
+        print(Log.retry_queue_not_set)
+        return
+
+    platform = IssueProcessor.init_git_service_client(test_platform_type, config)
+
+    results: list[BatchResultJson] = []
+    try:
+        retry_queue = FailedRecord(config.retry_queue_path)
+        records = get_due_records(
+            retry_queue, os.environ[Env.ISSUE_REPOSITORY], datetime.datetime.now()
+        )
+        if len(records) == 0:
+            return
+
+        archive_document = ArchiveDocument()
+        archive_document.file_load_tail(
+            config.archived_document_path, config.archived_document.table_separator
+        )
+        results, archived_issue_infos = retry_issues(
+            records, platform, config, archive_document, retry_queue
+        )
+        if archived_issue_infos:
+            save_archive_document(
+                archive_document, archived_issue_infos, config.archived_document_path
+            )
+            push_retried_issues(archived_issue_infos, platform, config, retry_queue)
+    finally:
+        platform.close()
+
+        print(Log.retry_summary.format(summary=json_dumps(results)))
+        if report_path is not None:
+            save_batch_report(results, report_path)
+
+        print(Log.time_used.format(time="{:.4f}".format(time.time() - start_time)))
+
+        print(Log.job_done)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,3 +3,4 @@ class ApiPath:
     projects = "projects"
     issues = "issues"
     notes = "notes"
+    comments = "comments"
@@ -0,0 +1,11 @@
+class ArchiveStatus:
+    """单个Issue在归档流程中的处理结果"""
+
+    # 已完成处理，等待写入归档文件
+    pending = "pending"
+    archived = "archived"
+    # 评论中包含跳过归档流程的关键字
+    skipped = "skipped"
+    not_archived_object = "not_archived_object"
+    already_archived = "already_archived"
+    failed = "failed"
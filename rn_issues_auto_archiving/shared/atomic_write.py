@@ -0,0 +1,48 @@
+import os
+import tempfile
+from pathlib import Path
+
+
+def fsync_directory(directory: str) -> None:
+    """rename之后同步目录，确保断电后目录项也已经落盘，
+    windows无法以只读方式打开目录，直接跳过"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_bytes(path: str, content: bytes) -> None:
+    """先写入同一目录下的临时文件并fsync，再用os.replace替换目标文件，
+    进程在写入途中被终止时目标文件要么是旧内容，要么是完整的新内容，
+    不会出现被截断的文件"""
+    target = Path(path)
+    directory = str(target.parent.absolute())
+    fd, temp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{target.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        try:
+            # mkstemp创建的文件权限为0600，保持与原文件一致
+            os.chmod(temp_path, os.stat(path).st_mode)
+        except FileNotFoundError:
+            pass
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+    fsync_directory(directory)
+
+
+def atomic_write_text(path: str, content: str, encoding: str = "utf-8") -> None:
+    atomic_write_bytes(path, content.encode(encoding))
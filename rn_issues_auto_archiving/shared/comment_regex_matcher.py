@@ -0,0 +1,52 @@
+import re
+import warnings
+
+BACK_REFERENCE_REGEX = re.compile(r"\\[1-9]|\(\?P=")
+"""合并成一个正则后分组编号会发生变化，包含反向引用的正则不能合并"""
+
+
+class CommentRegexMatcher:
+    """将多个正则预编译，并合并成一个带命名分组的多选正则，
+    每条评论只需要扫描一次就能判断是否有任意一个正则匹配。\n
+    合并后的正则只用来快速排除匹配不到任何内容的评论，
+    匹配到内容时依然逐个正则执行findall，
+    保证结果与逐个正则匹配时完全一致（多个正则的匹配位置可能互相重叠）
+    """
+
+    def __init__(self, reges: tuple[str, ...]):
+        self.reges = reges
+        self.patterns: list[re.Pattern[str]] = [re.compile(regex) for regex in reges]
+        self.combined_pattern: re.Pattern[str] | None = self.__combine(reges)
+
+    @staticmethod
+    def __combine(reges: tuple[str, ...]) -> re.Pattern[str] | None:
+        if len(reges) == 0 or any(BACK_REFERENCE_REGEX.search(r) for r in reges):
+            return None
+        try:
+            # python3.11以前不在开头的全局行内标记只会产生警告，但会作用于整个正则
+            with warnings.catch_warnings():
+                warnings.simplefilter("error", DeprecationWarning)
+                return re.compile(
+                    "|".join(
+                        f"(?P<regex_{index}>{regex})"
+                        for index, regex in enumerate(reges)
+                    )
+                )
+        except (re.error, DeprecationWarning):
+            # 例如正则中间包含全局的行内标记，无法合并时只能逐个匹配
+            return None
+
+    def search(self, text: str) -> bool:
+        """是否有任意一个正则能匹配到内容"""
+        if self.combined_pattern is not None:
+            return self.combined_pattern.search(text) is not None
+        return any(pattern.search(text) is not None for pattern in self.patterns)
+
+    def findall(self, text: str) -> list[str]:
+        """依次返回每个正则的 re.findall 结果"""
+        if not self.search(text):
+            return []
+        result: list[str] = []
+        for pattern in self.patterns:
+            result.extend(pattern.findall(text))
+        return result
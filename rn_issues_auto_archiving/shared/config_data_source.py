@@ -52,6 +52,15 @@ class EnvConfigDataSource(DataSource):
         config.issue_output_path = os.environ[Env.ISSUE_OUTPUT_PATH]
         config.ci_event_type = os.environ[Env.CI_EVENT_TYPE]
         config.archived_document_path = os.environ[Env.ARCHIVED_DOCUMENT_PATH]
+        config.http_cache_dir = os.environ.get(Env.HTTP_CACHE_DIR, "")
+        if os.environ.get(Env.HTTP_CACHE_MAX_SIZE_MB, "").isdigit():
+            config.http_cache_max_size_mb = int(
+                os.environ[Env.HTTP_CACHE_MAX_SIZE_MB]
+            )
+        config.github_use_graphql = os.environ.get(Env.GITHUB_USE_GRAPHQL) == "true"
+        config.retry_queue_path = os.environ.get(Env.RETRY_QUEUE_PATH, "")
+        if os.environ.get(Env.RETRY_MAX_ATTEMPTS, "").isdigit():
+            config.retry_max_attempts = int(os.environ[Env.RETRY_MAX_ATTEMPTS])
 
 
 class JsonConfigDataSource(DataSource):
@@ -74,3 +83,5 @@ class JsonConfigDataSource(DataSource):
         config.__dict__.update(**raw_json)
         config.issue_type = issue_type
         config.archived_document = archived_document
+        # 加载配置时就预编译评论正则，正则写错时也能尽早报错
+        config.compile_matchers()
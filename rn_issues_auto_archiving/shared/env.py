@@ -13,6 +13,11 @@ class Env:
     MANUAL_COMMENTS_URL = "MANUAL_COMMENTS_URL"
     ISSUE_URL = "ISSUE_URL"
     COMMENTS_URL = "COMMENTS_URL"
+    # github action 预定义的环境变量
+    GITHUB_API_URL = "GITHUB_API_URL"
+    GITHUB_REPOSITORY = "GITHUB_REPOSITORY"
+    # 可选，值为"true"时通过graphql接口一次性获取issue信息和评论
+    GITHUB_USE_GRAPHQL = "GITHUB_USE_GRAPHQL"
 
     # gitlab ci
     GITLAB_CI = "GITLAB_CI"
@@ -22,6 +27,8 @@ class Env:
     WEBHOOK_OUTPUT_PATH = "WEBHOOK_OUTPUT_PATH"
     PROJECT_ID = "PROJECT_ID"
     API_BASE_URL = "API_BASE_URL"
+    # gitlab ci 预定义的环境变量，流水线检出的提交
+    CI_COMMIT_SHA = "CI_COMMIT_SHA"
 
     # 两侧均可直接读取的环境变量
     # 或者是放仓库变量的
@@ -35,6 +42,14 @@ class Env:
     ISSUE_TITLE = "ISSUE_TITLE"
     ISSUE_TYPE = "ISSUE_TYPE"
     TARGET_BRANCH = "TARGET_BRANCH"
+    # 可选，不设置时不使用HTTP缓存
+    HTTP_CACHE_DIR = "HTTP_CACHE_DIR"
+    HTTP_CACHE_MAX_SIZE_MB = "HTTP_CACHE_MAX_SIZE_MB"
+    # 可选，webhook服务校验webhook的密钥
+    WEBHOOK_SECRET = "WEBHOOK_SECRET"
+    # 可选，设置后暂时性错误记录到这个文件中等待retry_failed.py重试
+    RETRY_QUEUE_PATH = "RETRY_QUEUE_PATH"
+    RETRY_MAX_ATTEMPTS = "RETRY_MAX_ATTEMPTS"
 
 
 def should_run_in_github_action() -> bool:
@@ -0,0 +1,34 @@
+import asyncio
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class EventCoalescer(Generic[T]):
+    """把短时间内连续到达的事件合并成一批处理：
+    收到第一个事件后，最多再等待 window_seconds 秒，
+    或者凑够 max_count 个事件就结束这一批
+    """
+
+    def __init__(self, max_count: int = 20, window_seconds: float = 5.0):
+        self.max_count = max(max_count, 1)
+        self.window_seconds = max(window_seconds, 0.0)
+
+    async def next_batch(self, queue: asyncio.Queue[T]) -> list[T]:
+        batch = [await queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window_seconds
+        while len(batch) < self.max_count:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                # 等待窗口结束后，已经在队列中的事件依然合并到这一批
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+                continue
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
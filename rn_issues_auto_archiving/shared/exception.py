@@ -52,6 +52,9 @@ class ErrorMessage:
 
     push_document_failed = """提交归档文档失败，错误信息：{exc}"""
 
+    retry_exhausted = """归档流程连续 {attempts} 次因为网络异常等暂时性错误失败，已停止自动重试，请检查后再次关闭Issue重新触发归档流程。最后一次的错误信息：{reason}
+    """
+
 
 class ArchiveBaseError(Exception):
     "归档错误的基类"
@@ -91,6 +94,18 @@ class MissingArchiveVersionAndArchiveLabel(ArchiveBaseError):
     pass
 
 
+class TransientError(Exception):
+    """网络异常、提交冲突等暂时性错误，与issue内容无关，稍后重试可能成功"""
+
+    pass
+
+
+class PushConflictError(TransientError):
+    """多次重新获取远程归档文件后提交仍然冲突"""
+
+    pass
+
+
 class WebhookPayloadError(Exception):
     """webhook payload为空"""
 
@@ -111,3 +126,17 @@ class UnexpectedPlatform(Exception):
     """未识别的流水线环境"""
 
     pass
+
+
+class GraphqlError(Exception):
+    """github graphql接口返回了errors字段"""
+
+    pass
+
+
+class WebhookRequestError(Exception):
+    """webhook服务收到的请求无法处理，status_code为返回给发送方的http状态码"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
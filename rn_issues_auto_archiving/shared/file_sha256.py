@@ -0,0 +1,49 @@
+import io
+import hashlib
+from typing import Iterator
+
+from shared.log import Log
+
+READ_CHUNK_SIZE = 64 * 1024
+"""计算本地文件sha256时每次读取的字符数"""
+
+
+def get_content_sha256(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8"), usedforsecurity=True).hexdigest()
+
+
+def iter_file_chunks(file_path: str, chunk_size: int) -> Iterator[str]:
+    """按块读取文件内容，
+    文本模式会在读取时把"\r\n"和"\r"转换成"\n"（块边界上的"\r\n"也能正确转换）"""
+    with open(file_path, "r", encoding="utf-8") as file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+def get_file_sha256(file_path: str, buffer: io.StringIO | None = None) -> str:
+    """逐块计算sha256，不会在内存中保留整个文件的内容，
+    传入buffer时读取到的内容会依次写入其中，以便复用读取到的内容"""
+    print(Log.get_local_file_sha256.format(file_path=file_path))
+    # 不能直接把read_bytes的内容去计算sha256
+    # 即使两边内容一样，read_bytes算出来的sha256与
+    # 远端文件的sha256值还是不一致的
+    # 用utf-8编码读取（统一换行符）再用utf-8去编码就能和远端文件sha256值一致
+    sha256 = hashlib.sha256(usedforsecurity=True)
+    for chunk in iter_file_chunks(file_path, READ_CHUNK_SIZE):
+        sha256.update(chunk.encode("utf-8"))
+        if buffer is not None:
+            buffer.write(chunk)
+    result = sha256.hexdigest()
+    print(
+        Log.get_local_file_sha256_success.format(file_path=file_path, sha256=result),
+    )
+    return result
+
+
+def read_file_with_sha256(file_path: str) -> tuple[str, str]:
+    """只读取一次文件，同时得到 (文件内容, sha256) ，
+    内容与sha256都经过换行符统一，提交时直接使用这份内容"""
+    # 边读取边写入StringIO，不需要先保留所有块再拼接成一份新的字符串
+    with io.StringIO() as buffer:
+        result = get_file_sha256(file_path, buffer)
+        return buffer.getvalue(), result
@@ -0,0 +1,146 @@
+import os
+import json
+import hashlib
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+
+import httpx
+
+
+DEFAULT_HTTP_CACHE_MAX_SIZE_MB = 50
+
+CACHED_HEADERS = [
+    "Content-Type",
+    "ETag",
+    "Last-Modified",
+    # 分页相关的响应头，从缓存构造响应时分页逻辑依然需要它们
+    "Link",
+    "X-Next-Page",
+    "X-Page",
+    "X-Per-Page",
+    "X-Total",
+    "X-Total-Pages",
+]
+"""只缓存解析响应时会用到的响应头，
+Content-Encoding 等描述原始传输内容的响应头不能缓存，
+因为缓存的body已经是解码后的内容"""
+
+
+@dataclass()
+class HttpCacheEntry:
+    url: str
+    etag: str = str()
+    last_modified: str = str()
+    headers: dict[str, str] = field(default_factory=dict)
+    body: str = str()
+
+    @staticmethod
+    def from_response(response: httpx.Response) -> "HttpCacheEntry | None":
+        """响应中没有ETag和Last-Modified时无法发起条件请求，返回None"""
+        etag = response.headers.get("ETag", "")
+        last_modified = response.headers.get("Last-Modified", "")
+        if etag == "" and last_modified == "":
+            return None
+        return HttpCacheEntry(
+            url=str(response.request.url),
+            etag=etag,
+            last_modified=last_modified,
+            headers={
+                key: response.headers[key]
+                for key in CACHED_HEADERS
+                if key in response.headers
+            },
+            body=response.text,
+        )
+
+    def conditional_headers(self) -> dict[str, str]:
+        """条件请求所需的请求头，详见：
+        https://docs.github.com/en/rest/using-the-rest-api/best-practices-for-using-the-rest-api#use-conditional-requests-if-appropriate
+        """
+        headers: dict[str, str] = {}
+        if self.etag != "":
+            headers["If-None-Match"] = self.etag
+        if self.last_modified != "":
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            status_code=200,
+            headers=self.headers,
+            content=self.body.encode("utf-8"),
+            request=request,
+        )
+
+
+def build_cache_key(url: str, params: dict[str, str] | None = None) -> str:
+    return str(httpx.URL(url, params=params))
+
+
+class HttpCache(ABC):
+    @abstractmethod
+    def get(self, key: str) -> HttpCacheEntry | None:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, entry: HttpCacheEntry) -> None:
+        pass
+
+
+class DirectoryHttpCache(HttpCache):
+    """每个缓存条目保存为目录下的一个json文件，
+    目录可以由流水线的缓存功能在多次运行之间保留。
+    文件的修改时间被当作最近访问时间，
+    目录总大小超过上限时会按最近最少使用的顺序删除缓存条目"""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_size_mb: int = DEFAULT_HTTP_CACHE_MAX_SIZE_MB,
+    ):
+        self.__cache_dir = Path(cache_dir)
+        self.__max_size = max_size_mb * 1024 * 1024
+        self.__cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def __entry_path(self, key: str) -> Path:
+        file_name = hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json"
+        return self.__cache_dir / file_name
+
+    def get(self, key: str) -> HttpCacheEntry | None:
+        path = self.__entry_path(key)
+        try:
+            entry = HttpCacheEntry(**json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError, TypeError):
+            # 缓存文件不存在或者已经损坏，都当作没有缓存
+            return None
+        # 更新修改时间，标记为最近使用过
+        os.utime(path)
+        return entry
+
+    def set(self, key: str, entry: HttpCacheEntry) -> None:
+        path = self.__entry_path(key)
+        # 先写入临时文件再替换，避免并发读取到写了一半的缓存文件
+        fd, temp_path = tempfile.mkstemp(dir=self.__cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(asdict(entry), file, ensure_ascii=False)
+        os.replace(temp_path, path)
+        self.__evict()
+
+    def __evict(self) -> None:
+        entries: list[tuple[Path, os.stat_result]] = []
+        for path in self.__cache_dir.glob("*.json"):
+            try:
+                entries.append((path, path.stat()))
+            except FileNotFoundError:
+                # 多个线程同时清理缓存时，文件可能已经被其他线程删除
+                continue
+        total_size = sum(stat.st_size for _, stat in entries)
+        if total_size <= self.__max_size:
+            return
+        for path, stat in sorted(entries, key=lambda item: item[1].st_mtime_ns):
+            path.unlink(missing_ok=True)
+            total_size -= stat.st_size
+            if total_size <= self.__max_size:
+                break
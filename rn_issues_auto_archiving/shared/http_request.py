@@ -1,9 +1,47 @@
+import atexit
+import threading
+from typing import Any
 from http import HTTPStatus
 
 import httpx
 
 from shared.log import Log
 from shared.json_dumps import json_dumps
+from shared.metrics import get_metrics
+from shared.retry_policy import RetryPolicy
+from shared.rate_limit import get_rate_limit_budget
+
+_http_clients: dict[str, httpx.Client] = {}
+_http_clients_lock = threading.Lock()
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+"""没有指定重试策略时使用，重试次数和等待时长在整个进程内累计"""
+
+
+def get_http_client(url: str) -> httpx.Client:
+    """同一个进程内按 "协议://主机" 复用同一个带连接池的客户端，
+    同一主机的多个请求可以复用已经建立的连接，不需要重复进行TLS握手，
+    平台客户端（GitServiceClient）也使用这里的客户端"""
+    parsed_url = httpx.URL(url)
+    key = f"{parsed_url.scheme}://{parsed_url.netloc.decode('ascii')}"
+    # 多个线程同时第一次请求同一主机时只创建一个客户端，
+    # 否则被覆盖的客户端不会被关闭
+    with _http_clients_lock:
+        client = _http_clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.Client()
+            _http_clients[key] = client
+        return client
+
+
+def close_http_clients() -> None:
+    with _http_clients_lock:
+        for client in _http_clients.values():
+            client.close()
+        _http_clients.clear()
+
+
+atexit.register(close_http_clients)
 
 
 def http_request(
@@ -11,36 +49,63 @@ def http_request(
     url: str,
     method: str,
     params: dict[str, str] | None = None,
-    json_content: dict[str, str] | None = None,
+    json_content: dict[str, Any] | None = None,
     retry_times: int = 3,
+    idempotent: bool | None = None,
+    retry_policy: RetryPolicy | None = None,
 ) -> httpx.Response:
-    error = Exception()
-    for _ in range(retry_times):
-        try:
-            response = httpx.request(
-                headers=headers,
-                method=method,
-                url=url,
-                params=params,
-                json=json_content,
-                follow_redirects=True,
-            )
-            if response.status_code == HTTPStatus.NOT_FOUND:
-                print(Log.http_404_not_found)
-            response.raise_for_status()
-            return response
-        except httpx.HTTPStatusError:
+    """idempotent为None时根据请求方法判断请求能否重复发送，
+    调用方可以明确指定，例如提交文件的PUT请求重复发送会产生多余的提交"""
+    if retry_policy is None:
+        retry_policy = DEFAULT_RETRY_POLICY
+    with get_metrics().http_request(method, url) as request_span:
+        budget = get_rate_limit_budget(url)
+        error = Exception()
+        for attempt in range(retry_times):
             try:
-                print(
-                    Log.http_status_error.format(
-                        reason=json_dumps(
-                            response.json(),
-                        ),
+                budget.wait(url)
+                request_span.retries = attempt
+                response = get_http_client(url).request(
+                    headers=headers,
+                    method=method,
+                    url=url,
+                    params=params,
+                    json=json_content,
+                    follow_redirects=True,
+                )
+                request_span.set_response(response)
+                budget.update(response.headers)
+                if response.status_code == HTTPStatus.NOT_FOUND:
+                    print(Log.http_404_not_found)
+                if attempt + 1 < retry_times and retry_policy.should_retry_response(
+                    method, response, idempotent
+                ):
+                    delay = retry_policy.get_delay(attempt, response)
+                    if delay is not None:
+                        retry_policy.wait(attempt, delay, str(response.status_code))
+                        continue
+                response.raise_for_status()
+                return response
+            except httpx.HTTPStatusError:
+                try:
+                    print(
+                        Log.http_status_error.format(
+                            reason=json_dumps(
+                                response.json(),
+                            ),
+                        )
                     )
+                except Exception:
+                    pass
+                raise
+            except Exception as e:
+                error = e
+                if (
+                    attempt + 1 >= retry_times
+                    or not retry_policy.should_retry_exception(method, e, idempotent)
+                ):
+                    break
+                retry_policy.wait(
+                    attempt, retry_policy.get_backoff_delay(attempt), repr(e)
                 )
-            except Exception:
-                pass
-            raise
-        except Exception as e:
-            error = e
-    raise error
+        raise error
@@ -7,6 +7,7 @@ import json
 from shared.json_dumps import json_dumps
 from shared.log import Log
 from shared.exception import *
+from shared.comment_regex_matcher import CommentRegexMatcher
 
 
 AUTO_ISSUE_TYPE = "自动判断"
@@ -41,6 +42,8 @@ class IssueInfoJson(TypedDict):
     reopen_http_method: str
     reopen_body: dict[str, str]
     archived_success: bool
+    document_changed: bool
+    """本次运行是否修改了归档文件"""
     links: LinksJson
 
 
@@ -74,6 +77,8 @@ class IssueInfo:
     reopen_http_method: str = str()
     reopen_body: dict[str, str] = field(default_factory=dict)
     archived_success: bool = False
+    document_changed: bool = False
+    """本次运行是否修改了归档文件"""
     links: Links = field(default_factory=Links)
 
     @staticmethod
@@ -113,16 +118,28 @@ class IssueInfo:
     def update(self, **kwargs) -> None:
         self.__dict__.update(kwargs)
 
+    def find_all_in_comments(self, matcher: CommentRegexMatcher) -> list[str]:
+        """返回所有评论中每个正则的 re.findall 结果，\n
+        结果会以正则和评论内容为键缓存在当前实例上，
+        评论没有变化时同一组正则不会重复扫描评论
+        """
+        # 缓存不是dataclass的字段，不会被to_dict输出
+        cache: dict[tuple, list[str]] = self.__dict__.setdefault(
+            "_comment_match_cache", {}
+        )
+        key = (matcher.reges, tuple(comment.body for comment in self.issue_comments))
+        if key not in cache:
+            result: list[str] = []
+            for comment in self.issue_comments:
+                result.extend(matcher.findall(comment.body))
+            cache[key] = result
+        return cache[key]
+
     def should_skip_archived_process(
         self,
-        skip_archived_reges_for_comments: list[str],
+        skip_archived_comment_matcher: CommentRegexMatcher,
     ):
-        comments = self.issue_comments
-        for comment in comments:
-            for skip_regex in skip_archived_reges_for_comments:
-                if len(re.findall(skip_regex, comment.body)) > 0:
-                    return True
-        return False
+        return len(self.find_all_in_comments(skip_archived_comment_matcher)) > 0
 
     def get_introduced_version_from_description(
         self,
@@ -168,7 +185,9 @@ class IssueInfo:
         )
         return introduced_versions[0]
 
-    def get_archive_version_from_comments(self, comment_reges: list[str]) -> str:
+    def get_archive_version_from_comments(
+        self, archive_version_comment_matcher: CommentRegexMatcher
+    ) -> str:
         """匹配不到归档版本号会返回一个空字符串"""
         print(
             Log.getting_something_from.format(
@@ -176,12 +195,9 @@ class IssueInfo:
             )
         )
 
-        issue_comments = self.issue_comments
-        archive_versions: set[str] = set()
-        for comment in issue_comments:
-            for comment_regex in comment_reges:
-                if len(match_result := re.findall(comment_regex, comment.body)) > 0:
-                    archive_versions.update(match_result)
+        archive_versions: set[str] = set(
+            self.find_all_in_comments(archive_version_comment_matcher)
+        )
         if len(archive_versions) >= 2:
             print(Log.too_many_archive_version)
             raise ArchiveVersionError(
@@ -232,7 +248,7 @@ class IssueInfo:
 
     def should_archive_issue(
         self,
-        archive_version_reges_for_comments: list[str],
+        archive_version_comment_matcher: CommentRegexMatcher,
         raw_archive_version_reges_for_comments: list[str],
         archive_necessary_labels: list[str],
         check_labels: bool = True,
@@ -247,7 +263,7 @@ class IssueInfo:
         """
         issue_labels = self.issue_labels
         archive_version = self.get_archive_version_from_comments(
-            archive_version_reges_for_comments
+            archive_version_comment_matcher
         )
         if (
             should_not_match_archive_version := (archive_version == "")
@@ -317,3 +333,9 @@ class IssueInfo:
 
     def should_archived_success(self) -> bool:
         return self.archived_success
+
+    def set_document_changed(self, document_changed: bool) -> None:
+        self.document_changed = document_changed
+
+    def should_document_changed(self) -> bool:
+        return self.document_changed
@@ -2,6 +2,10 @@ import os
 from dataclasses import dataclass, field
 from typing import TypedDict, TypeAlias
 
+from shared.http_cache import DEFAULT_HTTP_CACHE_MAX_SIZE_MB
+from shared.transient_error import DEFAULT_RETRY_MAX_ATTEMPTS
+from shared.comment_regex_matcher import CommentRegexMatcher
+
 IssueType: TypeAlias = str
 
 
@@ -63,6 +67,11 @@ class Config:
     issue_output_path: str = str()
     ci_event_type: str = str()
     archived_document_path: str = str()
+    http_cache_dir: str = str()
+    http_cache_max_size_mb: int = DEFAULT_HTTP_CACHE_MAX_SIZE_MB
+    github_use_graphql: bool = False
+    retry_queue_path: str = str()
+    retry_max_attempts: int = DEFAULT_RETRY_MAX_ATTEMPTS
 
     # 从命令行参数读取
     config_path: str = str()
@@ -77,6 +86,26 @@ class Config:
     introduced_version_reges: list[str] = field(default_factory=list)
     archived_document: ArchivedDocument = field(default_factory=ArchivedDocument)
 
+    # 由compile_matchers根据上面的评论正则生成
+    archive_version_comment_matcher: CommentRegexMatcher = field(
+        init=False, repr=False, compare=False
+    )
+    skip_archived_comment_matcher: CommentRegexMatcher = field(
+        init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        self.compile_matchers()
+
+    def compile_matchers(self) -> None:
+        """预编译评论正则，修改评论正则后需要重新调用"""
+        self.archive_version_comment_matcher = CommentRegexMatcher(
+            tuple(self.archive_version_reges_for_comments)
+        )
+        self.skip_archived_comment_matcher = CommentRegexMatcher(
+            tuple(self.skip_archived_reges_for_comments)
+        )
+
     @property
     def raw_archive_version_reges_for_comments(self) -> list[str]:
         return [
@@ -62,6 +62,12 @@ class Log:
     running_ci_by_automated = """流水线触发触发方式：自动"""
     http_404_not_found = """无法请求到对应资源，请检查输入的Issue单号是否正确"""
     http_status_error = """HTTP请求返回状态码错误，原因：{reason}"""
+    http_retry = """第{attempt}次请求失败（{reason}），{delay:.2f}秒后重试"""
+    http_retry_after_too_long = """服务端要求等待{delay:.0f}秒后再重试，超过了最长等待时间{max_retry_after:.0f}秒，不再重试"""
+    rate_limit_throttle = """{url} 剩余请求数为{remaining}，为避免耗尽请求预算，等待{delay:.2f}秒后再发送请求"""
+    http_cache_hit = """请求内容未发生变化，使用本地缓存：{url}"""
+    graphql_error = """github graphql接口返回错误：{errors}"""
+    http_cache_enabled = """已启用HTTP缓存，缓存目录：{cache_dir}"""
     issue_type_webhook_detected = """检测到流水线是由Issue类型webhook触发"""
     other_type_webhook_detected = (
         """检测到流水线是由非Issue类型webhook触发，无需执行归档流程"""
@@ -83,11 +89,17 @@ class Log:
 
     # auto_archiving
     archive_document_content = """归档文件内容"""
+    archive_document_tail = """归档文件末尾内容"""
+    load_full_archive_document = """需要归档文件的全部内容，正在读取整个归档文件 {path}"""
     non_github_action_env = """未检测到 github action 环境，将读取".env"文件"""
     print_issue_info = """打印读取到的issue_info ： {issue_info}"""
     format_issue_content = """正在格式化Issue内容"""
     write_content_to_document = """正在将内容写入归档文件"""
+    document_not_changed_skip_save = """归档文件内容没有变化，跳过写入"""
+    append_content_to_document = """归档文件只新增了内容，只写入新增部分"""
     time_used = """脚本总耗时：{time} s"""
+    metrics_saved = """已将各步骤和HTTP请求的耗时统计写入至 {metrics_path}"""
+    metrics_save_failed = """耗时统计写入 {metrics_path} 失败，错误信息：{exc}"""
     reopen_issue_request = """正在尝试发送reopen Issue请求"""
     read_failed_recording = """正在读取归档失败记录：{failed_record_path}"""
     failed_recording = """正在将Issue内容记录到归档失败记录"""
@@ -102,6 +114,9 @@ class Log:
         """在Issue错误记录中发现已完成归档的Issue：{issue_ids}"""
     )
     remove_failed_record_item = """正在移除归档失败记录条目：{record}"""
+    failed_record_torn_line = """归档失败记录 {failed_record_path} 的最后一行（字节偏移 {offset}）不完整，可能是写入时被中断，已截掉这一行"""
+    failed_record_broken_line = """归档失败记录 {failed_record_path} 中字节偏移为 {offset} 的行无法解析，已跳过这一行"""
+    failed_record_compact = """归档失败记录 {failed_record_path} 中有 {dead_lines} 行已失效，有效记录 {count} 条，正在压缩"""
     failed_record_issue_id_not_found = (
         """无法归档失败记录条目中找到需要移除的条目，issue_id为 {issue_id}"""
     )
@@ -113,6 +128,13 @@ class Log:
     replace_old_issue_record = """正在替换 "{issue_repository}#{issue_id}" 旧归档记录"""
     replaced_line_index = """替换的行号为 {line_index}"""
     add_new_line = """正在添加新行"""
+    archive_index_loaded = """成功读取归档文件索引 {index_path}"""
+    archive_index_not_found = """未找到可用的归档文件索引 {index_path}，即将建立索引"""
+    archive_index_rebuild = """归档文件索引 {index_path} 已过期，即将重新建立索引"""
+    archive_index_incremental_rebuild = (
+        """归档文件末尾新增了 {line_count} 行，正在更新归档文件索引 {index_path}"""
+    )
+    save_archive_index_failed = """写入归档文件索引 {index_path} 失败，错误信息：{exc}"""
     job_down = """归档任务执行完毕"""
 
     format_issue_content_success = """格式化Issue内容成功"""
@@ -137,11 +159,66 @@ class Log:
     )
     not_need_to_push_document = """本地文件 {file_path} 的sha256值与远程仓库文件 {file_path} 的sha256值一致，跳过推送流程"""
     need_to_push_document = """本地文件 {file_path} 的sha256值与远程仓库文件 {file_path} 的sha256值不一致，执行推送流程"""
+    document_not_changed_skip_push = """本次归档没有修改归档文件，跳过推送流程"""
+    committing_files = """正在提交 {count} 个文件"""
+    no_file_to_commit = """所有文件都与远程仓库一致，跳过提交"""
+    get_remote_file = """正在获取远程仓库文件 {file_path} 的内容"""
+    push_document_conflict = """归档文档在本地版本之后被修改过，第 {attempt} 次重新获取远程仓库文件并写入本次归档的内容"""
+    document_base_commit_unknown = """不在流水线中运行且没有找到 {sync_path} ，无法确定本地文件 {file_path} 基于哪次提交，先获取远程仓库文件并写入本次归档的内容"""
+    save_synced_commit_failed = """写入 {sync_path} 失败，下次推送时会先获取远程仓库文件，错误信息：{exc}"""
     get_local_file_sha256 = """正在获取本地文件 {file_path} 的sha256值"""
     get_local_file_sha256_success = (
         """成功获取本地文件 {file_path} 的sha256值：{sha256}"""
     )
 
+    # batch_archiving
+    batch_archiving_need_manual = """批量归档只能在手动触发的流水线中运行，跳过批量归档流程"""
+    batch_issue_not_found = """未在命令行参数中获取到需要归档的Issue，请使用"-i"或"--issue-ids"参数传入以逗号分隔的Issue单号，或使用"-if"或"--issue-info-file"参数传入Issue信息json文件路径"""
+    batch_archiving_start = """开始批量归档，共 {count} 个Issue"""
+    batch_archiving_issue = """正在处理第 {index}/{count} 个Issue：{issue_repository}#{issue_id}"""
+    batch_archiving_issue_failed = (
+        """{issue_repository}#{issue_id} 归档失败，错误信息：{exc}"""
+    )
+    batch_archiving_summary = """批量归档完毕，各Issue处理结果 ： {summary}"""
+    save_batch_report = """正在将批量归档结果写入至 {report_path}"""
+
     # archiving_success
     unknown_platform_type = '''未识别的平台类型 "{platform_type}"'''
     send_comment_failed = """发送评论失败，原因：{exc}"""
+    send_archived_success_comment_failed = (
+        """发送 {issue_repository}#{issue_id} 的归档成功评论失败，原因：{exc}"""
+    )
+
+    # webhook_server
+    webhook_server_started = """webhook服务已启动，监听地址：{address}，webhook路径：{path}"""
+    webhook_secret_not_set = """未设置WEBHOOK_SECRET环境变量，webhook服务不会校验webhook的来源"""
+    webhook_secret_mismatch = """webhook密钥校验失败"""
+    webhook_bad_request = """无法处理的webhook请求"""
+    webhook_event_queued = """收到issue事件webhook {delivery_id}，当前队列中有 {queued} 个事件"""
+    webhook_batch_start = """开始处理 {count} 个webhook事件：{delivery_ids}"""
+    webhook_batch_done = """webhook事件处理完毕，各Issue处理结果：{summary}，耗时：{time}秒"""
+    webhook_event_failed = """webhook事件 {delivery_id} 处理失败，错误信息：{exc}"""
+
+    # reconcile
+    listing_closed_issues = """正在列出已关闭的Issue，更新时间晚于：{updated_after}"""
+    listing_closed_issues_success = """共列出 {count} 个已关闭的Issue"""
+    reconcile_need_manual = """对账只能在手动触发的流水线中运行，跳过对账流程"""
+    reconcile_mode_error = '''未识别的对账模式 "{mode}"，可选值为 "report" 或 "apply"'''
+    reconcile_start = """共 {count} 个已关闭的Issue，其中 {missing} 个不在归档文件中"""
+    reconcile_issue_result = """{issue_repository}#{issue_id} ：{status} {message}"""
+    reconcile_summary = """对账完毕，各Issue处理结果 ： {summary}"""
+    reconcile_next_since = """本次列出的Issue最晚更新于 {updated_at}，下次对账可以使用"-s {updated_at}"只检查之后更新的Issue"""
+    scan_checkpoint_loaded = """成功读取扫描检查点 {checkpoint_path}"""
+    scan_checkpoint_not_found = """未找到可用的扫描检查点 {checkpoint_path}，即将从头开始扫描"""
+    save_scan_checkpoint = """正在将扫描检查点写入至 {checkpoint_path}"""
+
+    # retry_failed
+    transient_error_queued = """{issue_repository}#{issue_id} 第 {attempts} 次归档因为暂时性错误失败，已记录到重试队列，错误信息：{exc}"""
+    retry_queue_not_set = """未设置RETRY_QUEUE_PATH环境变量，没有需要重试的归档"""
+    retry_issue_not_closed = """{issue_repository}#{issue_id} 已经被重新打开，不再重试，从重试队列中删除"""
+    retry_issue_skipped = """{issue_repository}#{issue_id} 的评论中包含跳过归档流程的关键字，不再重试，从重试队列中删除"""
+    retry_issue_not_archived_object = """{issue_repository}#{issue_id} 已经不是归档对象，不再重试，从重试队列中删除"""
+    retry_start = """重试队列中共有 {count} 个Issue，其中 {due} 个已到重试时间"""
+    retry_not_due = """{issue_repository}#{issue_id} 将在 {retry_time} 之后重试"""
+    retry_exhausted = """{issue_repository}#{issue_id} 已经尝试 {attempts} 次，停止重试并重新打开Issue"""
+    retry_summary = """重试归档完毕，各Issue处理结果 ： {summary}"""
@@ -0,0 +1,241 @@
+import re
+import time
+import functools
+import threading
+from pathlib import Path
+from contextlib import AbstractContextManager, contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator, ParamSpec, TypedDict, TypeVar
+
+import httpx
+
+from shared.atomic_write import atomic_write_text
+from shared.json_dumps import json_dumps
+from shared.log import Log
+
+METRICS_VERSION = 1
+METRICS_FILE_NAME = "metrics.json"
+"""耗时统计文件名，与issue信息json文件放在同一目录下"""
+MAX_METRICS_RECORDS = 10000
+"""span和HTTP请求各自最多保留的记录数，webhook服务等常驻进程不会无限增长"""
+
+_ID_SEGMENT = re.compile(r"^\d+$")
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+class SpanJson(TypedDict):
+    name: str
+    parent: str | None
+    """外层span的名称，没有外层span时为None"""
+    start: float
+    """相对于开始统计时的秒数"""
+    duration: float
+    error: str | None
+
+
+class HttpRequestMetricJson(TypedDict):
+    method: str
+    url_template: str
+    span: str | None
+    """发出请求时所在的span名称"""
+    status: int | None
+    """最后一次响应的状态码，没有收到响应时为None"""
+    retries: int
+    bytes: int
+    start: float
+    duration: float
+    error: str | None
+
+
+class MetricsJson(TypedDict):
+    version: int
+    duration: float
+    spans: list[SpanJson]
+    http_requests: list[HttpRequestMetricJson]
+    dropped: int
+    """超过 MAX_METRICS_RECORDS 后没有保留的记录数"""
+
+
+def get_url_template(url: str) -> str:
+    """去掉查询参数，并把路径中的数字（issue单号、项目id等）替换成 {id} ，
+    同一个接口的请求可以汇总在一起比较"""
+    parsed_url = httpx.URL(url)
+    path = "/".join(
+        "{id}" if _ID_SEGMENT.match(segment) else segment
+        for segment in parsed_url.raw_path.decode("ascii").split("?")[0].split("/")
+    )
+    return f"{parsed_url.scheme}://{parsed_url.netloc.decode('ascii')}{path}"
+
+
+def get_metrics_path(issue_output_path: str) -> str:
+    return str(Path(issue_output_path).with_name(METRICS_FILE_NAME))
+
+
+@dataclass
+class HttpRequestSpan:
+    """http_request 在重试循环中更新的请求信息"""
+
+    status: int | None = None
+    retries: int = 0
+    bytes: int = 0
+
+    def set_response(self, response: httpx.Response) -> None:
+        self.status = response.status_code
+        self.bytes += len(response.content)
+
+
+class Metrics:
+    """记录各步骤和每次HTTP请求的耗时，同一进程内共用，可以在多个线程中使用"""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.__start: float = time.perf_counter()
+        self.spans: list[SpanJson] = []
+        self.http_requests: list[HttpRequestMetricJson] = []
+        self.dropped: int = 0
+
+    def __span_stack(self) -> list[str]:
+        stack: list[str] | None = getattr(self.__local, "stack", None)
+        if stack is None:
+            stack = []
+            self.__local.stack = stack
+        return stack
+
+    def __append(self, records: list, record: SpanJson | HttpRequestMetricJson) -> None:
+        if len(records) >= MAX_METRICS_RECORDS:
+            self.dropped += 1
+            return
+        records.append(record)
+
+    def __now(self) -> float:
+        return time.perf_counter() - self.__start
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        stack = self.__span_stack()
+        parent = stack[-1] if len(stack) != 0 else None
+        stack.append(name)
+        start = self.__now()
+        error: str | None = None
+        try:
+            yield
+        except BaseException as exc:
+            error = repr(exc)
+            raise
+        finally:
+            stack.pop()
+            with self.__lock:
+                self.__append(
+                    self.spans,
+                    SpanJson(
+                        name=name,
+                        parent=parent,
+                        start=start,
+                        duration=self.__now() - start,
+                        error=error,
+                    ),
+                )
+
+    @contextmanager
+    def http_request(self, method: str, url: str) -> Iterator[HttpRequestSpan]:
+        stack = self.__span_stack()
+        request_span = HttpRequestSpan()
+        start = self.__now()
+        error: str | None = None
+        try:
+            yield request_span
+        except BaseException as exc:
+            error = repr(exc)
+            raise
+        finally:
+            with self.__lock:
+                self.__append(
+                    self.http_requests,
+                    HttpRequestMetricJson(
+                        method=method,
+                        url_template=get_url_template(url),
+                        span=stack[-1] if len(stack) != 0 else None,
+                        status=request_span.status,
+                        retries=request_span.retries,
+                        bytes=request_span.bytes,
+                        start=start,
+                        duration=self.__now() - start,
+                        error=error,
+                    ),
+                )
+
+    def bind_span(self, func: Callable[P, R]) -> Callable[P, R]:
+        """span栈只记录在当前线程中，提交到线程池的函数需要先用这个方法包装，
+        在其他线程中发出的请求和span才会以当前span为外层span"""
+        parent_stack = list(self.__span_stack())
+
+        @functools.wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            stack = self.__span_stack()
+            saved_stack = list(stack)
+            stack[:] = parent_stack
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stack[:] = saved_stack
+
+        return wrapper
+
+    def to_dict(self) -> MetricsJson:
+        with self.__lock:
+            return MetricsJson(
+                version=METRICS_VERSION,
+                duration=self.__now(),
+                spans=list(self.spans),
+                http_requests=list(self.http_requests),
+                dropped=self.dropped,
+            )
+
+    def save(self, path: str) -> None:
+        """统计只用于排查耗时，写入失败不影响归档流程"""
+        try:
+            atomic_write_text(path, json_dumps(self.to_dict()))
+            print(Log.metrics_saved.format(metrics_path=path))
+        except Exception as exc:
+            print(Log.metrics_save_failed.format(metrics_path=path, exc=repr(exc)))
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__start = time.perf_counter()
+            self.spans.clear()
+            self.http_requests.clear()
+            self.dropped = 0
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+
+def span(name: str) -> AbstractContextManager[None]:
+    """统计with块的耗时：\n
+    with span("save_archive_document"):
+        ..."""
+    return _metrics.span(name)
+
+
+def timed(name: str | None = None) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """统计函数的耗时，name为None时使用函数的限定名，
+    与staticmethod一起使用时放在staticmethod下面"""
+
+    def decorator(func: Callable[P, R]) -> Callable[P, R]:
+        span_name = func.__qualname__ if name is None else name
+
+        @functools.wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with _metrics.span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
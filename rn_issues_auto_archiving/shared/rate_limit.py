@@ -0,0 +1,159 @@
+import time
+import threading
+from time import sleep
+
+import httpx
+
+from shared.log import Log
+from shared.retry_policy import parse_rate_limit_reset
+
+
+def parse_int_header(headers: httpx.Headers, *names: str) -> int | None:
+    """依次读取多个响应头，返回第一个能解析成整数的值"""
+    for name in names:
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return int(value.strip())
+        except ValueError:
+            continue
+    return None
+
+
+class RateLimitBudget:
+    """根据响应头中的剩余请求数（github为X-RateLimit-*，gitlab为RateLimit-*）
+    估算剩余的请求预算，使用令牌桶控制发送请求的速度。\n
+    剩余请求数不低于上限的 slow_down_ratio 时不限速；
+    低于这个比例后，把剩余请求数（保留 reserve 个给失败告警等请求）
+    平均分配到重置时间之前，避免长时间的批量任务在快结束时耗尽预算而失败。\n
+    同一主机的预算在多个线程之间共用，更新和取出令牌时都需要加锁
+    """
+
+    def __init__(
+        self,
+        burst: int = 10,
+        slow_down_ratio: float = 0.5,
+        reserve: int = 10,
+        max_wait: float = 120.0,
+    ):
+        self.burst = burst
+        self.slow_down_ratio = slow_down_ratio
+        self.reserve = reserve
+        self.max_wait = max_wait
+        """单次最多等待的秒数，预算耗尽时也不会让流水线长时间挂起"""
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset_at: float | None = None
+        self.rate: float | None = None
+        """每秒补充的令牌数，None表示不限速"""
+        self.tokens: float = float(burst)
+        self.__refilled_at: float = 0.0
+        self.__lock = threading.Lock()
+
+    def update(self, headers: httpx.Headers, now: float | None = None) -> None:
+        """从响应头更新剩余预算，响应中没有限流信息时保持不变"""
+        remaining = parse_int_header(
+            headers, "X-RateLimit-Remaining", "RateLimit-Remaining"
+        )
+        if remaining is None:
+            return
+        if now is None:
+            now = time.time()
+        limit = parse_int_header(headers, "X-RateLimit-Limit", "RateLimit-Limit")
+        reset = headers.get("X-RateLimit-Reset") or headers.get("RateLimit-Reset")
+        delay = parse_rate_limit_reset(reset, now) if reset is not None else None
+        with self.__lock:
+            self.remaining = remaining
+            self.limit = limit
+            self.reset_at = now + max(delay, 0.0) if delay is not None else None
+            self.__update_rate(now)
+
+    def __refill(self, now: float) -> None:
+        if self.rate is not None:
+            self.tokens = min(
+                float(self.burst),
+                self.tokens + max(now - self.__refilled_at, 0.0) * self.rate,
+            )
+        self.__refilled_at = now
+
+    def __update_rate(self, now: float) -> None:
+        assert self.remaining is not None
+        self.__refill(now)
+        if self.limit is not None and (
+            self.remaining >= self.limit * self.slow_down_ratio
+        ):
+            self.rate = None
+            return
+        if self.reset_at is None:
+            self.rate = None
+            return
+        usable = max(self.remaining - self.reserve, 0)
+        self.rate = usable / max(self.reset_at - now, 1.0)
+        # 桶里的令牌不能超过剩余可用的请求数
+        self.tokens = min(self.tokens, float(usable))
+
+    def acquire(self, now: float | None = None) -> float:
+        """取出一个令牌，返回发送请求前需要等待的秒数"""
+        if now is None:
+            now = time.time()
+        with self.__lock:
+            return self.__acquire(now)
+
+    def __acquire(self, now: float) -> float:
+        if self.rate is None:
+            return 0.0
+        if self.rate == 0:
+            # 预算已经耗尽，等到重置时间之后再发送请求
+            assert self.reset_at is not None
+            return min(max(self.reset_at - now, 0.0), self.max_wait)
+        self.__refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        delay = min((1 - self.tokens) / self.rate, self.max_wait)
+        # 等待期间补充的令牌正好被这次请求用掉
+        self.tokens = 0.0
+        self.__refilled_at = now + delay
+        return delay
+
+    def wait(self, url: str) -> None:
+        delay = self.acquire()
+        if delay > 0:
+            print(self.__throttle_log(url, delay))
+            sleep(delay)
+
+    def __throttle_log(self, url: str, delay: float) -> str:
+        return Log.rate_limit_throttle.format(
+            url=url, remaining=self.remaining, delay=delay
+        )
+
+
+_rate_limit_budgets: dict[str, RateLimitBudget] = {}
+_rate_limit_budgets_lock = threading.Lock()
+
+
+def get_rate_limit_key(url: str) -> str:
+    """同一主机的请求共用一个预算，
+    github的graphql接口与REST接口的限流是分开计算的"""
+    parsed_url = httpx.URL(url)
+    key = f"{parsed_url.scheme}://{parsed_url.netloc.decode('ascii')}"
+    if parsed_url.path.endswith("/graphql"):
+        key += "/graphql"
+    return key
+
+
+def get_rate_limit_budget(url: str) -> RateLimitBudget:
+    """同一个进程内的所有客户端共用同一份预算"""
+    key = get_rate_limit_key(url)
+    with _rate_limit_budgets_lock:
+        budget = _rate_limit_budgets.get(key)
+        if budget is None:
+            budget = RateLimitBudget()
+            _rate_limit_budgets[key] = budget
+        return budget
+
+
+def clear_rate_limit_budgets() -> None:
+    with _rate_limit_budgets_lock:
+        _rate_limit_budgets.clear()
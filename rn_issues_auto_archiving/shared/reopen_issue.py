@@ -16,5 +16,7 @@ def reopen_issue(
         url=reopen_url,
         headers=http_header,
         json_content=reopen_body,
+        # 重复打开同一个Issue不会产生额外的副作用
+        idempotent=True,
     )
     print(Log.reopen_issue_request_success)
@@ -0,0 +1,160 @@
+import time
+import random
+from time import sleep
+from http import HTTPStatus
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from shared.log import Log
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+"""HTTP语义上重复发送不会产生额外副作用的请求方法"""
+
+RETRYABLE_STATUS_CODES = frozenset(
+    {
+        HTTPStatus.BAD_GATEWAY,
+        HTTPStatus.SERVICE_UNAVAILABLE,
+        HTTPStatus.GATEWAY_TIMEOUT,
+    }
+)
+"""网关或服务端暂时不可用，请求可能已经被处理，只有幂等请求才能重试"""
+
+NOT_SENT_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+"""连接还没有建立，请求一定没有发送到服务端，任何请求方法都可以重试"""
+
+EPOCH_SECONDS_THRESHOLD = 1_000_000_000
+"""RateLimit-Reset在gitlab中是unix时间戳，在IETF草案中是剩余秒数，
+以此区分两种格式"""
+
+
+def parse_retry_after(value: str, now: float) -> float | None:
+    """Retry-After可以是秒数，也可以是HTTP日期"""
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return parsedate_to_datetime(value).timestamp() - now
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def parse_rate_limit_reset(value: str, now: float) -> float | None:
+    try:
+        reset = float(value.strip())
+    except ValueError:
+        return None
+    if reset >= EPOCH_SECONDS_THRESHOLD:
+        return reset - now
+    return reset
+
+
+def get_delay_from_headers(
+    headers: httpx.Headers, now: float, rate_limited: bool = True
+) -> float | None:
+    """按 Retry-After 、 X-RateLimit-Reset 、 RateLimit-Reset 的顺序
+    读取服务端要求等待的秒数，都没有时返回None。\n
+    github和gitlab的每个响应都带有限流重置时间，
+    只有被限流时（rate_limited为True）才需要等到重置时间"""
+    delay: float | None = None
+    if (value := headers.get("Retry-After")) is not None:
+        delay = parse_retry_after(value, now)
+    if not rate_limited:
+        return None if delay is None else max(delay, 0.0)
+    if delay is None and (value := headers.get("X-RateLimit-Reset")) is not None:
+        delay = parse_rate_limit_reset(value, now)
+    if delay is None and (value := headers.get("RateLimit-Reset")) is not None:
+        delay = parse_rate_limit_reset(value, now)
+    if delay is None:
+        return None
+    return max(delay, 0.0)
+
+
+def is_rate_limited(response: httpx.Response) -> bool:
+    """github触发限流时除了429，还可能返回带有限流响应头的403"""
+    if response.status_code == HTTPStatus.TOO_MANY_REQUESTS:
+        return True
+    return response.status_code == HTTPStatus.FORBIDDEN and (
+        "Retry-After" in response.headers
+        or response.headers.get("X-RateLimit-Remaining") == "0"
+    )
+
+
+class RetryPolicy:
+    """请求失败时的重试策略，使用带随机抖动的指数退避，
+    服务端通过响应头指定了等待时间时以服务端为准。\n
+    只有幂等请求（或者调用方明确声明可以重复发送的请求）
+    在请求可能已经被处理的情况下才会重试，
+    被限流（请求没有被处理）和连接失败（请求没有发送）时任何请求都可以重试。\n
+    retry_count 和 wait_seconds 记录了重试次数和等待的总时长
+    """
+
+    def __init__(
+        self,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        max_retry_after: float = 120.0,
+    ):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        """服务端要求等待的时间超过这个值时不再重试，避免流水线长时间挂起"""
+        self.retry_count: int = 0
+        self.wait_seconds: float = 0.0
+
+    @staticmethod
+    def is_idempotent(method: str, idempotent: bool | None = None) -> bool:
+        if idempotent is not None:
+            return idempotent
+        return method.upper() in IDEMPOTENT_METHODS
+
+    def should_retry_response(
+        self, method: str, response: httpx.Response, idempotent: bool | None = None
+    ) -> bool:
+        if is_rate_limited(response):
+            return True
+        return response.status_code in RETRYABLE_STATUS_CODES and self.is_idempotent(
+            method, idempotent
+        )
+
+    def should_retry_exception(
+        self, method: str, exc: Exception, idempotent: bool | None = None
+    ) -> bool:
+        if isinstance(exc, NOT_SENT_EXCEPTIONS):
+            return True
+        return self.is_idempotent(method, idempotent)
+
+    def get_backoff_delay(self, attempt: int) -> float:
+        """第attempt次（从0开始）重试前的等待时间，
+        在 [0, min(max_delay, base_delay * 2^attempt)] 之间随机取值"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def get_delay(
+        self, attempt: int, response: httpx.Response | None = None
+    ) -> float | None:
+        """返回重试前需要等待的秒数，服务端要求的等待时间过长时返回None，
+        502/503/504等没有被限流的响应只按Retry-After等待，否则使用指数退避"""
+        if response is not None:
+            delay = get_delay_from_headers(
+                response.headers, time.time(), is_rate_limited(response)
+            )
+            if delay is not None:
+                if delay > self.max_retry_after:
+                    print(
+                        Log.http_retry_after_too_long.format(
+                            delay=delay, max_retry_after=self.max_retry_after
+                        )
+                    )
+                    return None
+                # 加上少量抖动，避免多个流水线在同一时刻重新发送请求
+                return delay + random.uniform(0, self.base_delay)
+        return self.get_backoff_delay(attempt)
+
+    def __record(self, attempt: int, delay: float, reason: str) -> None:
+        self.retry_count += 1
+        self.wait_seconds += delay
+        print(Log.http_retry.format(attempt=attempt + 1, reason=reason, delay=delay))
+
+    def wait(self, attempt: int, delay: float, reason: str) -> None:
+        self.__record(attempt, delay, reason)
+        sleep(delay)
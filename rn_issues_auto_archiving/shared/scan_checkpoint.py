@@ -0,0 +1,128 @@
+import json
+import hashlib
+from pathlib import Path
+from typing import TypedDict
+
+from shared.issue_info import IssueInfo
+from shared.atomic_write import atomic_write_text
+from shared.log import Log
+
+SCAN_CHECKPOINT_VERSION = 1
+
+
+class ScanCheckpointIssueJson(TypedDict):
+    updated_at: str
+    content_sha256: str
+    """issue标签和评论的sha256值，获取评论失败时为空"""
+    status: str
+    """值为 ArchiveStatus 中的状态"""
+    message: str
+
+
+class ScanCheckpointRepositoryJson(TypedDict):
+    updated_at: str
+    """已经处理过的issue中最晚的更新时间，下次只列出在这之后更新过的issue"""
+    issues: dict[str, ScanCheckpointIssueJson]
+    """键为issue单号，只记录不在归档文件中的issue"""
+
+
+class ScanCheckpointJson(TypedDict):
+    version: int
+    repositories: dict[str, ScanCheckpointRepositoryJson]
+    """键为 issue_repository"""
+
+
+def get_issue_content_sha256(issue_info: IssueInfo) -> str:
+    """根据issue的标签和评论计算sha256值，
+    两者都没有变化时 IssueInfo.should_archive_issue 的结果也不会变化"""
+    content = json.dumps(
+        {
+            "labels": sorted(issue_info.issue_labels),
+            "comments": [
+                [comment.author, comment.body] for comment in issue_info.issue_comments
+            ],
+        },
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ScanCheckpoint:
+    """增量扫描已关闭issue的检查点，按仓库记录已经处理过的最晚更新时间，
+    以及不在归档文件中的issue的标签和评论的sha256值与检查结果，
+    issue没有更新时直接使用上次的检查结果"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.repositories: dict[str, ScanCheckpointRepositoryJson] = {}
+
+    def load(self) -> None:
+        """检查点文件不存在、版本不一致或已经损坏时从头开始扫描"""
+        try:
+            raw_json: ScanCheckpointJson = json.loads(
+                Path(self.path).read_text(encoding="utf-8")
+            )
+            if raw_json["version"] != SCAN_CHECKPOINT_VERSION:
+                raise ValueError(raw_json["version"])
+            self.repositories = dict(raw_json["repositories"])
+            print(Log.scan_checkpoint_loaded.format(checkpoint_path=self.path))
+        except (OSError, KeyError, TypeError, ValueError):
+            print(Log.scan_checkpoint_not_found.format(checkpoint_path=self.path))
+            self.repositories = {}
+
+    def save(self) -> None:
+        print(Log.save_scan_checkpoint.format(checkpoint_path=self.path))
+        atomic_write_text(
+            self.path,
+            json.dumps(
+                ScanCheckpointJson(
+                    version=SCAN_CHECKPOINT_VERSION,
+                    repositories=self.repositories,
+                ),
+                ensure_ascii=False,
+                indent=2,
+            ),
+        )
+
+    def __get_repository(self, issue_repository: str) -> ScanCheckpointRepositoryJson:
+        repository = self.repositories.get(issue_repository)
+        if repository is None:
+            repository = ScanCheckpointRepositoryJson(updated_at="", issues={})
+            self.repositories[issue_repository] = repository
+        return repository
+
+    def get_cursor(self, issue_repository: str) -> str | None:
+        repository = self.repositories.get(issue_repository)
+        if repository is None or repository["updated_at"] == "":
+            return None
+        return repository["updated_at"]
+
+    def set_cursor(self, issue_repository: str, updated_at: str) -> None:
+        self.__get_repository(issue_repository)["updated_at"] = updated_at
+
+    def get_issue(
+        self, issue_repository: str, issue_id: int
+    ) -> ScanCheckpointIssueJson | None:
+        repository = self.repositories.get(issue_repository)
+        if repository is None:
+            return None
+        return repository["issues"].get(str(issue_id))
+
+    def get_issue_ids(self, issue_repository: str) -> list[int]:
+        repository = self.repositories.get(issue_repository)
+        if repository is None:
+            return []
+        return [int(issue_id) for issue_id in repository["issues"]]
+
+    def set_issue(
+        self,
+        issue_repository: str,
+        issue_id: int,
+        issue: ScanCheckpointIssueJson,
+    ) -> None:
+        self.__get_repository(issue_repository)["issues"][str(issue_id)] = issue
+
+    def remove_issue(self, issue_repository: str, issue_id: int) -> None:
+        repository = self.repositories.get(issue_repository)
+        if repository is not None:
+            repository["issues"].pop(str(issue_id), None)
@@ -0,0 +1,25 @@
+from http import HTTPStatus
+
+import httpx
+
+from shared.exception import ArchiveBaseError, TransientError
+from shared.retry_policy import RETRYABLE_STATUS_CODES, is_rate_limited
+
+DEFAULT_RETRY_MAX_ATTEMPTS = 3
+"""暂时性错误的归档流程最多尝试的次数，包括第一次归档"""
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """判断归档流程中的异常是否是暂时性错误，
+    issue内容不满足归档条件（ArchiveBaseError）等问题重试也不会成功"""
+    if isinstance(exc, ArchiveBaseError):
+        return False
+    if isinstance(exc, (TransientError, httpx.TransportError)):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return (
+            is_rate_limited(exc.response)
+            or exc.response.status_code in RETRYABLE_STATUS_CODES
+            or exc.response.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
+        )
+    return False
@@ -1,9 +1,12 @@
+import os
+import json
 import pytest
 from unittest.mock import patch, MagicMock
 from io import TextIOWrapper
 from pathlib import Path
 
-from auto_archiving.archive_document import ArchiveDocument
+from auto_archiving.archive_document import ArchiveDocument, read_last_line
+from auto_archiving.archive_index import ArchiveIndex, get_index_path
 
 
 class TestArchiveDocument:
@@ -87,8 +90,9 @@ class TestArchiveDocument:
             "introduced_version": "0.99.914",
             "archive_version": "0.99.915",
         }
+        # 同一次运行中的新行，归档序号会接着上一个新行递增
         not_replaced_result_no_url = (
-            "|2|(Bug修复)修复了测试标题的Bug[内部Issue#3] |0.99.914|0.99.915|\n"
+            "|3|(Bug修复)修复了测试标题的Bug[内部Issue#3] |0.99.914|0.99.915|\n"
         )
 
         test_filename = "test_filename"
@@ -117,12 +121,49 @@ class TestArchiveDocument:
             replace_mode=True, **test_issue_data, **archive_rules
         )
         assert archive_document.show_new_line()[-1] == not_replaced_result
+        # 替换模式下会替换本次运行中已经添加的新行，而不是重复添加
+        assert len(archive_document.show_new_line()) == 1
 
         archive_document.archive_issue(
             replace_mode=True, **test_issue_data_no_url, **archive_rules
         )
         assert archive_document.show_new_line()[-1] == not_replaced_result_no_url
 
+    def test_archive_multiple_issues(self, archive_document: ArchiveDocument):
+        test_lines = [
+            "|序号|描述|引入版本号|归档版本号|\n",
+            "|----|----|---------|----------|\n",
+            "|1|(Bug修复)测试标题[外部Issue#1] |0.99.914|0.99.915|\n",
+        ]
+        with patch("builtins.open") as mock_open:
+            mock_file = MagicMock(spec=TextIOWrapper)
+            mock_file.readlines.return_value = test_lines
+            mock_open.return_value.__enter__.return_value = mock_file
+            archive_document.file_load("test_filename")
+
+        for issue_id in [2, 3]:
+            archive_document.archive_issue(
+                rjust_space_width=0,
+                rjust_character=" ",
+                table_separator="|",
+                archive_template="|{table_id}|[{issue_repository}#{issue_id}]|",
+                fill_issue_url_by_repository_type=[],
+                issue_title_processing_rules={},
+                issue_id=issue_id,
+                issue_type="Bug修复",
+                issue_title="测试标题",
+                issue_repository="外部Issue",
+                issue_url="",
+                introduced_version="",
+                archive_version="",
+            )
+
+        # 同一次运行中的多个新行，归档序号需要连续递增
+        assert archive_document.show_new_line() == [
+            "|2|[外部Issue#2]|\n",
+            "|3|[外部Issue#3]|\n",
+        ]
+
     def test_save(self, archive_document: ArchiveDocument, tmp_path: Path):
         test_lines = ["123", "5555", "", ""]
 
@@ -143,3 +184,286 @@ class TestArchiveDocument:
 
         expected_lines = ["123", "5555", "6666", ""]
         assert test_file.read_text(encoding="utf-8").split("\n") == expected_lines
+
+    def test_replace_mode_exact_match(
+        self, archive_document: ArchiveDocument, tmp_path: Path
+    ):
+        test_file = tmp_path / "test.md"
+        test_file.write_text(
+            "|序号|描述|\n|----|----|\n|1|[外部Issue#12]|\n|2|[外部Issue#1]|\n",
+            encoding="utf-8",
+        )
+        archive_document.file_load(str(test_file))
+        archive_document.archive_issue(
+            rjust_space_width=0,
+            rjust_character=" ",
+            table_separator="|",
+            archive_template="|{table_id}|[{issue_repository}#{issue_id}]替换|",
+            fill_issue_url_by_repository_type=[],
+            issue_title_processing_rules={},
+            issue_id=1,
+            issue_type="Bug修复",
+            issue_title="测试标题",
+            issue_repository="外部Issue",
+            issue_url="",
+            introduced_version="",
+            archive_version="",
+            replace_mode=True,
+        )
+        # 外部Issue#1 不能匹配到 外部Issue#12 的记录
+        assert archive_document.show_lines()[2] == "|1|[外部Issue#12]|\n"
+        assert archive_document.show_lines()[3] == "|2|[外部Issue#1]替换|\n"
+
+    def test_save_multiple_new_lines(
+        self, archive_document: ArchiveDocument, tmp_path: Path
+    ):
+        test_file = tmp_path / "test.md"
+        test_file.write_text(
+            "|序号|描述|\n|----|----|\n|1|[外部Issue#1]|\n", encoding="utf-8"
+        )
+        archive_document.file_load(str(test_file))
+        archive_document.add_new_line("|2|[外部Issue#2]|\n")
+        archive_document.add_new_line("|3|[外部Issue#3]|\n")
+        archive_document.save()
+        assert test_file.read_text(encoding="utf-8").endswith(
+            "|1|[外部Issue#1]|\n|2|[外部Issue#2]|\n|3|[外部Issue#3]|\n"
+        )
+
+        # 保存后的索引可以直接被下一次读取使用
+        new_archive_document = ArchiveDocument()
+        new_archive_document.file_load(str(test_file))
+        assert new_archive_document.should_issue_record_exists("外部Issue", 3)
+
+    @pytest.mark.parametrize(
+        "content, new_line, expected_content",
+        [
+            # 表格在文件末尾，直接追加
+            (
+                "|1|[外部Issue#1]|\n",
+                "|2|[外部Issue#2]|\n",
+                "|1|[外部Issue#1]|\n|2|[外部Issue#2]|\n",
+            ),
+            # 最后一行没有换行符
+            (
+                "|1|[外部Issue#1]|",
+                "|2|[外部Issue#2]|\n",
+                "|1|[外部Issue#1]|\n|2|[外部Issue#2]|\n",
+            ),
+            # 表格后面还有空行
+            (
+                "|1|[外部Issue#1]|\n\n  ",
+                "|2|[外部Issue#2]|\n",
+                "|1|[外部Issue#1]|\n|2|[外部Issue#2]|\n\n  \n",
+            ),
+        ],
+    )
+    def test_save_append(
+        self,
+        archive_document: ArchiveDocument,
+        tmp_path: Path,
+        content: str,
+        new_line: str,
+        expected_content: str,
+    ):
+        test_file = tmp_path / "test.md"
+        test_file.write_bytes(content.encode("utf-8"))
+        archive_document.file_load(str(test_file))
+        archive_document.add_new_line(new_line)
+        with patch("builtins.open", wraps=open) as mock_open:
+            archive_document.save()
+        # 不会以"w"模式重写整个文件
+        assert all(call.args[1] != "w" for call in mock_open.call_args_list)
+        assert test_file.read_bytes().decode("utf-8") == expected_content
+
+    def test_save_rewrite(self, archive_document: ArchiveDocument, tmp_path: Path):
+        test_file = tmp_path / "test.md"
+        # "\r\n"换行的文件无法按字节偏移写入，只能重写整个文件
+        test_file.write_bytes("|1|[外部Issue#1]|\r\n".encode("utf-8"))
+        archive_document.file_load(str(test_file))
+        archive_document.add_new_line("|2|[外部Issue#2]|\n")
+        archive_document.save()
+        assert test_file.read_text(encoding="utf-8") == (
+            "|1|[外部Issue#1]|\n|2|[外部Issue#2]|\n"
+        )
+
+        # 读取后文件被修改过时也只能重写整个文件
+        archive_document.file_load(str(test_file))
+        test_file.write_text("|1|[外部Issue#1]|\n\n", encoding="utf-8")
+        archive_document.add_new_line("|3|[外部Issue#3]|\n")
+        with patch("os.write") as mock_write:
+            archive_document.save()
+        mock_write.assert_not_called()
+
+    def test_save_not_changed(
+        self, archive_document: ArchiveDocument, tmp_path: Path
+    ):
+        test_file = tmp_path / "test.md"
+        test_file.write_text("|1|[外部Issue#1]|\n", encoding="utf-8")
+        archive_document.file_load(str(test_file))
+        with patch("auto_archiving.archive_document.atomic_write_text") as mock_write:
+            archive_document.save()
+        mock_write.assert_not_called()
+
+        # 保存后再次调用save不会重复写入新行
+        archive_document.add_new_line("|2|[外部Issue#2]|\n")
+        archive_document.save()
+        archive_document.save()
+        assert test_file.read_text(encoding="utf-8") == (
+            "|1|[外部Issue#1]|\n|2|[外部Issue#2]|\n"
+        )
+
+    def test_save_rewrite_failed(
+        self, archive_document: ArchiveDocument, tmp_path: Path
+    ):
+        test_file = tmp_path / "test.md"
+        content = "|1|[外部Issue#1]|\r\n"
+        test_file.write_bytes(content.encode("utf-8"))
+        archive_document.file_load(str(test_file))
+        archive_document.add_new_line("|2|[外部Issue#2]|\n")
+        with patch("os.replace", side_effect=OSError("模拟写入中断")):
+            with pytest.raises(OSError):
+                archive_document.save()
+        # 重写失败时原文件不会被截断
+        assert test_file.read_bytes() == content.encode("utf-8")
+
+
+@pytest.mark.parametrize(
+    "content, expected_offset, expected_tail",
+    [
+        ("", 0, ""),
+        ("\n\n", 0, "\n\n"),
+        ("|1|\n", 0, "|1|\n"),
+        ("|1|\n|2|测试\n", 4, "|2|测试\n"),
+        ("|1|\n|2|测试\n\n  \n", 4, "|2|测试\n\n  \n"),
+        ("|1|\n|2|测试", 4, "|2|测试"),
+    ],
+)
+@pytest.mark.parametrize("block_size", [1, 3, 8192])
+def test_read_last_line(
+    tmp_path: Path,
+    content: str,
+    expected_offset: int,
+    expected_tail: str,
+    block_size: int,
+):
+    test_file = tmp_path / "test.md"
+    test_file.write_bytes(content.encode("utf-8"))
+    offset, tail = read_last_line(str(test_file), block_size)
+    assert offset == expected_offset
+    assert tail.decode("utf-8") == expected_tail
+
+
+class TestTailMode:
+    ARCHIVE_RULES = {
+        "rjust_space_width": 0,
+        "rjust_character": " ",
+        "table_separator": "|",
+        "archive_template": "|{table_id}|[{issue_repository}#{issue_id}]|",
+        "fill_issue_url_by_repository_type": [],
+        "issue_title_processing_rules": {},
+        "issue_type": "Bug修复",
+        "issue_title": "测试标题",
+        "issue_repository": "外部Issue",
+        "issue_url": "",
+        "introduced_version": "",
+        "archive_version": "",
+    }
+    CONTENT = "|序号|描述|\n|----|----|\n|1|[外部Issue#1]|\n|2|[外部Issue#2]|\n\n"
+
+    @pytest.fixture(scope="function")
+    def test_file(self, tmp_path: Path) -> Path:
+        test_file = tmp_path / "test.md"
+        test_file.write_text(self.CONTENT, encoding="utf-8")
+        # 先建立索引
+        ArchiveDocument().file_load(str(test_file))
+        return test_file
+
+    def test_append(self, test_file: Path):
+        archive_document = ArchiveDocument()
+        with patch("builtins.open", wraps=open) as mock_open:
+            archive_document.file_load_tail(str(test_file))
+            assert archive_document.should_issue_record_exists("外部Issue", 1)
+            archive_document.archive_issue(issue_id=3, **self.ARCHIVE_RULES)
+            archive_document.save()
+        # 不会以文本模式读取整个文件
+        assert all(call.args[1] != "r" for call in mock_open.call_args_list)
+        assert test_file.read_text(encoding="utf-8") == self.CONTENT.replace(
+            "|2|[外部Issue#2]|\n", "|2|[外部Issue#2]|\n|3|[外部Issue#3]|\n"
+        )
+
+        # 更新后的索引可以继续使用
+        new_archive_document = ArchiveDocument()
+        new_archive_document.file_load_tail(str(test_file))
+        assert new_archive_document.should_issue_record_exists("外部Issue", 3)
+        assert new_archive_document.show_lines()[4] == "|3|[外部Issue#3]|\n"
+
+    def test_append_without_hashing_whole_file(self, tmp_path: Path):
+        test_file = tmp_path / "test.md"
+        test_file.write_text(self.CONTENT.rstrip("\n") + "\n", encoding="utf-8")
+        ArchiveDocument().file_load(str(test_file))
+        index_path = Path(get_index_path(str(test_file)))
+        sha256 = json.loads(index_path.read_text(encoding="utf-8"))["sha256"]
+
+        archive_document = ArchiveDocument()
+        archive_document.file_load_tail(str(test_file))
+        archive_document.archive_issue(issue_id=3, **self.ARCHIVE_RULES)
+        with patch(
+            "auto_archiving.archive_index.get_lines_sha256"
+        ) as get_lines_sha256, patch.object(
+            Path, "read_text", autospec=True, wraps=Path.read_text
+        ) as read_text:
+            archive_document.save()
+        # 追加写入后不会读取整个文件重新计算sha256
+        get_lines_sha256.assert_not_called()
+        assert all(call.args[0] != test_file for call in read_text.call_args_list)
+        raw_json = json.loads(index_path.read_text(encoding="utf-8"))
+        assert raw_json["sha256"] == sha256
+        assert raw_json["hashed_line_count"] == 4
+        assert raw_json["line_count"] == 5
+
+        # 修改时间变化后（例如重新checkout）读取整个文件，只需要重新解析新增的行
+        os.utime(test_file, ns=(0, 0))
+        with patch.object(
+            ArchiveIndex, "add_line", autospec=True, wraps=ArchiveIndex.add_line
+        ) as add_line:
+            new_archive_document = ArchiveDocument()
+            new_archive_document.file_load(str(test_file))
+        assert [call.args[1] for call in add_line.call_args_list] == [4]
+        assert new_archive_document.should_issue_record_exists("外部Issue", 3)
+        assert new_archive_document.should_issue_record_exists("外部Issue", 1)
+
+    def test_replace_mode_load_full(self, test_file: Path):
+        archive_document = ArchiveDocument()
+        archive_document.file_load_tail(str(test_file))
+        archive_document.archive_issue(
+            issue_id=1, replace_mode=True, **self.ARCHIVE_RULES
+        )
+        archive_document.save()
+        assert test_file.read_text(encoding="utf-8") == self.CONTENT
+
+    def test_stale_index_load_full(self, test_file: Path):
+        # 文件被其他程序修改后索引失效，查重时需要读取整个文件
+        test_file.write_text(self.CONTENT.replace("#1]", "#5]"), encoding="utf-8")
+        archive_document = ArchiveDocument()
+        archive_document.file_load_tail(str(test_file))
+        assert archive_document.should_issue_record_exists("外部Issue", 5)
+        assert archive_document.should_issue_record_exists("外部Issue", 1) is False
+
+    def test_apply_record_line(self, test_file: Path):
+        """把另一份归档文件中的记录行写入：已有记录时保留原来的归档序号，
+        否则接着最后一行的归档序号递增"""
+        archive_document = ArchiveDocument()
+        archive_document.file_load(str(test_file))
+        archive_document.apply_record_line("外部Issue", 2, "|7|[外部Issue#2]|新|\n")
+        archive_document.apply_record_line("外部Issue", 9, "|7|[外部Issue#9]|\n")
+        assert archive_document.find_record_line("外部Issue", 9) == (
+            "|3|[外部Issue#9]|\n"
+        )
+        archive_document.save()
+        assert test_file.read_text(encoding="utf-8") == self.CONTENT.replace(
+            "|2|[外部Issue#2]|\n", "|2|[外部Issue#2]|新|\n|3|[外部Issue#9]|\n"
+        )
+        assert archive_document.find_record_line("外部Issue", 1) == (
+            "|1|[外部Issue#1]|\n"
+        )
+        assert archive_document.find_record_line("外部Issue", 5) is None
@@ -0,0 +1,116 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from auto_archiving.archive_index import (
+    ARCHIVE_INDEX_VERSION,
+    ArchiveIndex,
+    get_index_path,
+)
+
+TEST_LINES = [
+    "|序号|描述|引入版本号|归档版本号|\n",
+    "|----|----|---------|----------|\n",
+    "|1|(Bug修复)标题[外部Issue#1](https://example.com/issues/1) |0.99.914|0.99.915|\n",
+    "|2|(Bug修复)标题#3]中的井号[外部Issue#12] |0.99.914|0.99.915|\n",
+    "|3|(设定调整)标题[内部Issue#1] |0.99.914|0.99.915|\n",
+]
+
+
+@pytest.mark.parametrize(
+    "line, expected_result",
+    [
+        (TEST_LINES[0], None),
+        (TEST_LINES[2], "外部Issue#1"),
+        # 标题中出现类似格式时以最后一个为准
+        (TEST_LINES[3], "外部Issue#12"),
+        (TEST_LINES[4], "内部Issue#1"),
+    ],
+)
+def test_parse_record_key(line: str, expected_result: str | None):
+    assert ArchiveIndex.parse_record_key(line) == expected_result
+
+
+def test_find():
+    index = ArchiveIndex()
+    index.build(TEST_LINES)
+    assert index.find("外部Issue", 1) == (2, 1)
+    assert index.find("外部Issue", 12) == (3, 2)
+    assert index.find("内部Issue", 1) == (4, 3)
+    assert index.find("外部Issue", 3) is None
+
+
+def test_insert_and_replace_lines():
+    index = ArchiveIndex()
+    index.build(TEST_LINES)
+    index.insert_lines(3, ["|4|标题[外部Issue#4] |||\n"])
+    assert index.find("外部Issue", 4) == (3, 4)
+    assert index.find("外部Issue", 12) == (4, 2)
+    assert index.find("外部Issue", 1) == (2, 1)
+
+    index.replace_line(2, "|5|标题[外部Issue#5] |||\n")
+    assert index.find("外部Issue", 1) is None
+    assert index.find("外部Issue", 5) == (2, 5)
+
+
+class TestLoad:
+    @pytest.fixture(scope="function")
+    def document(self, tmp_path: Path) -> Path:
+        document = tmp_path / "test.md"
+        document.write_text("".join(TEST_LINES), encoding="utf-8")
+        return document
+
+    def test_create_index(self, document: Path):
+        index = ArchiveIndex()
+        index.load(str(document), TEST_LINES)
+        raw_json = json.loads(
+            Path(get_index_path(str(document))).read_text(encoding="utf-8")
+        )
+        assert raw_json["version"] == ARCHIVE_INDEX_VERSION
+        assert raw_json["line_count"] == len(TEST_LINES)
+        assert raw_json["size"] == document.stat().st_size
+        assert raw_json["records"]["外部Issue#12"] == [3, 2]
+
+    def test_load_valid_index(self, document: Path):
+        ArchiveIndex().load(str(document), TEST_LINES)
+        index = ArchiveIndex()
+        # 索引有效时不会重新解析归档文件
+        index.load(str(document), [])
+        assert index.find("外部Issue", 12) == (3, 2)
+
+    def test_incremental_rebuild(self, document: Path, monkeypatch):
+        ArchiveIndex().load(str(document), TEST_LINES)
+        new_lines = TEST_LINES + ["|4|标题[外部Issue#4] |||\n"]
+        document.write_text("".join(new_lines), encoding="utf-8")
+
+        parsed_lines: list[str] = []
+        add_line = ArchiveIndex.add_line
+
+        def spy_add_line(self, index: int, line: str) -> None:
+            parsed_lines.append(line)
+            add_line(self, index, line)
+
+        monkeypatch.setattr(ArchiveIndex, "add_line", spy_add_line)
+        index = ArchiveIndex()
+        index.load(str(document), new_lines)
+        # 只需要解析新增的行
+        assert parsed_lines == [new_lines[-1]]
+        assert index.find("外部Issue", 4) == (5, 4)
+        assert index.find("外部Issue", 1) == (2, 1)
+
+    def test_rebuild_when_content_changed(self, document: Path):
+        ArchiveIndex().load(str(document), TEST_LINES)
+        new_lines = TEST_LINES[:2] + TEST_LINES[3:]
+        document.write_text("".join(new_lines), encoding="utf-8")
+
+        index = ArchiveIndex()
+        index.load(str(document), new_lines)
+        assert index.find("外部Issue", 1) is None
+        assert index.find("外部Issue", 12) == (2, 2)
+
+    def test_broken_index(self, document: Path):
+        Path(get_index_path(str(document))).write_text("{}", encoding="utf-8")
+        index = ArchiveIndex()
+        index.load(str(document), TEST_LINES)
+        assert index.find("外部Issue", 12) == (3, 2)
@@ -0,0 +1,148 @@
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from auto_archiving.failed_record import FailedRecord
+
+
+@pytest.fixture
+def record_path(tmp_path: Path) -> Path:
+    return tmp_path / "failed_record.jsonl"
+
+
+def read_lines(record_path: Path) -> list[dict]:
+    return [
+        json.loads(line)
+        for line in record_path.read_text(encoding="utf-8").splitlines()
+    ]
+
+
+def test_add_and_remove_record(record_path: Path):
+    failed_record = FailedRecord(str(record_path))
+    assert record_path.exists()
+    assert len(failed_record) == 0
+
+    failed_record.add_record(1, "title_1", "内部Issue", "reason_1")
+    failed_record.add_record(2, "title_2", "内部Issue", "reason_2")
+    failed_record.add_record(1, "title_1", "外部Issue", "reason_3")
+    # 同一个issue再次记录时覆盖原来的记录
+    failed_record.add_record(1, "title_1", "内部Issue", "reason_4")
+    assert failed_record.remove_record("内部Issue", 2)
+    assert not failed_record.remove_record("内部Issue", 3)
+
+    record = failed_record.get_record("内部Issue", 1)
+    assert record is not None and record["reason"] == "reason_4"
+    assert failed_record.get_record("内部Issue", 2) is None
+    assert ("外部Issue", 1) in failed_record
+    assert failed_record.get_all_issue_id("内部Issue") == [1]
+    # 只追加，不重写文件
+    assert [line["op"] for line in read_lines(record_path)] == [
+        "add",
+        "add",
+        "add",
+        "add",
+        "remove",
+    ]
+
+    reloaded = FailedRecord(str(record_path))
+    assert [
+        (record["issue_repository"], record["issue_id"], record["reason"])
+        for record in reloaded.get_records()
+    ] == [("外部Issue", 1, "reason_3"), ("内部Issue", 1, "reason_4")]
+
+
+def test_torn_last_line(record_path: Path):
+    failed_record = FailedRecord(str(record_path))
+    failed_record.add_record(1, "title_1", "内部Issue", "reason_1")
+    with open(record_path, "ab") as file:
+        file.write(b'{"op": "add", "issue_id": 2, "issue_ti')
+
+    reloaded = FailedRecord(str(record_path))
+    assert reloaded.get_all_issue_id("内部Issue") == [1]
+    reloaded.add_record(3, "title_3", "内部Issue", "reason_3")
+    assert [line["issue_id"] for line in read_lines(record_path)] == [1, 3]
+
+
+def test_missing_last_newline(record_path: Path):
+    failed_record = FailedRecord(str(record_path))
+    failed_record.add_record(1, "title_1", "内部Issue", "reason_1")
+    record_path.write_bytes(record_path.read_bytes().rstrip(b"\n"))
+
+    reloaded = FailedRecord(str(record_path))
+    reloaded.add_record(2, "title_2", "内部Issue", "reason_2")
+    assert reloaded.get_all_issue_id("内部Issue") == [1, 2]
+    assert [line["issue_id"] for line in read_lines(record_path)] == [1, 2]
+
+
+def test_broken_line_in_the_middle(record_path: Path):
+    failed_record = FailedRecord(str(record_path))
+    failed_record.add_record(1, "title_1", "内部Issue", "reason_1")
+    with open(record_path, "ab") as file:
+        file.write(b"not json\n")
+    failed_record.add_record(2, "title_2", "内部Issue", "reason_2")
+
+    reloaded = FailedRecord(str(record_path))
+    # 损坏的行不影响其他记录
+    assert reloaded.get_all_issue_id("内部Issue") == [1, 2]
+
+
+def test_compact(record_path: Path):
+    with patch("auto_archiving.failed_record.COMPACT_MIN_DEAD_LINES", 4):
+        failed_record = FailedRecord(str(record_path))
+        failed_record.add_record(1, "title_1", "内部Issue", "reason_1")
+        failed_record.add_record(2, "title_2", "内部Issue", "reason_2")
+        failed_record.remove_record("内部Issue", 2)
+        failed_record.add_record(1, "title_1", "内部Issue", "reason_5")
+        # 被覆盖的记录和墓碑都是失效的行
+        assert len(read_lines(record_path)) == 4
+        # 失效的行达到4行并且超过有效记录数量时重写文件只保留有效记录
+        failed_record.add_record(3, "title_3", "内部Issue", "reason_3")
+        failed_record.remove_record("内部Issue", 3)
+        assert len(read_lines(record_path)) == 1
+        record = failed_record.get_record("内部Issue", 1)
+        assert record is not None and record["reason"] == "reason_5"
+
+        failed_record.add_record(4, "title_4", "内部Issue", "reason_4")
+        assert failed_record.get_all_issue_id("内部Issue") == [1, 4]
+
+
+def test_record_attempt(record_path: Path):
+    failed_record = FailedRecord(str(record_path))
+    assert failed_record.record_attempt(1, "title_1", "内部Issue", "reason_1") == 1
+    assert failed_record.record_attempt(1, "title_1", "内部Issue", "reason_2") == 2
+    record = failed_record.get_record("内部Issue", 1)
+    assert record is not None
+    assert (record["attempts"], record["reason"]) == (2, "reason_2")
+
+    # 没有attempts字段的旧记录视为只尝试过一次
+    with open(record_path, "ab") as file:
+        file.write(
+            json.dumps(
+                {
+                    "op": "add",
+                    "issue_id": 2,
+                    "issue_title": "title_2",
+                    "issue_repository": "内部Issue",
+                    "record_time": "2024-01-01 00:00:00",
+                    "reason": "reason",
+                }
+            ).encode("utf-8")
+            + b"\n"
+        )
+    reloaded = FailedRecord(str(record_path))
+    assert reloaded.record_attempt(2, "title_2", "内部Issue", "reason") == 2
+
+
+def test_record_attempt_ci_event_type(record_path: Path):
+    """没有传入流水线的触发方式时沿用原来的记录中的触发方式"""
+    failed_record = FailedRecord(str(record_path))
+    failed_record.record_attempt(1, "title_1", "内部Issue", "reason", "trigger")
+    failed_record.record_attempt(1, "title_1", "内部Issue", "reason")
+    record = failed_record.get_record("内部Issue", 1)
+    assert record is not None and record["ci_event_type"] == "trigger"
+
+    failed_record.record_attempt(1, "title_1", "内部Issue", "reason", "web")
+    record = failed_record.get_record("内部Issue", 1)
+    assert record is not None and record["ci_event_type"] == "web"
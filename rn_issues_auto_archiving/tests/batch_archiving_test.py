@@ -0,0 +1,90 @@
+import json
+import os
+import pytest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+from batch_archiving import (
+    archive_issues,
+    load_issue_infos_from_file,
+    parse_issue_ids,
+)
+from shared.archive_status import ArchiveStatus
+from shared.env import Env
+from shared.exception import ArchiveVersionError
+from shared.issue_info import IssueInfo
+from shared.json_config import Config
+
+
+@pytest.mark.parametrize(
+    "raw_issue_ids, expected_result",
+    [
+        ("1", [1]),
+        ("1,2,3", [1, 2, 3]),
+        (" 3, 1 ,2,", [3, 1, 2]),
+        ("2,1,2,1", [2, 1]),
+        ("", []),
+    ],
+)
+def test_parse_issue_ids(raw_issue_ids: str, expected_result: list[int]):
+    assert parse_issue_ids(raw_issue_ids) == expected_result
+
+
+def test_parse_issue_ids_with_invalid_issue_id():
+    with pytest.raises(ValueError):
+        parse_issue_ids("1,#2")
+
+
+def test_load_issue_infos_from_file(tmp_path: Path):
+    issue_info = IssueInfo(issue_id=1, ci_event_type="trigger", archived_success=True)
+    issue_info_file = tmp_path / "issue_info.json"
+    platform = MagicMock()
+    platform.name = "gitlab"
+
+    with patch.dict(os.environ, {Env.CI_EVENT_TYPE: "web"}):
+        issue_info_file.write_text(json.dumps(issue_info.to_dict()), encoding="utf-8")
+        result = load_issue_infos_from_file(str(issue_info_file), platform)
+        assert len(result) == 1
+        assert result[0].issue_id == 1
+        assert result[0].ci_event_type == "web"
+        assert result[0].platform_type == "gitlab"
+        assert result[0].archived_success is False
+
+        issue_info_file.write_text(
+            json.dumps([issue_info.to_dict()] * 2), encoding="utf-8"
+        )
+        assert len(load_issue_infos_from_file(str(issue_info_file), platform)) == 2
+
+
+class TestArchiveIssues:
+    def test_archive_issues(self):
+        issue_infos = [IssueInfo(issue_id=issue_id) for issue_id in range(1, 5)]
+        platform = MagicMock()
+        archive_document = MagicMock()
+
+        with patch("batch_archiving.prepare_issue_info") as prepare_issue_info:
+            with patch(
+                "batch_archiving.write_issue_to_document"
+            ) as write_issue_to_document:
+                prepare_issue_info.side_effect = [
+                    ArchiveStatus.pending,
+                    ArchiveStatus.skipped,
+                    ArchiveVersionError("missing archive version"),
+                    Exception("network error"),
+                ]
+                write_issue_to_document.return_value = ArchiveStatus.archived
+                results = archive_issues(
+                    issue_infos, platform, Config(), archive_document
+                )
+
+        assert [result["status"] for result in results] == [
+            ArchiveStatus.archived,
+            ArchiveStatus.skipped,
+            ArchiveStatus.failed,
+            ArchiveStatus.failed,
+        ]
+        assert results[2]["message"] == "missing archive version"
+        # 只有归档条件不满足的issue才会被重新打开并发送告警评论
+        platform.reopen_issue.assert_called_once()
+        platform.send_comment.assert_called_once()
+        write_issue_to_document.assert_called_once()
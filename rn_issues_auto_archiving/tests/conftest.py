@@ -5,3 +5,30 @@ import pytest
 from unittest.mock import patch
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture(autouse=True)
+def no_retry_sleep():
+    """重试和限速等待不需要真的休眠"""
+    with patch("shared.retry_policy.sleep"), patch("shared.rate_limit.sleep"):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def clear_rate_limit():
+    """请求预算在整个进程内共享，每个测试之间需要清空"""
+    from shared.rate_limit import clear_rate_limit_budgets
+
+    clear_rate_limit_budgets()
+    yield
+    clear_rate_limit_budgets()
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    """耗时统计在整个进程内共享，每个测试之间需要清空"""
+    from shared.metrics import get_metrics
+
+    get_metrics().clear()
+    yield
+    get_metrics().clear()
@@ -1,5 +1,6 @@
 import json
 import os
+import threading
 import pytest
 from http import HTTPStatus
 from unittest.mock import patch, MagicMock
@@ -7,6 +8,7 @@ from unittest.mock import patch, MagicMock
 import httpx
 
 from issue_processor.git_service_client import (
+    COMMENTS_PER_PAGE,
     GitServiceClient,
     GithubClient,
     GitlabClient,
@@ -14,6 +16,8 @@ from issue_processor.git_service_client import (
     get_issue_id_from_url,
 )
 from shared.env import Env
+from shared.exception import GraphqlError
+from shared.http_cache import DirectoryHttpCache
 from shared.issue_info import IssueInfo
 from shared.log import Log
 
@@ -138,6 +142,116 @@ class TestGitServiceClient:
             == http_request_parameters["retry_times"]
         )
 
+    def test_retry_status_code(self, git_service_client: GitServiceClient):
+        url = "https://example.com/api"
+
+        def create_response(status_code: int, headers: dict[str, str] | None = None):
+            return httpx.Response(
+                status_code, headers=headers, request=httpx.Request("GET", url)
+            )
+
+        # 网关错误时重试GET请求，被限流时连POST请求也可以重试
+        git_service_client._http_client.request.side_effect = [
+            create_response(HTTPStatus.BAD_GATEWAY),
+            create_response(HTTPStatus.OK),
+            create_response(HTTPStatus.TOO_MANY_REQUESTS, {"Retry-After": "3"}),
+            create_response(HTTPStatus.OK),
+        ]
+        for method in ("GET", "POST"):
+            response = git_service_client.http_request(url=url, method=method)
+            assert response.status_code == HTTPStatus.OK
+        assert git_service_client.retry_policy.retry_count == 2
+        assert git_service_client.retry_policy.wait_seconds >= 3
+
+        # 非幂等请求遇到网关错误时不能重试
+        git_service_client._http_client.request.side_effect = [
+            create_response(HTTPStatus.BAD_GATEWAY)
+        ]
+        with pytest.raises(httpx.HTTPStatusError):
+            git_service_client.http_request(url=url, method="POST")
+        assert git_service_client.retry_policy.retry_count == 2
+
+    def test_rate_limit_budget(self):
+        remaining = iter([4000, 100, 10, 10])
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(
+                HTTPStatus.OK,
+                headers={
+                    "X-RateLimit-Limit": "5000",
+                    "X-RateLimit-Remaining": str(next(remaining)),
+                    "X-RateLimit-Reset": "3600",
+                },
+            )
+
+        client = GithubClient("test_token")
+        client._http_client = httpx.Client(transport=httpx.MockTransport(handler))
+        assert client.rate_limit_remaining is None
+        url = "https://api.github.com/repos/owner/repo/issues/1"
+        with patch("shared.rate_limit.sleep") as mock_sleep:
+            for _ in range(3):
+                client.http_request(url=url)
+            assert client.rate_limit_remaining == 10
+            assert list(client.rate_limit_budgets) == ["https://api.github.com"]
+            # 剩余预算低于上限的一半后开始限速，只剩保留的请求数时等待重置
+            mock_sleep.assert_not_called()
+            client.http_request(url=url)
+            mock_sleep.assert_called_once()
+
+    def test_shared_http_client(self):
+        """平台客户端与其他请求共用按主机复用的客户端，认证信息在每个请求中发送"""
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(HTTPStatus.OK, json={})
+
+        shared_client = httpx.Client(transport=httpx.MockTransport(handler))
+        client = GithubClient("test_token")
+        with patch(
+            "issue_processor.git_service_client.get_http_client",
+            return_value=shared_client,
+        ) as get_http_client:
+            client.http_request(url="https://api.github.com/repos/owner/repo")
+            client.close()
+        get_http_client.assert_called_once_with(
+            "https://api.github.com/repos/owner/repo"
+        )
+        assert requests[0].headers["Authorization"] == "Bearer test_token"
+        # 共用的客户端在进程退出时统一关闭
+        assert not shared_client.is_closed
+        shared_client.close()
+
+    def test_http_cache(self, tmp_path):
+        etag = '"abc"'
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.headers.get("If-None-Match") == etag:
+                return httpx.Response(HTTPStatus.NOT_MODIFIED)
+            return httpx.Response(
+                HTTPStatus.OK, headers={"ETag": etag}, json={"title": "test"}
+            )
+
+        client = GithubClient(
+            "test_token", http_cache=DirectoryHttpCache(str(tmp_path))
+        )
+        client._http_client = httpx.Client(transport=httpx.MockTransport(handler))
+        params = {"page": "1"}
+
+        first = client.http_request(url="https://example.com/api", params=params)
+        second = client.http_request(url="https://example.com/api", params=params)
+        assert first.json() == second.json() == {"title": "test"}
+        assert second.status_code == HTTPStatus.OK
+        assert "If-None-Match" not in requests[0].headers
+        assert requests[1].headers["If-None-Match"] == etag
+
+        # 非GET请求不使用缓存
+        client.http_request(url="https://example.com/api", method="PATCH")
+        assert "If-None-Match" not in requests[2].headers
+        client.close()
+
     def test_enrich_missing_issue_info(
         self,
         git_service_client: GitServiceClient,
@@ -222,22 +336,112 @@ class TestGitServiceClient:
             ] * 2
             mock_response = MagicMock()
             mock_response.json.return_value = comment_json
-            mock_empty_response = MagicMock()
-            mock_empty_response.json.return_value = []
+            mock_response.links = {"next": {"url": "https://example.com?page=2"}}
+            mock_last_response = MagicMock()
+            mock_last_response.json.return_value = comment_json
+            mock_last_response.links = {}
             with patch.object(github_client, "http_request") as http_request:
-                test_response_list = [mock_response] * 2
-                test_response_list.append(mock_empty_response)
-                http_request.side_effect = test_response_list
+                http_request.side_effect = [mock_response, mock_last_response]
 
                 comments = github_client._get_comments_from_platform(
                     "https://example.com"
                 )
                 assert len(comments) == 4
-                assert http_request.call_count == 3
+                # 最后一页没有 rel="next" ，不需要再请求一个空页
+                assert http_request.call_count == 2
+                assert http_request.call_args.kwargs["params"] == {
+                    "page": "2",
+                    "per_page": str(COMMENTS_PER_PAGE),
+                }
+
+        @pytest.mark.parametrize(
+            "links, expected_result",
+            [
+                ({"next": {"url": "https://example.com?page=3"}}, 3),
+                ({"prev": {"url": "https://example.com?page=1"}}, None),
+                ({}, None),
+            ],
+        )
+        def test_get_next_page(self, links: dict, expected_result: int | None):
+            mock_response = MagicMock()
+            mock_response.links = links
+            assert GithubClient.get_next_page(mock_response, 2, 100) == expected_result
+
+        @pytest.mark.parametrize(
+            "links, expected_result",
+            [
+                (
+                    {
+                        "next": {"url": "https://example.com?page=2&per_page=100"},
+                        "last": {"url": "https://example.com?page=5&per_page=100"},
+                    },
+                    5,
+                ),
+                # 最后一页的Link响应头中没有 rel="next"
+                ({"last": {"url": "https://example.com?page=5"}}, None),
+                ({"next": {"url": "https://example.com?page=2"}}, None),
+                ({}, None),
+            ],
+        )
+        def test_get_last_page(self, links: dict, expected_result: int | None):
+            mock_response = MagicMock()
+            mock_response.links = links
+            assert GithubClient.get_last_page(mock_response) == expected_result
+
+        def test__get_issue_and_comments_from_platform(self):
+            """issue信息与评论同时请求，总页数已知时剩下的评论页同时请求"""
+            comments_url = "https://api.github.com/repos/owner/repo/issues/1/comments"
+            # 两个请求都在等待时才会返回，依次请求会超时失败
+            barrier = threading.Barrier(2, timeout=5)
+            requests: list[httpx.Request] = []
+
+            def handler(request: httpx.Request) -> httpx.Response:
+                requests.append(request)
+                if request.url.path.endswith("/issues/1"):
+                    barrier.wait()
+                    return httpx.Response(
+                        HTTPStatus.OK,
+                        json={
+                            "number": 1,
+                            "title": "test_title",
+                            "state": "closed",
+                            "body": "test_body",
+                            "labels": [],
+                            "html_url": "https://github.com/owner/repo/issues/1",
+                        },
+                    )
+                page = int(request.url.params["page"])
+                headers = {}
+                if page == 1:
+                    barrier.wait()
+                    headers["Link"] = (
+                        f'<{comments_url}?page=2>; rel="next", '
+                        f'<{comments_url}?page=3>; rel="last"'
+                    )
+                return httpx.Response(
+                    HTTPStatus.OK,
+                    headers=headers,
+                    json=[{"user": {"login": "test"}, "body": f"comment_{page}"}],
+                )
+
+            client = GithubClient("test_token")
+            client._http_client = httpx.Client(transport=httpx.MockTransport(handler))
+            issue, comments = client._get_issue_and_comments_from_platform(
+                "https://api.github.com/repos/owner/repo/issues/1", comments_url
+            )
+            client.close()
+            assert issue.id == 1
+            assert [comment.body for comment in comments] == [
+                "comment_1",
+                "comment_2",
+                "comment_3",
+            ]
+            assert len(requests) == 4
 
         def test__get_issue_info_from_platform(self, github_client: GithubClient):
             test_issue_data = {
-                "id": 123,
+                "id": 987654,
+                "number": 123,
                 "title": "test_title",
                 "state": "test_state",
                 "body": "_test_body",
@@ -251,13 +455,54 @@ class TestGitServiceClient:
                 issue = github_client._get_issue_info_from_platform(
                     "https://example.com"
                 )
-                assert issue.id == test_issue_data["id"]
+                assert issue.id == test_issue_data["number"]
                 assert issue.title == test_issue_data["title"]
                 assert issue.state == test_issue_data["state"]
                 assert issue.body == test_issue_data["body"]
                 assert len(issue.labels) == len(test_issue_data["labels"])
                 assert issue.issue_web_url == test_issue_data["html_url"]
 
+        def test_list_closed_issues(self, github_client: GithubClient):
+            def create_issue_json(number: int) -> dict:
+                return {
+                    "id": number * 1000,
+                    "number": number,
+                    "title": f"title_{number}",
+                    "state": "closed",
+                    "body": None,
+                    "labels": [{"name": "Bug"}],
+                    "html_url": f"https://github.com/owner/repo/issues/{number}",
+                    "updated_at": f"2024-01-0{number}T00:00:00Z",
+                }
+
+            mock_response = MagicMock()
+            mock_response.json.return_value = [
+                create_issue_json(1),
+                # 列出issue的接口也会返回pull request
+                {**create_issue_json(2), "pull_request": {}},
+            ]
+            mock_response.links = {"next": {"url": "https://example.com?page=2"}}
+            mock_last_response = MagicMock()
+            mock_last_response.json.return_value = [create_issue_json(3)]
+            mock_last_response.links = {}
+            with patch.object(github_client, "http_request") as http_request:
+                http_request.side_effect = [mock_response, mock_last_response]
+                issues = github_client.list_closed_issues(
+                    "https://example.com", ["Bug", "Archive"], "2024-01-01T00:00:00Z"
+                )
+                assert [issue.id for issue in issues] == [1, 3]
+                assert issues[0].body == ""
+                assert issues[-1].updated_at == "2024-01-03T00:00:00Z"
+                assert http_request.call_args.kwargs["params"] == {
+                    "state": "closed",
+                    "labels": "Bug,Archive",
+                    "sort": "updated",
+                    "direction": "asc",
+                    "since": "2024-01-01T00:00:00Z",
+                    "page": "2",
+                    "per_page": str(COMMENTS_PER_PAGE),
+                }
+
         def test_reopen_issue(self, github_client: GithubClient):
             with patch.object(github_client, "http_request") as http_request:
                 http_request.return_value = None
@@ -274,6 +519,117 @@ class TestGitServiceClient:
                 )
                 assert http_request.call_count == 1
 
+        @pytest.mark.parametrize(
+            "issue_url, expected_result",
+            [
+                (
+                    "https://api.github.com/repos/owner/repo/issues/1",
+                    "https://api.github.com/graphql",
+                ),
+                (
+                    "https://github.example.com/api/v3/repos/owner/repo/issues/1",
+                    "https://github.example.com/api/graphql",
+                ),
+            ],
+        )
+        def test_build_graphql_url(self, issue_url: str, expected_result: str):
+            assert GithubClient.build_graphql_url(issue_url) == expected_result
+
+        def test_parse_issue_url(self):
+            assert GithubClient.parse_issue_url(
+                "https://api.github.com/repos/owner/repo/issues/123"
+            ) == ("owner", "repo", 123)
+
+        def test__get_issue_and_comments_from_platform_by_graphql(self):
+            def create_graphql_json(
+                comment_count: int, end_cursor: str | None
+            ) -> dict:
+                return {
+                    "data": {
+                        "repository": {
+                            "issue": {
+                                "number": 123,
+                                "title": "test_title",
+                                "state": "CLOSED",
+                                "body": "test_body",
+                                "url": "https://github.com/owner/repo/issues/123",
+                                "labels": {"nodes": [{"name": "test_label"}]},
+                                "comments": {
+                                    "pageInfo": {
+                                        "hasNextPage": end_cursor is not None,
+                                        "endCursor": end_cursor,
+                                    },
+                                    "nodes": [
+                                        {
+                                            "author": {"login": "test_user"},
+                                            "body": "test_comment",
+                                        }
+                                    ]
+                                    * (comment_count - 1)
+                                    # 评论者账号被删除时author为null
+                                    + [{"author": None, "body": "test_comment"}],
+                                },
+                            }
+                        }
+                    }
+                }
+
+            requests: list[httpx.Request] = []
+            pages = [
+                create_graphql_json(COMMENTS_PER_PAGE, "cursor_1"),
+                create_graphql_json(2, None),
+            ]
+
+            def handler(request: httpx.Request) -> httpx.Response:
+                requests.append(request)
+                return httpx.Response(HTTPStatus.OK, json=pages[len(requests) - 1])
+
+            client = GithubClient(token="test_token", use_graphql=True)
+            client._http_client = httpx.Client(transport=httpx.MockTransport(handler))
+            issue, comments = client._get_issue_and_comments_from_platform(
+                "https://api.github.com/repos/owner/repo/issues/123",
+                "https://api.github.com/repos/owner/repo/issues/123/comments",
+            )
+            assert issue == Issue(
+                id=123,
+                title="test_title",
+                state="closed",
+                body="test_body",
+                labels=["test_label"],
+                issue_web_url="https://github.com/owner/repo/issues/123",
+            )
+            assert len(comments) == COMMENTS_PER_PAGE + 2
+            assert comments[-1].author == "ghost"
+            # 评论超过一页时才需要第二次请求
+            assert len(requests) == 2
+            assert str(requests[0].url) == "https://api.github.com/graphql"
+            first_variables = json.loads(requests[0].content)["variables"]
+            second_variables = json.loads(requests[1].content)["variables"]
+            assert first_variables == {
+                "owner": "owner",
+                "name": "repo",
+                "number": 123,
+                "cursor": None,
+            }
+            assert second_variables["cursor"] == "cursor_1"
+            client.close()
+
+        def test__get_issue_and_comments_from_platform_graphql_error(self):
+            def handler(request: httpx.Request) -> httpx.Response:
+                return httpx.Response(
+                    HTTPStatus.OK,
+                    json={"data": None, "errors": [{"message": "Not Found"}]},
+                )
+
+            client = GithubClient(token="test_token", use_graphql=True)
+            client._http_client = httpx.Client(transport=httpx.MockTransport(handler))
+            with pytest.raises(GraphqlError, match="Not Found"):
+                client._get_issue_and_comments_from_platform(
+                    "https://api.github.com/repos/owner/repo/issues/123",
+                    "https://api.github.com/repos/owner/repo/issues/123/comments",
+                )
+            client.close()
+
     class TestGitlabClient:
         @pytest.fixture(scope="function")
         def gitlab_client(self):
@@ -312,18 +668,84 @@ class TestGitServiceClient:
             ] * 2
             mock_response = MagicMock()
             mock_response.json.return_value = comment_json
-            mock_empty_response = MagicMock()
-            mock_empty_response.json.return_value = []
+            mock_response.headers = {"X-Next-Page": "2"}
+            mock_last_response = MagicMock()
+            mock_last_response.json.return_value = comment_json
+            mock_last_response.headers = {"X-Next-Page": ""}
             with patch.object(gitlab_client, "http_request") as http_request:
-                test_response_list = [mock_response] * 2
-                test_response_list.append(mock_empty_response)
-                http_request.side_effect = test_response_list
+                http_request.side_effect = [mock_response, mock_last_response]
 
                 comments = gitlab_client._get_comments_from_platform(
                     "https://example.com"
                 )
                 assert len(comments) == 4
-                assert http_request.call_count == 3
+                # 最后一页的 X-Next-Page 为空，不需要再请求一个空页
+                assert http_request.call_count == 2
+                assert http_request.call_args.kwargs["params"] == {
+                    "page": "2",
+                    "per_page": str(COMMENTS_PER_PAGE),
+                }
+
+        @pytest.mark.parametrize(
+            "headers, page_item_count, expected_result",
+            [
+                ({"X-Next-Page": "3"}, 100, 3),
+                ({"X-Next-Page": ""}, 100, None),
+                # 没有分页响应头时根据当前页是否装满判断
+                ({}, COMMENTS_PER_PAGE, 3),
+                ({}, COMMENTS_PER_PAGE - 1, None),
+            ],
+        )
+        def test_get_next_page(
+            self, headers: dict, page_item_count: int, expected_result: int | None
+        ):
+            mock_response = MagicMock()
+            mock_response.headers = headers
+            assert (
+                GitlabClient.get_next_page(mock_response, 2, page_item_count)
+                == expected_result
+            )
+
+        @pytest.mark.parametrize(
+            "headers, expected_result",
+            [
+                ({"X-Total-Pages": "3"}, 3),
+                # 结果超过一万条时gitlab不返回总页数
+                ({"X-Next-Page": "2"}, None),
+            ],
+        )
+        def test_get_last_page(self, headers: dict, expected_result: int | None):
+            mock_response = MagicMock()
+            mock_response.headers = headers
+            assert GitlabClient.get_last_page(mock_response) == expected_result
+
+        def test__get_comments_from_platform_parallel(
+            self, gitlab_client: GitlabClient
+        ):
+            def create_response(page: int) -> MagicMock:
+                mock_response = MagicMock()
+                mock_response.json.return_value = [
+                    {"author": {"username": "test_user"}, "body": f"comment_{page}"}
+                ]
+                mock_response.headers = {"X-Total-Pages": "4"}
+                return mock_response
+
+            with patch.object(gitlab_client, "http_request") as http_request:
+                http_request.side_effect = lambda url, params: create_response(
+                    int(params["page"])
+                )
+                comments = gitlab_client._get_comments_from_platform(
+                    "https://example.com"
+                )
+            # 按页码顺序拼接，每页只请求一次
+            assert [comment.body for comment in comments] == [
+                f"comment_{page}" for page in range(1, 5)
+            ]
+            pages = [
+                int(call.kwargs["params"]["page"])
+                for call in http_request.call_args_list
+            ]
+            assert sorted(pages) == [1, 2, 3, 4]
 
         def test__get_issue_info_from_platform(self, gitlab_client: GitlabClient):
             test_issue_data = {
@@ -348,6 +770,36 @@ class TestGitServiceClient:
                 assert len(issue.labels) == len(test_issue_data["labels"])
                 assert issue.issue_web_url == test_issue_data["web_url"]
 
+        def test_list_closed_issues(self, gitlab_client: GitlabClient):
+            mock_response = MagicMock()
+            mock_response.json.return_value = [
+                {
+                    "iid": 7,
+                    "title": "test_title",
+                    "state": "closed",
+                    "description": None,
+                    "labels": ["Bug"],
+                    "web_url": "test_url",
+                    "updated_at": "2024-01-01T00:00:00.000Z",
+                }
+            ]
+            mock_response.headers = {"X-Next-Page": ""}
+            with patch.object(gitlab_client, "http_request") as http_request:
+                http_request.return_value = mock_response
+                issues = gitlab_client.list_closed_issues(
+                    "https://example.com", ["Bug"]
+                )
+                assert [issue.id for issue in issues] == [7]
+                assert issues[0].body == ""
+                assert http_request.call_args.kwargs["params"] == {
+                    "state": "closed",
+                    "labels": "Bug",
+                    "order_by": "updated_at",
+                    "sort": "asc",
+                    "page": "1",
+                    "per_page": str(COMMENTS_PER_PAGE),
+                }
+
         def test_reopen_issue(self, gitlab_client: GitlabClient):
             with patch.object(gitlab_client, "http_request") as http_request:
                 http_request.return_value = None
@@ -261,6 +261,61 @@ class TestGithubIssueDataSource:
 
             del issue_info
 
+    def test_load_by_issue_id(self, github_issue_data_source: GithubIssueDataSource):
+        with patch.dict(
+            os.environ,
+            {
+                Env.CI_EVENT_TYPE: "workflow_dispatch",
+                Env.ISSUE_REPOSITORY: "外部Issue",
+                Env.GITHUB_API_URL: "https://api.example.com",
+                Env.GITHUB_REPOSITORY: "owner/repo",
+            },
+        ):
+            issue_info = IssueInfo()
+            github_issue_data_source.load_by_issue_id(issue_info, 2)
+            assert issue_info.issue_id == 2
+            assert issue_info.ci_event_type == "workflow_dispatch"
+            assert issue_info.issue_repository == "外部Issue"
+            assert (
+                issue_info.links.issue_url
+                == "https://api.example.com/repos/owner/repo/issues/2"
+            )
+            assert (
+                issue_info.links.comment_url
+                == "https://api.example.com/repos/owner/repo/issues/2/comments"
+            )
+
+
+    def test_load_webhook_payload(
+        self, github_issue_data_source: GithubIssueDataSource
+    ):
+        webhook_payload = {
+            "action": "closed",
+            "issue": {
+                "number": 2,
+                "title": "test_title",
+                "state": "closed",
+                "body": None,
+                "url": "https://api.example.com/issue/2",
+                "comments_url": "https://api.example.com/issue/2/comments",
+            },
+        }
+        with patch.dict(
+            os.environ, {Env.CI_EVENT_TYPE: "issues", Env.ISSUE_REPOSITORY: "外部Issue"}
+        ):
+            issue_info = IssueInfo()
+            github_issue_data_source.load_webhook_payload(issue_info, webhook_payload)
+        assert issue_info.ci_event_type == "issues"
+        assert issue_info.issue_repository == "外部Issue"
+        assert issue_info.issue_id == 2
+        assert issue_info.issue_title == "test_title"
+        assert issue_info.issue_state == "closed"
+        assert issue_info.issue_body == ""
+        assert issue_info.links.issue_url == "https://api.example.com/issue/2"
+        assert issue_info.links.comment_url == (
+            "https://api.example.com/issue/2/comments"
+        )
+
 
 class TestGitlabIssueDataSource:
     @pytest.fixture()
@@ -337,3 +392,37 @@ class TestGitlabIssueDataSource:
             issue_info = IssueInfo()
             with pytest.raises(MissingIssueNumber):
                 gitlab_issue_data_source.load(issue_info)
+
+    def test_load_by_issue_id(self, gitlab_issue_data_source: GitlabIssueDataSource):
+        with patch.dict(
+            os.environ,
+            {
+                Env.CI_EVENT_TYPE: "web",
+                Env.ISSUE_REPOSITORY: "内部Issue",
+                Env.API_BASE_URL: "https://gitlab.example.com/api/v4/projects/1/",
+            },
+        ):
+            issue_info = IssueInfo()
+            gitlab_issue_data_source.load_by_issue_id(issue_info, 3)
+            assert issue_info.issue_id == 3
+            assert issue_info.ci_event_type == "web"
+            assert issue_info.issue_repository == "内部Issue"
+            assert issue_info.links.issue_url == (
+                issue_url := GitlabIssueDataSource.build_issue_url(
+                    3, os.environ[Env.API_BASE_URL]
+                )
+            )
+            assert issue_info.links.comment_url == issue_url + "/" + ApiPath.notes
+
+    def test_load_webhook_payload(
+        self, gitlab_issue_data_source: GitlabIssueDataSource
+    ):
+        # 与从WEBHOOK_PAYLOAD环境变量读取的结果一致
+        with patch.dict(os.environ, TestIssueData.gitlab_auto_ci_issue_data):
+            expected_issue_info = IssueInfo()
+            gitlab_issue_data_source.load(expected_issue_info)
+            issue_info = IssueInfo()
+            gitlab_issue_data_source.load_webhook_payload(
+                issue_info, json.loads(os.environ.pop(Env.WEBHOOK_PAYLOAD))
+            )
+        assert issue_info.to_dict() == expected_issue_info.to_dict()
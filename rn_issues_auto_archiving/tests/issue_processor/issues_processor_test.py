@@ -108,6 +108,32 @@ class TestIssueProcessor:
             IssueProcessor.init_issue_info(platform_type)
             assert data_source_obj.called == True
 
+    @pytest.mark.parametrize(
+        "platform, data_source_type",
+        [
+            (
+                GithubClient("test"),
+                "issue_processor.issue_data_source.GithubIssueDataSource.load_by_issue_id",
+            ),
+            (
+                GitlabClient("test"),
+                "issue_processor.issue_data_source.GitlabIssueDataSource.load_by_issue_id",
+            ),
+        ],
+    )
+    def test_init_issue_info_by_issue_id(
+        self,
+        platform: GitServiceClient,
+        data_source_type: str,
+    ):
+        with patch(data_source_type) as data_source_obj:
+            issue_info = IssueProcessor.init_issue_info_by_issue_id(platform, 2)
+            data_source_obj.assert_called_once_with(issue_info, 2)
+            assert issue_info.platform_type == platform.name
+
+        with pytest.raises(UnexpectedPlatform):
+            IssueProcessor.init_issue_info_by_issue_id(MagicMock(), 2)
+
     @pytest.mark.parametrize(
         "should_ci_running_in_issue_event,\
         should_ci_running_in_manual,\
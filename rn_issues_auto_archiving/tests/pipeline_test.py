@@ -0,0 +1,210 @@
+import os
+from unittest.mock import patch, MagicMock
+
+import httpx
+import pytest
+
+from issue_processor.git_service_client import GithubClient, GitlabClient
+from shared.archive_status import ArchiveStatus
+from shared.env import Env
+from shared.exception import ArchiveVersionError, PushConflictError
+from auto_archiving.failed_record import FailedRecord
+from shared.issue_info import IssueInfo
+from pipeline import (
+    run_archive_stage,
+    run_pipeline,
+    run_push_stage,
+    run_success_stage,
+    write_issue_to_document,
+)
+
+
+def create_issue_info(issue_id: int, platform_type: str = GitlabClient.name):
+    issue_info = IssueInfo(issue_id=issue_id, platform_type=platform_type)
+    issue_info.set_document_changed(True)
+    return issue_info
+
+
+class TestRunArchiveStage:
+    @pytest.fixture
+    def config(self, tmp_path):
+        config = MagicMock()
+        config.archived_document_path = str(tmp_path / "document.md")
+        return config
+
+    def test_archived(self, config):
+        issue_info = IssueInfo(issue_id=1)
+        with patch(
+            "pipeline.prepare_issue_info", return_value=ArchiveStatus.pending
+        ), patch(
+            "pipeline.write_issue_to_document", return_value=ArchiveStatus.archived
+        ), patch("pipeline.ArchiveDocument") as mock_archive_document:
+            mock_archive_document.return_value.is_changed.return_value = True
+            assert run_archive_stage(issue_info, MagicMock(), config)
+        mock_archive_document.return_value.save.assert_called_once()
+        assert issue_info.should_document_changed()
+
+    def test_skipped(self, config):
+        with patch(
+            "pipeline.prepare_issue_info", return_value=ArchiveStatus.skipped
+        ), patch("pipeline.ArchiveDocument") as mock_archive_document:
+            assert not run_archive_stage(IssueInfo(issue_id=1), MagicMock(), config)
+        mock_archive_document.assert_not_called()
+
+    def test_archive_failed(self, config):
+        platform = MagicMock()
+        with patch(
+            "pipeline.prepare_issue_info", side_effect=ArchiveVersionError("error")
+        ):
+            with pytest.raises(ArchiveVersionError):
+                run_archive_stage(IssueInfo(issue_id=1), platform, config)
+        platform.reopen_issue.assert_called_once()
+        platform.send_comment.assert_called_once()
+
+
+    def test_transient_error_queued(self, config, tmp_path):
+        retry_queue = FailedRecord(str(tmp_path / "retry_queue.jsonl"))
+        platform = MagicMock()
+        issue_info = IssueInfo(
+            issue_id=1, issue_repository="内部Issue", ci_event_type="trigger"
+        )
+        with patch(
+            "pipeline.prepare_issue_info", side_effect=httpx.ConnectError("error")
+        ):
+            assert not run_archive_stage(issue_info, platform, config, retry_queue)
+            # 暂时性错误记录到重试队列，不重新打开issue
+            platform.reopen_issue.assert_not_called()
+            record = retry_queue.get_record("内部Issue", 1)
+            assert record is not None and record["attempts"] == 1
+            # 重试时按这次流水线的触发方式归档
+            assert record["ci_event_type"] == "trigger"
+
+            # 没有重试队列时与之前一样抛出异常
+            with pytest.raises(httpx.ConnectError):
+                run_archive_stage(issue_info, platform, config)
+
+
+@pytest.mark.parametrize(
+    "ci_event_type, expected_status, expected_replace_mode",
+    [
+        ("trigger", ArchiveStatus.already_archived, None),
+        ("web", ArchiveStatus.archived, True),
+    ],
+)
+def test_write_issue_to_document(
+    ci_event_type: str, expected_status: str, expected_replace_mode: bool | None
+):
+    """按issue信息中的流水线触发方式查重和替换，而不是运行脚本的流水线"""
+    issue_info = IssueInfo(issue_id=1, ci_event_type=ci_event_type)
+    platform = MagicMock()
+    archive_document = MagicMock()
+    archive_document.should_issue_record_exists.return_value = True
+    with patch.dict(os.environ, {Env.CI_EVENT_TYPE: "schedule"}):
+        status = write_issue_to_document(
+            issue_info, platform, MagicMock(), archive_document
+        )
+    assert status == expected_status
+    if expected_replace_mode is None:
+        platform.send_comment.assert_called_once()
+        archive_document.archive_issue.assert_not_called()
+    else:
+        platform.send_comment.assert_not_called()
+        assert (
+            archive_document.archive_issue.call_args.kwargs["replace_mode"]
+            is expected_replace_mode
+        )
+
+
+class TestRunPushStage:
+    def test_gitlab(self):
+        issue_infos = [create_issue_info(1), create_issue_info(2)]
+        with patch("push_document.push_archived_document") as mock_push:
+            run_push_stage(issue_infos, "|")
+        mock_push.assert_called_once_with(issue_infos, "|", notify_failure=True)
+
+    def test_github(self):
+        issue_infos = [
+            create_issue_info(1, GithubClient.name),
+            create_issue_info(2, GithubClient.name),
+        ]
+        with patch("pipeline.subprocess.run") as mock_run:
+            run_push_stage(issue_infos)
+        assert mock_run.call_args.kwargs["env"][Env.ISSUE_NUMBER] == "1,2"
+
+    def test_transient_error_queued(self, tmp_path):
+        retry_queue = FailedRecord(str(tmp_path / "retry_queue.jsonl"))
+        issue_infos = [create_issue_info(1), create_issue_info(2)]
+        with patch(
+            "push_document.push_archived_document",
+            side_effect=PushConflictError("conflict"),
+        ) as mock_push, patch("push_document.notify_push_failed") as mock_notify:
+            assert not run_push_stage(issue_infos, "|", retry_queue)
+        # 由调用方决定是否重新打开issue
+        assert mock_push.call_args.kwargs["notify_failure"] is False
+        mock_notify.assert_not_called()
+        assert len(retry_queue) == 2
+
+    def test_error_notified_with_retry_queue(self, tmp_path):
+        retry_queue = FailedRecord(str(tmp_path / "retry_queue.jsonl"))
+        issue_infos = [create_issue_info(1)]
+        with patch(
+            "push_document.push_archived_document", side_effect=ValueError("error")
+        ), patch("push_document.notify_push_failed") as mock_notify:
+            with pytest.raises(ValueError):
+                run_push_stage(issue_infos, "|", retry_queue)
+        mock_notify.assert_called_once()
+        assert len(retry_queue) == 0
+
+    def test_not_changed(self):
+        issue_info = IssueInfo(issue_id=1, platform_type=GitlabClient.name)
+        with patch("push_document.push_archived_document") as mock_push:
+            run_push_stage([issue_info])
+        mock_push.assert_not_called()
+
+
+def test_run_success_stage():
+    issue_infos = [create_issue_info(index) for index in range(5)]
+    with patch("archiving_success.send_archived_success_comment") as mock_send:
+        run_success_stage(issue_infos, "token")
+    assert sorted(call.args[0].issue_id for call in mock_send.call_args_list) == (
+        list(range(5))
+    )
+
+
+def test_run_success_stage_failed():
+    """某个issue发送失败不影响其他issue，全部发送完毕后抛出错误"""
+    issue_infos = [create_issue_info(index) for index in range(3)]
+
+    def send(issue_info: IssueInfo, token: str, issue_repository: str) -> None:
+        if issue_info.issue_id == 1:
+            raise ValueError("unknown platform")
+
+    with patch(
+        "archiving_success.send_archived_success_comment", side_effect=send
+    ) as mock_send, pytest.raises(ValueError, match="unknown platform"):
+        run_success_stage(issue_infos, "token")
+    assert mock_send.call_count == 3
+
+
+def test_run_pipeline(tmp_path):
+    """三个阶段在同一个进程内共用同一个issue信息对象"""
+    issue_info = create_issue_info(1)
+    config = MagicMock()
+    config.issue_output_path = str(tmp_path / "issue_info.json")
+    config.archived_document.table_separator = "|"
+    config.retry_queue_path = ""
+    with patch.dict(os.environ, {Env.TOKEN: "token"}), patch(
+        "pipeline.run_archive_stage", return_value=True
+    ), patch("pipeline.run_push_stage") as mock_push, patch(
+        "pipeline.run_success_stage"
+    ) as mock_success:
+        assert run_pipeline(issue_info, MagicMock(), config)
+    mock_push.assert_called_once_with([issue_info], "|", None)
+    assert mock_success.call_args.args[0][0] is issue_info
+    assert (tmp_path / "issue_info.json").exists()
+
+    with patch("pipeline.run_archive_stage", return_value=False), patch(
+        "pipeline.run_push_stage"
+    ) as mock_push:
+        assert not run_pipeline(issue_info, MagicMock(), config)
+    mock_push.assert_not_called()
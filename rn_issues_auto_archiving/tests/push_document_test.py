@@ -0,0 +1,312 @@
+import os
+import base64
+import hashlib
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from push_document import (
+    CommitBuilder,
+    build_commit_message,
+    get_sync_path,
+    load_synced_commit_id,
+    main,
+    push_archived_document,
+)
+from shared.env import Env
+from shared.issue_info import IssueInfo
+
+
+@pytest.mark.parametrize(
+    "issue_ids, expected",
+    [
+        ([1], "close #1"),
+        ([1, 2], "close #1,2\n\nclose #1\nclose #2"),
+    ],
+)
+def test_build_commit_message(issue_ids: list[int], expected: str):
+    assert build_commit_message("close #{issue_id}", issue_ids) == expected
+
+
+def create_response(method: str, status_code: int = 200, **kwargs):
+    return httpx.Response(
+        status_code,
+        request=httpx.Request(method, "https://gitlab.example.com"),
+        **kwargs,
+    )
+
+
+def sha256(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class TestCommitBuilder:
+    def test_commit(self):
+        """多个文件合并成一次提交，与远程仓库一致的文件不加入提交，
+        远程仓库中不存在的文件新建"""
+        not_found = create_response("HEAD", 404)
+
+        def http_request(**kwargs):
+            if kwargs["method"] == "POST":
+                return create_response("POST", 201, json={"id": "new"})
+            if "same.md" in kwargs["url"]:
+                return create_response(
+                    "HEAD", headers={"X-Gitlab-Content-Sha256": sha256("same")}
+                )
+            if "new.md" in kwargs["url"]:
+                raise httpx.HTTPStatusError(
+                    "not found", request=not_found.request, response=not_found
+                )
+            return create_response(
+                "HEAD",
+                headers={
+                    "X-Gitlab-Content-Sha256": sha256("old"),
+                    "X-Gitlab-Last-Commit-Id": "abc",
+                },
+            )
+
+        builder = CommitBuilder({}, "gitlab.example.com", 1, "main")
+        with patch(
+            "push_document.http_request", side_effect=http_request
+        ) as mock_http_request:
+            assert builder.add_file("same.md", "same") is False
+            assert builder.add_file("changed.md", "new content")
+            assert builder.add_file("new.md", "content")
+            assert builder.commit("message", "bot@example.com", "bot") == "new"
+            # 提交后没有需要提交的文件
+            assert builder.commit("message", "bot@example.com", "bot") is None
+
+        post_calls = [
+            call
+            for call in mock_http_request.call_args_list
+            if call.kwargs["method"] == "POST"
+        ]
+        assert len(post_calls) == 1
+        assert post_calls[0].kwargs["json_content"]["actions"] == [
+            {
+                "action": "update",
+                "file_path": "changed.md",
+                "content": "new content",
+                "last_commit_id": "abc",
+            },
+            {"action": "create", "file_path": "new.md", "content": "content"},
+        ]
+        assert post_calls[0].kwargs["idempotent"] is True
+
+
+class TestPushArchivedDocument:
+    BASE_CONTENT = "|序号|描述|\n|----|----|\n|1|[内部Issue#1]|\n"
+    REMOTE_CONTENT = BASE_CONTENT + "|2|[内部Issue#2]|\n"
+    CONFLICT_MESSAGE = (
+        "You are attempting to update a file that has changed since you started "
+        "editing it."
+    )
+
+    @pytest.fixture
+    def document(self, tmp_path: Path):
+        document = tmp_path / "修改归档.md"
+        # 本次归档的issue 3 基于其他流水线提交issue 2之前的版本
+        document.write_text(
+            self.BASE_CONTENT + "|2|[内部Issue#3]|\n", encoding="utf-8"
+        )
+        with patch.dict(
+            os.environ,
+            {
+                Env.ARCHIVED_DOCUMENT_PATH: str(document),
+                Env.GITLAB_HOST: "gitlab.example.com",
+                Env.PROJECT_ID: "1",
+                Env.TOKEN: "token",
+                Env.TARGET_BRANCH: "main",
+                Env.CI_COMMIT_SHA: "base",
+                "author_email": "bot@example.com",
+                "author_name": "bot",
+                "commit_message": "Close 内部Issue#{issue_id}",
+            },
+        ):
+            yield document
+
+    def test_conflict(self, document: Path):
+        """提交时文件已经被其他流水线修改过，
+        重新获取远程文件并写入本次归档的记录行后再提交"""
+        issue_info = IssueInfo(issue_id=3, issue_repository="内部Issue")
+        conflict = create_response(
+            "POST", 400, json={"message": self.CONFLICT_MESSAGE}
+        )
+        responses = [
+            create_response(
+                "HEAD",
+                headers={
+                    "X-Gitlab-Content-Sha256": sha256(self.BASE_CONTENT),
+                    "X-Gitlab-Last-Commit-Id": "base",
+                },
+            ),
+            httpx.HTTPStatusError(
+                "conflict", request=conflict.request, response=conflict
+            ),
+            create_response(
+                "GET",
+                json={
+                    "content": base64.b64encode(
+                        self.REMOTE_CONTENT.encode("utf-8")
+                    ).decode("ascii"),
+                    "content_sha256": sha256(self.REMOTE_CONTENT),
+                    "last_commit_id": "other",
+                },
+            ),
+            create_response("POST", 201, json={"id": "new"}),
+        ]
+
+        def http_request(**kwargs):
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        with patch(
+            "push_document.http_request", side_effect=http_request
+        ) as mock_http_request:
+            push_archived_document([issue_info])
+
+        assert responses == []
+        calls = mock_http_request.call_args_list
+        assert "ref=base" in calls[0].kwargs["url"]
+        assert calls[1].kwargs["json_content"]["actions"][0]["last_commit_id"] == (
+            "base"
+        )
+        action = calls[3].kwargs["json_content"]["actions"][0]
+        assert action["last_commit_id"] == "other"
+        expected = self.REMOTE_CONTENT + "|3|[内部Issue#3]|\n"
+        assert action["content"] == expected
+        assert document.read_text(encoding="utf-8") == expected
+        assert load_synced_commit_id(str(document)) == "new"
+
+    def remote_file_response(self, content: str, last_commit_id: str):
+        return create_response(
+            "GET",
+            json={
+                "content": base64.b64encode(content.encode("utf-8")).decode("ascii"),
+                "content_sha256": sha256(content),
+                "last_commit_id": last_commit_id,
+            },
+        )
+
+    def test_base_commit_unknown(self, document: Path):
+        """不在流水线中运行且没有记录上一次推送的提交时，
+        先获取远程文件并写入本次归档的记录行，不用本地的旧内容覆盖远程仓库"""
+        responses = [
+            self.remote_file_response(self.REMOTE_CONTENT, "other"),
+            create_response("POST", 201, json={"id": "new"}),
+        ]
+        with patch.dict(os.environ), patch(
+            "push_document.http_request", side_effect=responses
+        ) as mock_http_request:
+            del os.environ[Env.CI_COMMIT_SHA]
+            push_archived_document(
+                [IssueInfo(issue_id=3, issue_repository="内部Issue")]
+            )
+
+        calls = mock_http_request.call_args_list
+        assert len(calls) == 2
+        assert calls[0].kwargs["params"] == {"ref": "main"}
+        action = calls[1].kwargs["json_content"]["actions"][0]
+        assert action["last_commit_id"] == "other"
+        assert action["content"] == self.REMOTE_CONTENT + "|3|[内部Issue#3]|\n"
+        assert load_synced_commit_id(str(document)) == "new"
+
+    def test_synced_commit(self, document: Path):
+        """不在流水线中运行时以上一次推送的提交为基准"""
+        Path(get_sync_path(str(document))).write_text(
+            '{"last_commit_id": "synced"}', encoding="utf-8"
+        )
+        responses = [
+            create_response(
+                "HEAD",
+                headers={
+                    "X-Gitlab-Content-Sha256": sha256(self.BASE_CONTENT),
+                    "X-Gitlab-Last-Commit-Id": "synced",
+                },
+            ),
+            create_response("POST", 201, json={"id": "new"}),
+        ]
+        with patch.dict(os.environ), patch(
+            "push_document.http_request", side_effect=responses
+        ) as mock_http_request:
+            del os.environ[Env.CI_COMMIT_SHA]
+            push_archived_document([IssueInfo(issue_id=3)])
+
+        calls = mock_http_request.call_args_list
+        assert "ref=synced" in calls[0].kwargs["url"]
+        assert calls[1].kwargs["json_content"]["actions"][0]["last_commit_id"] == (
+            "synced"
+        )
+        assert load_synced_commit_id(str(document)) == "new"
+
+    def test_base_commit_unknown_already_pushed(self, document: Path):
+        """远程文件中已经有本次归档的内容时不提交，记录与远程一致的提交"""
+        content = document.read_text(encoding="utf-8")
+        with patch.dict(os.environ), patch(
+            "push_document.http_request",
+            return_value=self.remote_file_response(content, "pushed"),
+        ) as mock_http_request:
+            del os.environ[Env.CI_COMMIT_SHA]
+            push_archived_document(
+                [IssueInfo(issue_id=3, issue_repository="内部Issue")]
+            )
+        mock_http_request.assert_called_once()
+        assert load_synced_commit_id(str(document)) == "pushed"
+
+    def test_no_change(self, document: Path):
+        content = document.read_text(encoding="utf-8")
+        response = create_response(
+            "HEAD", headers={"X-Gitlab-Content-Sha256": sha256(content)}
+        )
+        with patch(
+            "push_document.http_request", return_value=response
+        ) as mock_http_request:
+            push_archived_document([IssueInfo(issue_id=3)])
+        mock_http_request.assert_called_once()
+
+    def test_push_failed(self, document: Path):
+        """提交失败时重新打开本次归档的所有issue"""
+        with patch(
+            "push_document.http_request", side_effect=httpx.ConnectError("error")
+        ), patch("push_document.reopen_issue") as mock_reopen_issue, patch(
+            "push_document.send_comment"
+        ) as mock_send_comment:
+            with pytest.raises(httpx.ConnectError):
+                push_archived_document([IssueInfo(issue_id=3), IssueInfo(issue_id=4)])
+        assert mock_reopen_issue.call_count == 2
+        assert mock_send_comment.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        ('{"last_commit_id": "abc"}', "abc"),
+        ('{"last_commit_id": ""}', None),
+        ("[]", None),
+        ("not json", None),
+        (None, None),
+    ],
+)
+def test_load_synced_commit_id(tmp_path: Path, content: str | None, expected):
+    document_path = str(tmp_path / "修改归档.md")
+    if content is not None:
+        Path(get_sync_path(document_path)).write_text(content, encoding="utf-8")
+    assert load_synced_commit_id(document_path) == expected
+
+
+@pytest.mark.parametrize("document_changed", [True, False])
+def test_main_skip_not_changed(tmp_path: Path, document_changed: bool):
+    """归档流程没有修改归档文件时不发送任何请求"""
+    issue_output_path = tmp_path / "issue_info.json"
+    issue_info = IssueInfo(issue_id=1)
+    issue_info.set_document_changed(document_changed)
+    issue_info.json_dump(str(issue_output_path))
+    with patch.dict(os.environ, {Env.ISSUE_OUTPUT_PATH: str(issue_output_path)}), patch(
+        "push_document.push_archived_document"
+    ) as mock_push_archived_document:
+        main()
+    assert mock_push_archived_document.called is document_changed
@@ -0,0 +1,343 @@
+import os
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from issue_processor.git_service_client import Issue
+from shared.archive_status import ArchiveStatus
+from shared.env import Env
+from shared.exception import ArchiveVersionError
+from shared.issue_info import IssueInfo
+from shared.scan_checkpoint import ScanCheckpoint, ScanCheckpointIssueJson
+from reconcile import (
+    APPLY_MODE,
+    REPORT_MODE,
+    fetch_issue_infos,
+    find_missing_issues,
+    get_latest_updated_at,
+    get_scan_cursor,
+    reconcile_issues,
+)
+
+
+def create_issue(issue_id: int, updated_at: str = "") -> Issue:
+    return Issue(
+        id=issue_id,
+        title=f"title_{issue_id}",
+        state="closed",
+        body="",
+        labels=["Bug"],
+        issue_web_url=f"https://example.com/issues/{issue_id}",
+        updated_at=updated_at,
+    )
+
+
+def create_archive_document(archived_issue_ids: set[int]) -> MagicMock:
+    archive_document = MagicMock()
+    archive_document.should_issue_record_exists.side_effect = (
+        lambda issue_repository, issue_id: issue_id in archived_issue_ids
+    )
+    return archive_document
+
+
+def test_find_missing_issues():
+    issues = [create_issue(issue_id) for issue_id in range(1, 5)]
+    missing_issues = find_missing_issues(
+        issues, "内部Issue", create_archive_document({1, 3})
+    )
+    assert [issue.id for issue in missing_issues] == [2, 4]
+
+
+def test_fetch_issue_infos():
+    def init_issue_info_by_issue(platform, issue: Issue) -> IssueInfo:
+        if issue.id == 2:
+            raise RuntimeError("fetch failed")
+        return IssueInfo(issue_id=issue.id)
+
+    with patch(
+        "reconcile.init_issue_info_by_issue", side_effect=init_issue_info_by_issue
+    ):
+        results = fetch_issue_infos(
+            MagicMock(), [create_issue(issue_id) for issue_id in range(1, 4)], 2
+        )
+    # 结果与issues的顺序一致，单个issue获取失败不影响其他issue
+    assert isinstance(results[0], IssueInfo) and results[0].issue_id == 1
+    assert isinstance(results[1], RuntimeError)
+    assert isinstance(results[2], IssueInfo) and results[2].issue_id == 3
+
+
+@pytest.mark.parametrize(
+    "issues, expected_result",
+    [
+        (
+            [
+                create_issue(1, "2024-01-02T00:00:00Z"),
+                create_issue(2, "2024-01-03T00:00:00Z"),
+                create_issue(3),
+            ],
+            "2024-01-03T00:00:00Z",
+        ),
+        ([create_issue(1)], None),
+        ([], None),
+    ],
+)
+def test_get_latest_updated_at(issues: list[Issue], expected_result: str | None):
+    assert get_latest_updated_at(issues) == expected_result
+
+
+def test_get_scan_cursor():
+    issues = [
+        create_issue(issue_id, f"2024-01-0{issue_id}T00:00:00Z")
+        for issue_id in range(1, 4)
+    ]
+    assert get_scan_cursor(issues, set()) == "2024-01-03T00:00:00Z"
+    # 获取失败的issue下次需要重新列出
+    assert get_scan_cursor(issues, {3, 2}) == "2024-01-02T00:00:00Z"
+    assert get_scan_cursor([], set()) is None
+
+
+class TestReconcileIssues:
+    @pytest.fixture(autouse=True)
+    def env(self):
+        with patch.dict(os.environ, {Env.ISSUE_REPOSITORY: "内部Issue"}):
+            yield
+
+    def reconcile(self, mode: str, check_results: dict[int, str | Exception]):
+        def check_issue_info(issue_info: IssueInfo, config) -> str:
+            result = check_results[issue_info.issue_id]
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        issues = [create_issue(issue_id) for issue_id in range(1, 5)]
+        with patch(
+            "reconcile.init_issue_info_by_issue",
+            side_effect=lambda platform, issue: IssueInfo(issue_id=issue.id),
+        ), patch(
+            "reconcile.check_issue_info", side_effect=check_issue_info
+        ), patch(
+            "reconcile.write_issue_to_document", return_value=ArchiveStatus.archived
+        ) as write_issue_to_document:
+            results, archived_issue_infos = reconcile_issues(
+                issues, MagicMock(), MagicMock(), create_archive_document({1}), mode
+            )
+        return results, archived_issue_infos, write_issue_to_document
+
+    def test_report_mode(self):
+        results, archived_issue_infos, write_issue_to_document = self.reconcile(
+            REPORT_MODE,
+            {
+                2: ArchiveStatus.pending,
+                3: ArchiveStatus.not_archived_object,
+                4: ArchiveVersionError("missing archive version"),
+            },
+        )
+        # 已经在归档文件中的issue不需要获取评论和检查
+        assert [result["issue_id"] for result in results] == [2, 3, 4]
+        assert [result["status"] for result in results] == [
+            ArchiveStatus.pending,
+            ArchiveStatus.not_archived_object,
+            ArchiveStatus.failed,
+        ]
+        assert results[2]["message"] == "missing archive version"
+        assert all(result["issue_repository"] == "内部Issue" for result in results)
+        assert archived_issue_infos == []
+        write_issue_to_document.assert_not_called()
+
+    def test_apply_mode(self):
+        results, archived_issue_infos, write_issue_to_document = self.reconcile(
+            APPLY_MODE,
+            {
+                2: ArchiveStatus.pending,
+                3: ArchiveStatus.skipped,
+                4: ArchiveStatus.pending,
+            },
+        )
+        assert [result["status"] for result in results] == [
+            ArchiveStatus.archived,
+            ArchiveStatus.skipped,
+            ArchiveStatus.archived,
+        ]
+        assert [issue_info.issue_id for issue_info in archived_issue_infos] == [2, 4]
+        assert write_issue_to_document.call_count == 2
+
+
+class TestReconcileIssuesWithCheckpoint:
+    @pytest.fixture(autouse=True)
+    def env(self):
+        with patch.dict(os.environ, {Env.ISSUE_REPOSITORY: "内部Issue"}):
+            yield
+
+    @pytest.fixture
+    def checkpoint(self, tmp_path) -> ScanCheckpoint:
+        return ScanCheckpoint(str(tmp_path / "checkpoint.json"))
+
+    def reconcile(
+        self,
+        issues: list[Issue],
+        checkpoint: ScanCheckpoint,
+        comments: dict[int, list[str]],
+        mode: str = REPORT_MODE,
+        updated_after: str | None = None,
+    ):
+        def init_issue_info_by_issue_id(platform, issue_id: int) -> IssueInfo:
+            if issue_id in comments:
+                return IssueInfo(
+                    issue_id=issue_id,
+                    issue_comments=[
+                        IssueInfo.Comment(body=body) for body in comments[issue_id]
+                    ],
+                )
+            raise RuntimeError("fetch failed")
+
+        with patch(
+            "reconcile.init_issue_info_by_issue",
+            side_effect=lambda platform, issue: init_issue_info_by_issue_id(
+                platform, issue.id
+            ),
+        ) as mock_init_issue_info, patch(
+            "reconcile.init_issue_info_by_checkpoint",
+            side_effect=init_issue_info_by_issue_id,
+        ) as mock_init_issue_info_by_checkpoint, patch(
+            "reconcile.check_issue_info", return_value=ArchiveStatus.pending
+        ) as check_issue_info, patch(
+            "reconcile.write_issue_to_document", return_value=ArchiveStatus.archived
+        ):
+            results, archived_issue_infos = reconcile_issues(
+                issues,
+                MagicMock(),
+                MagicMock(),
+                create_archive_document(set()),
+                mode,
+                checkpoint=checkpoint,
+                updated_after=updated_after,
+            )
+        self.init_issue_info_by_checkpoint = mock_init_issue_info_by_checkpoint
+        self.archived_issue_infos = archived_issue_infos
+        return results, mock_init_issue_info, check_issue_info
+
+    def test_incremental_scan(self, checkpoint: ScanCheckpoint):
+        issues = [
+            create_issue(1, "2024-01-01T00:00:00Z"),
+            create_issue(2, "2024-01-02T00:00:00Z"),
+        ]
+        results, _, check_issue_info = self.reconcile(
+            issues, checkpoint, comments={1: ["a"], 2: ["b"]}
+        )
+        assert check_issue_info.call_count == 2
+        assert checkpoint.get_cursor("内部Issue") == "2024-01-02T00:00:00Z"
+        assert checkpoint.get_issue_ids("内部Issue") == [1, 2]
+
+        # 增量扫描只列出在检查点之后更新的issue，
+        # issue 2 的更新时间没有变化，issue 1 没有被列出
+        results, init_issue_info, check_issue_info = self.reconcile(
+            [issues[1]],
+            checkpoint,
+            updated_after="2024-01-02T00:00:00Z",
+            comments={1: ["a"], 2: ["b"]},
+        )
+        init_issue_info.assert_not_called()
+        check_issue_info.assert_not_called()
+        assert sorted(result["issue_id"] for result in results) == [1, 2]
+        assert all(result["status"] == ArchiveStatus.pending for result in results)
+
+    def test_skip_check_when_content_unchanged(self, checkpoint: ScanCheckpoint):
+        issue = create_issue(1, "2024-01-01T00:00:00Z")
+        self.reconcile([issue], checkpoint, comments={1: ["a"]})
+
+        # 只修改了标题，更新时间变化但标签和评论没有变化
+        issue.updated_at = "2024-01-03T00:00:00Z"
+        _, init_issue_info, check_issue_info = self.reconcile(
+            [issue], checkpoint, comments={1: ["a"]}
+        )
+        init_issue_info.assert_called_once()
+        check_issue_info.assert_not_called()
+        checkpoint_issue = checkpoint.get_issue("内部Issue", 1)
+        assert checkpoint_issue is not None
+        assert checkpoint_issue["updated_at"] == "2024-01-03T00:00:00Z"
+
+        # 新增了评论，需要重新检查
+        issue.updated_at = "2024-01-04T00:00:00Z"
+        _, _, check_issue_info = self.reconcile(
+            [issue], checkpoint, comments={1: ["a", "b"]}
+        )
+        check_issue_info.assert_called_once()
+
+    def test_fetch_failed(self, checkpoint: ScanCheckpoint):
+        issues = [
+            create_issue(1, "2024-01-01T00:00:00Z"),
+            create_issue(2, "2024-01-02T00:00:00Z"),
+        ]
+        results, _, _ = self.reconcile(issues, checkpoint, comments={2: ["b"]})
+        assert results[0]["status"] == ArchiveStatus.failed
+        # 游标停在获取失败的issue，下次扫描会重新获取它
+        assert checkpoint.get_cursor("内部Issue") == "2024-01-01T00:00:00Z"
+        _, init_issue_info, _ = self.reconcile(
+            issues,
+            checkpoint,
+            updated_after="2024-01-01T00:00:00Z",
+            comments={1: ["a"], 2: ["b"]},
+        )
+        init_issue_info.assert_called_once()
+
+    def test_apply_mode_and_prune(self, checkpoint: ScanCheckpoint):
+        issues = [create_issue(issue_id, "2024-01-01T00:00:00Z") for issue_id in (1, 2)]
+        checkpoint.set_issue(
+            "内部Issue",
+            3,
+            ScanCheckpointIssueJson(
+                updated_at="", content_sha256="", status="pending", message=""
+            ),
+        )
+        self.reconcile(issues, checkpoint, comments={1: ["a"], 2: ["b"]})
+        # 全量扫描时没有被列出的issue（例如被重新打开）会从检查点中删除
+        assert checkpoint.get_issue_ids("内部Issue") == [1, 2]
+
+        # apply模式下满足归档条件的issue需要重新获取后写入归档文件
+        _, init_issue_info, _ = self.reconcile(
+            issues, checkpoint, mode=APPLY_MODE, comments={1: ["a"], 2: ["b"]}
+        )
+        assert init_issue_info.call_count == 2
+        assert checkpoint.get_issue_ids("内部Issue") == []
+
+    def test_apply_mode_incremental_scan(self, checkpoint: ScanCheckpoint):
+        issues = [
+            create_issue(1, "2024-01-01T00:00:00Z"),
+            create_issue(2, "2024-01-02T00:00:00Z"),
+        ]
+        self.reconcile(issues, checkpoint, comments={1: ["a"], 2: ["b"]})
+
+        # apply模式也使用游标增量扫描，没有被列出但上次检查满足归档条件的issue
+        # 根据检查点逐个重新获取后写入归档文件
+        results, init_issue_info, _ = self.reconcile(
+            [issues[1]],
+            checkpoint,
+            mode=APPLY_MODE,
+            updated_after="2024-01-02T00:00:00Z",
+            comments={1: ["a"], 2: ["b"]},
+        )
+        init_issue_info.assert_called_once()
+        self.init_issue_info_by_checkpoint.assert_called_once()
+        assert self.init_issue_info_by_checkpoint.call_args.args[1] == 1
+        assert sorted(
+            issue_info.issue_id for issue_info in self.archived_issue_infos
+        ) == [1, 2]
+        assert all(result["status"] == ArchiveStatus.archived for result in results)
+        assert checkpoint.get_issue_ids("内部Issue") == []
+
+    def test_apply_mode_checkpoint_fetch_failed(self, checkpoint: ScanCheckpoint):
+        issue = create_issue(1, "2024-01-01T00:00:00Z")
+        self.reconcile([issue], checkpoint, comments={1: ["a"]})
+
+        results, _, _ = self.reconcile(
+            [],
+            checkpoint,
+            mode=APPLY_MODE,
+            updated_after="2024-01-02T00:00:00Z",
+            comments={},
+        )
+        assert results[0]["status"] == ArchiveStatus.failed
+        # 获取失败时保留检查点中的记录，下次apply时重新获取
+        checkpoint_issue = checkpoint.get_issue("内部Issue", 1)
+        assert checkpoint_issue is not None
+        assert checkpoint_issue["status"] == ArchiveStatus.pending
@@ -0,0 +1,301 @@
+import datetime
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+import httpx
+import pytest
+
+from auto_archiving.failed_record import DATETIME_FORMAT, FailedRecord
+from issue_processor.git_service_client import Issue
+from shared.archive_status import ArchiveStatus
+from shared.ci_event_type import CiEventType
+from shared.exception import ArchiveVersionError
+from shared.issue_info import IssueInfo
+from shared.issue_state import IssueState
+from retry_failed import (
+    check_retry_issue_info,
+    get_due_records,
+    get_retry_time,
+    init_retry_issue_info,
+    load_retry_issue_info,
+    push_retried_issues,
+    retry_issues,
+)
+
+
+RECORD_TIME = datetime.datetime(2024, 1, 1, 0, 0, 0)
+
+
+@pytest.fixture
+def retry_queue(tmp_path: Path) -> FailedRecord:
+    return FailedRecord(str(tmp_path / "retry_queue.jsonl"))
+
+
+@pytest.fixture
+def config() -> MagicMock:
+    config = MagicMock()
+    config.retry_max_attempts = 3
+    config.archived_document.table_separator = "|"
+    return config
+
+
+def add_records(
+    retry_queue: FailedRecord, attempts: dict[int, int], ci_event_type: str = ""
+) -> None:
+    with patch("auto_archiving.failed_record.datetime") as mock_datetime:
+        mock_datetime.datetime.now.return_value = RECORD_TIME
+        for issue_id, issue_attempts in attempts.items():
+            retry_queue.add_record(
+                issue_id,
+                f"title_{issue_id}",
+                "内部Issue",
+                "timeout",
+                issue_attempts,
+                ci_event_type,
+            )
+
+
+def create_issue_info(issue_id: int) -> IssueInfo:
+    return IssueInfo(
+        issue_id=issue_id,
+        issue_title=f"title_{issue_id}",
+        issue_repository="内部Issue",
+    )
+
+
+@pytest.mark.parametrize(
+    "attempts, expected_delay",
+    [
+        (1, datetime.timedelta(minutes=5)),
+        (3, datetime.timedelta(minutes=20)),
+        (20, datetime.timedelta(hours=6)),
+    ],
+)
+def test_get_retry_time(attempts: int, expected_delay: datetime.timedelta):
+    record = {"record_time": RECORD_TIME.strftime(DATETIME_FORMAT)}
+    record["attempts"] = attempts
+    assert get_retry_time(record) == RECORD_TIME + expected_delay  # type: ignore
+
+
+def test_get_retry_time_without_attempts():
+    record = {"record_time": RECORD_TIME.strftime(DATETIME_FORMAT)}
+    retry_time = get_retry_time(record)  # type: ignore
+    assert retry_time == RECORD_TIME + datetime.timedelta(minutes=5)
+
+
+def test_get_due_records(retry_queue: FailedRecord):
+    add_records(retry_queue, {1: 1, 2: 3})
+    retry_queue.add_record(3, "title_3", "外部Issue", "timeout")
+
+    now = RECORD_TIME + datetime.timedelta(minutes=10)
+    due_records = get_due_records(retry_queue, "内部Issue", now)
+    assert [record["issue_id"] for record in due_records] == [1]
+
+    now = RECORD_TIME + datetime.timedelta(minutes=20)
+    due_records = get_due_records(retry_queue, "内部Issue", now)
+    assert [record["issue_id"] for record in due_records] == [1, 2]
+
+
+@pytest.mark.parametrize(
+    "ci_event_type, expected",
+    [
+        ("web", "web"),
+        ("issues", "issues"),
+        # 旧版本的记录没有ci_event_type字段
+        ("", CiEventType.issue_event[0]),
+    ],
+)
+def test_init_retry_issue_info(
+    retry_queue: FailedRecord, ci_event_type: str, expected: str
+):
+    """以第一次归档失败时流水线的触发方式重试，而不是运行重试脚本的流水线"""
+    add_records(retry_queue, {1: 1}, ci_event_type)
+    with patch(
+        "retry_failed.IssueProcessor.init_issue_info_by_issue_id",
+        side_effect=lambda platform, issue_id: create_issue_info(issue_id),
+    ):
+        issue_info = init_retry_issue_info(MagicMock(), retry_queue.get_records()[0])
+    assert issue_info.ci_event_type == expected
+
+
+def test_load_retry_issue_info():
+    """不论运行重试脚本的流水线的触发方式，都以平台上issue的最新内容为准"""
+    issue_info = IssueInfo(issue_id=1, issue_title="old title", issue_state="closed")
+    platform = MagicMock()
+    platform.get_issue_and_comments.return_value = (
+        Issue(
+            id=1,
+            title="new title",
+            state="opened",
+            body="body",
+            labels=["label"],
+            issue_web_url="https://example.com/issues/1",
+        ),
+        [IssueInfo.Comment(author="user", body="comment")],
+    )
+    load_retry_issue_info(issue_info, platform)
+    assert issue_info.issue_state == IssueState.open
+    assert issue_info.issue_title == "new title"
+    assert issue_info.issue_body == "body"
+    assert issue_info.issue_labels == ["label"]
+    assert issue_info.links.issue_web_url == "https://example.com/issues/1"
+    assert [comment.body for comment in issue_info.issue_comments] == ["comment"]
+
+
+class TestCheckRetryIssueInfo:
+    def check(
+        self,
+        config: MagicMock,
+        issue_state: str = IssueState.closed,
+        skipped: bool = False,
+        archived_object: bool = True,
+    ) -> str:
+        issue_info = create_issue_info(1)
+        issue_info.issue_state = issue_state
+        with patch.object(
+            IssueInfo, "should_skip_archived_process", return_value=skipped
+        ), patch.object(
+            IssueInfo, "should_archive_issue", return_value=archived_object
+        ), patch(
+            "retry_failed.IssueProcessor.gather_info_from_issue"
+        ), patch(
+            "retry_failed.IssueProcessor.update_issue_info_with_gather_info"
+        ), patch(
+            "retry_failed.IssueProcessor.parse_issue_info_for_archived"
+        ):
+            return check_retry_issue_info(issue_info, config)
+
+    def test_pending(self, config: MagicMock):
+        assert self.check(config) == ArchiveStatus.pending
+
+    def test_reopened(self, config: MagicMock):
+        assert (
+            self.check(config, issue_state=IssueState.open)
+            == ArchiveStatus.not_archived_object
+        )
+
+    def test_skipped(self, config: MagicMock):
+        assert self.check(config, skipped=True) == ArchiveStatus.skipped
+
+    def test_not_archived_object(self, config: MagicMock):
+        assert (
+            self.check(config, archived_object=False)
+            == ArchiveStatus.not_archived_object
+        )
+
+
+class TestRetryIssues:
+    def retry(
+        self,
+        retry_queue: FailedRecord,
+        config: MagicMock,
+        check_results: list[str | Exception],
+    ):
+        with patch(
+            "retry_failed.IssueProcessor.init_issue_info_by_issue_id",
+            side_effect=lambda platform, issue_id: create_issue_info(issue_id),
+        ), patch("retry_failed.load_retry_issue_info"), patch(
+            "retry_failed.check_retry_issue_info", side_effect=check_results
+        ), patch(
+            "retry_failed.write_issue_to_document", return_value=ArchiveStatus.archived
+        ), patch(
+            "retry_failed.notify_archive_failed"
+        ) as notify_archive_failed:
+            results, archived_issue_infos = retry_issues(
+                retry_queue.get_records(),
+                MagicMock(),
+                config,
+                MagicMock(),
+                retry_queue,
+            )
+        return results, archived_issue_infos, notify_archive_failed
+
+    def test_retry_issues(self, retry_queue: FailedRecord, config: MagicMock):
+        add_records(retry_queue, {1: 1, 2: 1, 3: 1, 4: 1, 5: 1}, "trigger")
+        results, archived_issue_infos, notify_archive_failed = self.retry(
+            retry_queue,
+            config,
+            [
+                ArchiveStatus.pending,
+                ArchiveStatus.skipped,
+                ArchiveVersionError("missing archive version"),
+                httpx.ConnectError("connection refused"),
+                ArchiveStatus.not_archived_object,
+            ],
+        )
+
+        assert [result["status"] for result in results] == [
+            ArchiveStatus.archived,
+            ArchiveStatus.skipped,
+            ArchiveStatus.failed,
+            ArchiveStatus.failed,
+            ArchiveStatus.not_archived_object,
+        ]
+        assert [issue_info.issue_id for issue_info in archived_issue_infos] == [1]
+        # 写入归档文件的issue推送成功后才删除，暂时性错误增加尝试次数，
+        # 已经被重新打开或者不再是归档对象的issue直接删除
+        assert retry_queue.get_all_issue_id("内部Issue") == [1, 4]
+        record = retry_queue.get_record("内部Issue", 4)
+        assert record is not None and record["attempts"] == 2
+        assert record["reason"] == "connection refused"
+        assert record["ci_event_type"] == "trigger"
+        # 非暂时性错误不再重试，立即重新打开issue
+        notify_archive_failed.assert_called_once()
+        assert notify_archive_failed.call_args.args[0].issue_id == 3
+
+    def test_retry_exhausted(self, retry_queue: FailedRecord, config: MagicMock):
+        add_records(retry_queue, {1: 2})
+        _, _, notify_archive_failed = self.retry(
+            retry_queue, config, [httpx.ConnectError("connection refused")]
+        )
+        assert len(retry_queue) == 0
+        notify_archive_failed.assert_called_once()
+        assert "3" in str(notify_archive_failed.call_args.args[2])
+
+
+class TestPushRetriedIssues:
+    def push(
+        self,
+        retry_queue: FailedRecord,
+        config: MagicMock,
+        push_result: bool | Exception,
+    ):
+        with patch(
+            "retry_failed.run_push_stage", side_effect=[push_result]
+        ) as run_push_stage, patch(
+            "retry_failed.run_success_stage"
+        ) as run_success_stage, patch(
+            "retry_failed.notify_archive_failed"
+        ) as notify_archive_failed:
+            push_retried_issues(
+                [create_issue_info(1), create_issue_info(2)],
+                MagicMock(),
+                config,
+                retry_queue,
+            )
+        run_push_stage.assert_called_once()
+        assert run_push_stage.call_args.args[2] is retry_queue
+        return run_success_stage, notify_archive_failed
+
+    def test_pushed(self, retry_queue: FailedRecord, config: MagicMock):
+        add_records(retry_queue, {1: 1, 2: 1})
+        run_success_stage, _ = self.push(retry_queue, config, True)
+        assert len(retry_queue) == 0
+        run_success_stage.assert_called_once()
+
+    def test_push_queued(self, retry_queue: FailedRecord, config: MagicMock):
+        # 推送因为暂时性错误失败时run_push_stage已经增加了尝试次数
+        add_records(retry_queue, {1: 2, 2: 3})
+        run_success_stage, notify_archive_failed = self.push(
+            retry_queue, config, False
+        )
+        run_success_stage.assert_not_called()
+        assert retry_queue.get_all_issue_id("内部Issue") == [1]
+        notify_archive_failed.assert_called_once()
+        assert notify_archive_failed.call_args.args[0].issue_id == 2
+
+    def test_push_failed(self, retry_queue: FailedRecord, config: MagicMock):
+        add_records(retry_queue, {1: 1, 2: 1})
+        with pytest.raises(ValueError):
+            self.push(retry_queue, config, ValueError("push failed"))
+        assert len(retry_queue) == 0
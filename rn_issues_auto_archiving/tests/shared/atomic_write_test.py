@@ -0,0 +1,34 @@
+import os
+import stat
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from shared.atomic_write import atomic_write_bytes, atomic_write_text
+
+
+def test_atomic_write_text(tmp_path: Path):
+    test_file = tmp_path / "test.md"
+    atomic_write_text(str(test_file), "测试\n")
+    assert test_file.read_text(encoding="utf-8") == "测试\n"
+
+    test_file.write_text("旧内容\n", encoding="utf-8")
+    os.chmod(test_file, 0o644)
+    atomic_write_text(str(test_file), "新内容\n")
+    assert test_file.read_text(encoding="utf-8") == "新内容\n"
+    # 保持原文件的权限
+    assert stat.S_IMODE(os.stat(test_file).st_mode) == 0o644
+    # 不会留下临时文件
+    assert [path.name for path in tmp_path.iterdir()] == ["test.md"]
+
+
+def test_atomic_write_failed(tmp_path: Path):
+    test_file = tmp_path / "test.md"
+    test_file.write_bytes(b"old\n")
+    with patch("os.replace", side_effect=OSError("模拟写入中断")):
+        with pytest.raises(OSError):
+            atomic_write_bytes(str(test_file), b"new\n")
+    # 替换失败时原文件保持不变，临时文件被删除
+    assert test_file.read_bytes() == b"old\n"
+    assert [path.name for path in tmp_path.iterdir()] == ["test.md"]
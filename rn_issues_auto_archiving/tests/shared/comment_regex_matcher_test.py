@@ -0,0 +1,57 @@
+import re
+import json
+from pathlib import Path
+
+import pytest
+
+from shared.comment_regex_matcher import CommentRegexMatcher
+from shared.config_data_source import apply_place_holder
+
+
+@pytest.mark.parametrize(
+    "reges, should_combine",
+    [
+        (("a", "b"), True),
+        ((), False),
+        # 反向引用在合并后分组编号会变化
+        ((r"(a)\1", "b"), False),
+        ((r"(?P<x>a)(?P=x)", "b"), False),
+        # 正则中间的全局行内标记无法合并
+        (("a", "(?i)b"), False),
+    ],
+)
+def test_combined_pattern(reges: tuple[str, ...], should_combine: bool):
+    assert (CommentRegexMatcher(reges).combined_pattern is not None) is should_combine
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "1.23.456 测试通过",
+        "测试通过 1.23.456 测试通过",
+        "测试通过 1.23.456，1.23.457 已验证",
+        "以1.23.456归档",
+        "没有版本号的评论",
+        "",
+    ],
+)
+def test_findall_same_as_re_findall(text: str):
+    """使用实际的配置文件，结果必须与逐个正则 re.findall 完全一致"""
+    raw_json = json.loads(
+        (Path(__file__).parents[3] / "config" / "auto_archiving.json").read_text(
+            encoding="utf-8"
+        )
+    )
+    apply_place_holder(obj=raw_json, place_holder=raw_json)
+    for key in [
+        "archive_version_reges_for_comments",
+        "skip_archived_reges_for_comments",
+    ]:
+        reges = tuple(raw_json[key])
+        matcher = CommentRegexMatcher(reges)
+        expected_result = []
+        for regex in reges:
+            expected_result.extend(re.findall(regex, text))
+        assert matcher.combined_pattern is not None
+        assert matcher.findall(text) == expected_result
+        assert matcher.search(text) is (len(expected_result) > 0)
@@ -73,6 +73,7 @@ class TestJsonConfigDataSource:
         [
             {
                 "archive_necessary_labels": ["resolved 已解决"],
+                "skip_archived_reges_for_comments": ["跳过归档"],
                 "issue_type": {"type_keyword": {"#Bug#": "Bug修复"}},
                 "archived_document": {
                     "issue_title_processing_rules": {
@@ -103,3 +104,7 @@ class TestJsonConfigDataSource:
             config.archived_document.issue_title_processing_rules
             == json_data["archived_document"]["issue_title_processing_rules"]
         )
+        # 加载配置后评论正则已经预编译
+        assert config.skip_archived_comment_matcher.reges == tuple(
+            json_data["skip_archived_reges_for_comments"]
+        )
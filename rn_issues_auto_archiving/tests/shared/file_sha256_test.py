@@ -0,0 +1,27 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from shared.file_sha256 import (
+    get_content_sha256,
+    get_file_sha256,
+    read_file_with_sha256,
+)
+
+
+@pytest.mark.parametrize(
+    "content", ["|1|[内部Issue#1]|\r\n|2|中文|\r\n", "a\rb\n", "", "|1|\n" * 100]
+)
+def test_get_file_sha256(tmp_path: Path, content: str):
+    """逐块计算的sha256与统一换行符后整个文件的sha256一致，
+    块边界落在"\r\n"中间时也一样"""
+    test_file = tmp_path / "test.md"
+    test_file.write_bytes(content.encode("utf-8"))
+    expected_content = test_file.read_text(encoding="utf-8")
+    with patch("shared.file_sha256.READ_CHUNK_SIZE", 3):
+        assert get_file_sha256(str(test_file)) == get_content_sha256(expected_content)
+        assert read_file_with_sha256(str(test_file)) == (
+            expected_content,
+            get_content_sha256(expected_content),
+        )
@@ -0,0 +1,117 @@
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+
+from shared.http_cache import (
+    DirectoryHttpCache,
+    HttpCacheEntry,
+    build_cache_key,
+)
+
+
+def create_response(headers: dict[str, str], body: str = "[]") -> httpx.Response:
+    return httpx.Response(
+        status_code=200,
+        headers=headers,
+        content=body.encode("utf-8"),
+        request=httpx.Request("GET", "https://example.com/api?page=1"),
+    )
+
+
+def test_build_cache_key():
+    assert build_cache_key("https://example.com/api") == "https://example.com/api"
+    assert (
+        build_cache_key("https://example.com/api", {"page": "2", "per_page": "100"})
+        == "https://example.com/api?page=2&per_page=100"
+    )
+
+
+class TestHttpCacheEntry:
+    def test_from_response_without_validator(self):
+        assert HttpCacheEntry.from_response(create_response({})) is None
+
+    def test_from_response(self):
+        entry = HttpCacheEntry.from_response(
+            create_response(
+                {
+                    "ETag": '"abc"',
+                    "Link": '<https://example.com/api?page=2>; rel="next"',
+                    "Content-Encoding": "identity",
+                },
+                body='[{"body": "测试"}]',
+            )
+        )
+        assert entry is not None
+        assert entry.etag == '"abc"'
+        assert entry.conditional_headers() == {"If-None-Match": '"abc"'}
+        # 不缓存描述传输内容的响应头
+        assert "Content-Encoding" not in entry.headers
+
+        response = entry.to_response(httpx.Request("GET", entry.url))
+        assert response.status_code == 200
+        assert response.json() == [{"body": "测试"}]
+        assert "next" in response.links
+
+    def test_conditional_headers_with_last_modified(self):
+        entry = HttpCacheEntry(
+            url="https://example.com/api",
+            etag='"abc"',
+            last_modified="Wed, 21 Oct 2015 07:28:00 GMT",
+        )
+        assert entry.conditional_headers() == {
+            "If-None-Match": '"abc"',
+            "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT",
+        }
+
+
+class TestDirectoryHttpCache:
+    def test_get_and_set(self, tmp_path: Path):
+        cache = DirectoryHttpCache(str(tmp_path / "cache"))
+        key = "https://example.com/api"
+        assert cache.get(key) is None
+
+        entry = HttpCacheEntry(url=key, etag='"abc"', body="{}")
+        cache.set(key, entry)
+        assert cache.get(key) == entry
+        # 新建的缓存实例可以读取到之前写入的缓存
+        assert DirectoryHttpCache(str(tmp_path / "cache")).get(key) == entry
+
+    def test_broken_cache_file(self, tmp_path: Path):
+        cache = DirectoryHttpCache(str(tmp_path))
+        key = "https://example.com/api"
+        cache.set(key, HttpCacheEntry(url=key, etag='"abc"'))
+        for path in tmp_path.glob("*.json"):
+            path.write_text("not json", encoding="utf-8")
+        assert cache.get(key) is None
+
+    def test_evict_least_recently_used(self, tmp_path: Path):
+        cache = DirectoryHttpCache(str(tmp_path), max_size_mb=1)
+        # 每个条目约0.4MB，最多只能同时保留两个
+        body = "x" * (400 * 1024)
+        cache.set("a", HttpCacheEntry(url="a", etag='"a"', body=body))
+        cache.set("b", HttpCacheEntry(url="b", etag='"b"', body=body))
+        # 把修改时间调到过去，确保读取后"a"比"b"更新
+        for path in tmp_path.glob("*.json"):
+            os.utime(path, (0, 0))
+        assert cache.get("a") is not None
+
+        cache.set("c", HttpCacheEntry(url="c", etag='"c"', body=body))
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+        assert len(list(tmp_path.glob("*.json"))) == 2
+
+    def test_evict_removed_by_other_thread(self, tmp_path: Path):
+        cache = DirectoryHttpCache(str(tmp_path), max_size_mb=1)
+        glob = Path.glob
+
+        def glob_with_removed_file(self: Path, pattern: str):
+            # 模拟列出文件后其他线程已经删除了其中一个缓存文件
+            yield self / "removed.json"
+            yield from glob(self, pattern)
+
+        with patch.object(Path, "glob", glob_with_removed_file):
+            cache.set("a", HttpCacheEntry(url="a", etag='"a"', body="{}"))
+        assert cache.get("a") is not None
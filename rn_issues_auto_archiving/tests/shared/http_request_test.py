@@ -1,3 +1,6 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 from unittest.mock import patch, MagicMock
 from http import HTTPStatus
@@ -5,11 +8,17 @@ from http import HTTPStatus
 import httpx
 
 from shared.log import Log
-from shared.http_request import http_request
+from shared.metrics import get_metrics
+from shared.retry_policy import RetryPolicy
+from shared.http_request import (
+    close_http_clients,
+    get_http_client,
+    http_request,
+)
 
 
 class TestHttpRequest:
-    @patch("httpx.request")
+    @patch("httpx.Client.request")
     def test_successful_request(self, mock_request):
         # 模拟成功的 HTTP 请求
         mock_response = MagicMock()
@@ -34,7 +43,7 @@ class TestHttpRequest:
             follow_redirects=True,
         )
 
-    @patch("httpx.request")
+    @patch("httpx.Client.request")
     def test_404_not_found(self, mock_request):
         # 模拟 404 Not Found 错误
         error_message = "Not Found"
@@ -55,7 +64,7 @@ class TestHttpRequest:
         # 验证日志输出
         context.match(error_message)
 
-    @patch("httpx.request")
+    @patch("httpx.Client.request")
     def test_http_status_error(self, mock_request):
         # 模拟其他 HTTP 错误
         error_message = "Bad Request"
@@ -77,7 +86,7 @@ class TestHttpRequest:
         # 验证日志输出
         context.match(error_message)
 
-    @patch("httpx.request")
+    @patch("httpx.Client.request")
     def test_retry_on_exception(self, mock_request):
         # 模拟未知异常并测试重试机制
         mock_request.side_effect = [
@@ -97,7 +106,7 @@ class TestHttpRequest:
         assert mock_request.call_count == 3
         assert response.status_code == HTTPStatus.OK
 
-    @patch("httpx.request")
+    @patch("httpx.Client.request")
     def test_max_retries_exceeded(self, mock_request):
         # 模拟未知异常并测试重试次数用完后抛出异常
         error_message = "Network error"
@@ -113,3 +122,125 @@ class TestHttpRequest:
 
         # 验证抛出的异常是最后一次引发的异常
         assert mock_request.call_count == 3
+
+
+class TestHttpClient:
+    @pytest.fixture(autouse=True)
+    def close_clients(self):
+        close_http_clients()
+        yield
+        close_http_clients()
+
+    def test_reuse_client_per_host(self):
+        client = get_http_client("https://gitlab.example.com/api/v4/projects/1")
+        assert client is get_http_client("https://gitlab.example.com/api/v4/issues")
+        assert client is not get_http_client("https://api.github.com/repos")
+        assert client is not get_http_client("http://gitlab.example.com/api/v4")
+
+    def test_concurrent_get_client(self):
+        barrier = threading.Barrier(8)
+
+        def get_client(_) -> httpx.Client:
+            barrier.wait()
+            return get_http_client("https://gitlab.example.com/api/v4")
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            clients = list(executor.map(get_client, range(8)))
+        assert all(client is clients[0] for client in clients)
+
+    def test_close_http_clients(self):
+        client = get_http_client("https://gitlab.example.com/api/v4")
+        close_http_clients()
+        assert client.is_closed
+        # 关闭后再次请求时重新创建客户端
+        new_client = get_http_client("https://gitlab.example.com/api/v4")
+        assert new_client is not client
+        assert not new_client.is_closed
+
+    @patch("httpx.Client.request")
+    def test_requests_share_client(self, mock_request):
+        mock_request.return_value = MagicMock(status_code=HTTPStatus.OK)
+        with patch(
+            "shared.http_request.httpx.Client", wraps=httpx.Client
+        ) as mock_client:
+            for method in ("HEAD", "PUT", "POST"):
+                http_request(
+                    headers={}, url="https://gitlab.example.com/api/v4", method=method
+                )
+        mock_client.assert_called_once()
+        assert mock_request.call_count == 3
+
+
+class TestRetryPolicy:
+    def create_client(
+        self, status_codes: list[int], requests: list[httpx.Request]
+    ) -> httpx.Client:
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(
+                status_codes[len(requests) - 1], headers={"Retry-After": "1"}
+            )
+
+        return httpx.Client(transport=httpx.MockTransport(handler))
+
+    @pytest.mark.parametrize(
+        "method, status_codes, expected_status_code, expected_request_count",
+        [
+            ("GET", [HTTPStatus.BAD_GATEWAY, HTTPStatus.OK], HTTPStatus.OK, 2),
+            ("POST", [HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.OK], HTTPStatus.OK, 2),
+            # POST请求遇到502时可能已经被处理，不能重试
+            ("POST", [HTTPStatus.BAD_GATEWAY], HTTPStatus.BAD_GATEWAY, 1),
+            # 重试次数用完后抛出最后一次的错误
+            (
+                "GET",
+                [HTTPStatus.SERVICE_UNAVAILABLE] * 3,
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                3,
+            ),
+        ],
+    )
+    def test_retry_status_code(
+        self,
+        method: str,
+        status_codes: list[int],
+        expected_status_code: int,
+        expected_request_count: int,
+    ):
+        requests: list[httpx.Request] = []
+        policy = RetryPolicy()
+        url = "https://gitlab.example.com/api/v4"
+        with patch(
+            "shared.http_request.get_http_client",
+            return_value=self.create_client(status_codes, requests),
+        ):
+            if expected_status_code == HTTPStatus.OK:
+                response = http_request(
+                    headers={}, url=url, method=method, retry_policy=policy
+                )
+                assert response.status_code == expected_status_code
+            else:
+                with pytest.raises(httpx.HTTPStatusError):
+                    http_request(
+                        headers={}, url=url, method=method, retry_policy=policy
+                    )
+        assert len(requests) == expected_request_count
+        assert policy.retry_count == expected_request_count - 1
+        assert policy.wait_seconds >= policy.retry_count
+        # 每次调用只记录一条请求耗时，包括重试次数和最后一次响应的状态码
+        (metric,) = get_metrics().http_requests
+        assert metric["method"] == method
+        assert metric["retries"] == expected_request_count - 1
+        assert metric["status"] == expected_status_code
+        assert (metric["error"] is None) == (expected_status_code == HTTPStatus.OK)
+
+    @patch("httpx.Client.request")
+    def test_not_retry_non_idempotent(self, mock_request):
+        mock_request.side_effect = [httpx.ReadTimeout("timeout")] * 3
+        with pytest.raises(httpx.ReadTimeout):
+            http_request(
+                headers={},
+                url="https://gitlab.example.com/api/v4",
+                method="PUT",
+                idempotent=False,
+            )
+        assert mock_request.call_count == 1
@@ -1,9 +1,11 @@
 import pytest
+from unittest.mock import patch
 import json
 from pathlib import Path
 
 from shared.issue_info import CommentJson, IssueInfoJson, IssueInfo
 from shared.exception import *
+from shared.comment_regex_matcher import CommentRegexMatcher
 
 
 class TestData:
@@ -32,6 +34,7 @@ class TestData:
         "reopen_http_method": "PUT",
         "reopen_body": {"state_event": "reopen"},
         "archived_success": False,
+        "document_changed": False,
         "links": {
             "issue_url": "https://example.com/api/v4/projects/xx/issues/1",
             "issue_web_url": "https://example.com/xx/xx/issues/1",
@@ -56,6 +59,7 @@ class TestData:
         "reopen_http_method": "",
         "reopen_body": {},
         "archived_success": False,
+        "document_changed": False,
         "links": {"issue_url": "", "issue_web_url": "", "comment_url": ""},
     }
     issue_body_with_introduced_version = "【发现版本号】：0.99.918\n"
@@ -289,19 +293,21 @@ def test_get_archive_version_from_comments(
             for comment_dict in comments
         ]
     )
-    archive_version_reges_for_comments = [
-        "(\\d\\.\\d{2}\\.\\d{3}[a-zA-Z]?\\d{0,2})测试通过",
-        "已验证[,，]版本号[:：](\\d\\.\\d{2}\\.\\d{3}[a-zA-Z]?\\d{0,2})",
-    ]
+    archive_version_comment_matcher = CommentRegexMatcher(
+        (
+            "(\\d\\.\\d{2}\\.\\d{3}[a-zA-Z]?\\d{0,2})测试通过",
+            "已验证[,，]版本号[:：](\\d\\.\\d{2}\\.\\d{3}[a-zA-Z]?\\d{0,2})",
+        )
+    )
     if include_archive_version_number >= 2:
         with pytest.raises(ArchiveVersionError):
             issue_info.get_archive_version_from_comments(
-                archive_version_reges_for_comments
+                archive_version_comment_matcher
             )
 
     else:
         assert expected_version == issue_info.get_archive_version_from_comments(
-            archive_version_reges_for_comments
+            archive_version_comment_matcher
         )
 
 
@@ -364,10 +370,12 @@ def test_should_archive_issue(
         issue_labels=labels,
     )
     archive_necessary_labels = ["resolved 已解决"]
-    archive_version_reges_for_comments = [
-        "(\\d\\.\\d{2}\\.\\d{3}[a-zA-Z]?\\d{0,2})测试通过",
-        "已验证[,，]版本号[:：](\\d\\.\\d{2}\\.\\d{3}[a-zA-Z]?\\d{0,2})",
-    ]
+    archive_version_comment_matcher = CommentRegexMatcher(
+        (
+            "(\\d\\.\\d{2}\\.\\d{3}[a-zA-Z]?\\d{0,2})测试通过",
+            "已验证[,，]版本号[:：](\\d\\.\\d{2}\\.\\d{3}[a-zA-Z]?\\d{0,2})",
+        )
+    )
     raw_archive_version_reges_for_comments = [
         "{version_regex}测试通过",
         "已验证[,，]版本号[:：]{version_regex}",
@@ -389,7 +397,7 @@ def test_should_archive_issue(
     if "resolved 已解决" not in labels and archive_version_number == 1:
         with pytest.raises(ArchiveLabelError):
             issue_info.should_archive_issue(
-                archive_version_reges_for_comments,
+                archive_version_comment_matcher,
                 raw_archive_version_reges_for_comments,
                 archive_necessary_labels,
             )
@@ -397,7 +405,7 @@ def test_should_archive_issue(
     elif "resolved 已解决" in labels and archive_version_number == 0:
         with pytest.raises(ArchiveVersionError):
             issue_info.should_archive_issue(
-                archive_version_reges_for_comments,
+                archive_version_comment_matcher,
                 raw_archive_version_reges_for_comments,
                 archive_necessary_labels,
             )
@@ -406,7 +414,7 @@ def test_should_archive_issue(
         "resolved 已解决" in labels and archive_version_number == 1
     ):
         assert expected_result == issue_info.should_archive_issue(
-            archive_version_reges_for_comments,
+            archive_version_comment_matcher,
             raw_archive_version_reges_for_comments,
             archive_necessary_labels,
         )
@@ -472,7 +480,7 @@ def test_should_archived_success():
 
 def test_should_skip_archived_process():
     issue_info = IssueInfo()
-    reges = ["跳过归档流程", "test_regex"]
+    reges = CommentRegexMatcher(("跳过归档流程", "test_regex"))
 
     assert issue_info.should_skip_archived_process(reges) is False
 
@@ -489,3 +497,25 @@ def test_should_skip_archived_process():
         IssueInfo.Comment(author="test", body="qewqiojisdtest_regexdsadas1e13123"),
     ]
     assert issue_info.should_skip_archived_process(reges) is True
+
+
+def test_find_all_in_comments_cache():
+    issue_info = IssueInfo(
+        issue_comments=[IssueInfo.Comment(author="test", body="1.23.456 测试通过")]
+    )
+    matcher = CommentRegexMatcher((r"(\d\.\d{2}\.\d{3}) *测试通过",))
+
+    with patch.object(matcher, "findall", wraps=matcher.findall) as findall:
+        assert issue_info.find_all_in_comments(matcher) == ["1.23.456"]
+        assert issue_info.find_all_in_comments(matcher) == ["1.23.456"]
+        # 评论没有变化时不会重复扫描
+        assert findall.call_count == 1
+
+        issue_info.issue_comments = [
+            IssueInfo.Comment(author="test", body="1.23.457 测试通过")
+        ]
+        assert issue_info.find_all_in_comments(matcher) == ["1.23.457"]
+        assert findall.call_count == 2
+
+    # 缓存不会被输出
+    assert "_comment_match_cache" not in issue_info.to_dict()
@@ -0,0 +1,149 @@
+import json
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from shared.metrics import (
+    METRICS_VERSION,
+    Metrics,
+    get_metrics,
+    get_metrics_path,
+    get_url_template,
+    span,
+    timed,
+)
+
+
+@pytest.mark.parametrize(
+    "url, expected_result",
+    [
+        (
+            "https://gitlab.example.com/api/v4/projects/12/issues/34/notes?page=2",
+            "https://gitlab.example.com/api/v4/projects/{id}/issues/{id}/notes",
+        ),
+        (
+            "https://api.github.com/repos/owner/repo/issues/5/comments",
+            "https://api.github.com/repos/owner/repo/issues/{id}/comments",
+        ),
+        (
+            "https://gitlab.example.com/api/v4/projects/group%2Fproject/repository",
+            "https://gitlab.example.com/api/v4/projects/group%2Fproject/repository",
+        ),
+    ],
+)
+def test_get_url_template(url: str, expected_result: str):
+    assert get_url_template(url) == expected_result
+
+
+def test_get_metrics_path():
+    assert Path(get_metrics_path("./output/issue_info.json")) == Path(
+        "./output/metrics.json"
+    )
+
+
+def test_span():
+    with span("outer"):
+        with span("inner"):
+            pass
+        with pytest.raises(ValueError):
+            with span("failed"):
+                raise ValueError("error")
+
+    spans = {item["name"]: item for item in get_metrics().spans}
+    assert spans["outer"]["parent"] is None
+    assert spans["inner"]["parent"] == "outer"
+    assert spans["failed"]["error"] == repr(ValueError("error"))
+    assert spans["outer"]["duration"] >= spans["inner"]["duration"]
+
+
+def test_timed():
+    class Processor:
+        @staticmethod
+        @timed()
+        def process(value: int) -> int:
+            return value + 1
+
+    @timed("custom_name")
+    def func() -> None:
+        pass
+
+    assert Processor.process(1) == 2
+    func()
+    assert [item["name"] for item in get_metrics().spans] == [
+        "test_timed.<locals>.Processor.process",
+        "custom_name",
+    ]
+
+
+def test_http_request():
+    metrics = Metrics()
+    response = httpx.Response(200, content=b"12345")
+    with metrics.span("enrich"):
+        with metrics.http_request("GET", "https://example.com/issues/1") as item:
+            item.retries = 1
+            item.set_response(response)
+    (metric,) = metrics.http_requests
+    assert metric["url_template"] == "https://example.com/issues/{id}"
+    assert metric["span"] == "enrich"
+    assert metric["status"] == 200
+    assert metric["retries"] == 1
+    assert metric["bytes"] == 5
+    assert metric["error"] is None
+
+
+def test_span_stack_per_thread():
+    def run() -> None:
+        with span("thread"):
+            pass
+
+    with span("main"):
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+    spans = {item["name"]: item for item in get_metrics().spans}
+    # 其他线程中的span不会把当前线程的span作为外层span
+    assert spans["thread"]["parent"] is None
+
+
+def test_bind_span():
+    def run() -> None:
+        with span("thread"):
+            pass
+
+    with span("main"):
+        thread = threading.Thread(target=get_metrics().bind_span(run))
+        thread.start()
+        thread.join()
+    spans = {item["name"]: item for item in get_metrics().spans}
+    # 包装后在其他线程中的span以提交时所在的span为外层span
+    assert spans["thread"]["parent"] == "main"
+
+
+def test_max_records():
+    metrics = Metrics()
+    with patch("shared.metrics.MAX_METRICS_RECORDS", 2):
+        for _ in range(3):
+            with metrics.span("step"):
+                pass
+    assert len(metrics.spans) == 2
+    assert metrics.dropped == 1
+
+
+def test_save(tmp_path: Path):
+    metrics = Metrics()
+    with metrics.span("step"):
+        pass
+    metrics_path = tmp_path / "metrics.json"
+    metrics.save(str(metrics_path))
+
+    content = json.loads(metrics_path.read_text(encoding="utf-8"))
+    assert content["version"] == METRICS_VERSION
+    assert [item["name"] for item in content["spans"]] == ["step"]
+    assert content["http_requests"] == []
+    assert content["duration"] >= content["spans"][0]["duration"]
+
+    # 写入失败不影响归档流程
+    metrics.save(str(tmp_path / "not_exists" / "metrics.json"))
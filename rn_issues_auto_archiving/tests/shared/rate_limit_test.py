@@ -0,0 +1,108 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from shared.rate_limit import (
+    RateLimitBudget,
+    get_rate_limit_budget,
+    get_rate_limit_key,
+)
+
+NOW = 1_700_000_000.0
+
+
+def create_headers(limit: int, remaining: int, reset_after: int) -> httpx.Headers:
+    return httpx.Headers(
+        {
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(int(NOW) + reset_after),
+        }
+    )
+
+
+def test_get_rate_limit_key():
+    assert (
+        get_rate_limit_key("https://api.github.com/repos/owner/repo/issues/1")
+        == "https://api.github.com"
+    )
+    assert (
+        get_rate_limit_key("https://api.github.com/graphql")
+        == "https://api.github.com/graphql"
+    )
+    assert get_rate_limit_budget(
+        "https://gitlab.example.com/api/v4/projects/1"
+    ) is get_rate_limit_budget("https://gitlab.example.com/api/v4/issues")
+
+
+class TestRateLimitBudget:
+    def test_no_rate_limit_headers(self):
+        budget = RateLimitBudget()
+        budget.update(httpx.Headers({}), NOW)
+        assert budget.remaining is None
+        assert all(budget.acquire(NOW) == 0 for _ in range(100))
+
+    def test_enough_budget(self):
+        budget = RateLimitBudget()
+        budget.update(create_headers(5000, 4000, 3600), NOW)
+        assert budget.remaining == 4000
+        assert budget.rate is None
+        assert all(budget.acquire(NOW) == 0 for _ in range(100))
+
+    def test_slow_down(self):
+        budget = RateLimitBudget(burst=2, reserve=10)
+        # gitlab使用不带X-前缀的响应头
+        budget.update(
+            httpx.Headers(
+                {
+                    "RateLimit-Limit": "1000",
+                    "RateLimit-Remaining": "110",
+                    "RateLimit-Reset": str(int(NOW) + 100),
+                }
+            ),
+            NOW,
+        )
+        # 剩余100个可用请求平均分配到100秒内
+        assert budget.rate == 1
+        assert budget.acquire(NOW) == 0
+        assert budget.acquire(NOW) == 0
+        assert budget.acquire(NOW) == pytest.approx(1)
+        assert budget.acquire(NOW) == pytest.approx(1)
+        # 时间过去后令牌会补充回来
+        assert budget.acquire(NOW + 10) == 0
+
+    def test_tokens_not_exceed_usable_budget(self):
+        budget = RateLimitBudget(burst=10, reserve=10)
+        budget.update(create_headers(5000, 12, 3600), NOW)
+        assert budget.acquire(NOW) == 0
+        assert budget.acquire(NOW) == 0
+        assert budget.acquire(NOW) > 0
+
+    def test_exhausted(self):
+        budget = RateLimitBudget(reserve=10, max_wait=120)
+        budget.update(create_headers(5000, 5, 30), NOW)
+        assert budget.acquire(NOW) == 30
+        budget.update(create_headers(5000, 0, 3600), NOW)
+        # 等待时间不会超过max_wait
+        assert budget.acquire(NOW) == 120
+
+
+def test_concurrent_acquire_and_get_budget():
+    """多个线程同时取出令牌时，每个令牌只能被取出一次，
+    同一主机只会创建一个预算"""
+    budget = RateLimitBudget(burst=5, reserve=0)
+    budget.update(create_headers(1000, 100, 1000), NOW)
+    barrier = threading.Barrier(20)
+
+    def acquire(_) -> tuple[float, RateLimitBudget]:
+        barrier.wait()
+        return budget.acquire(NOW), get_rate_limit_budget(
+            "https://concurrent.example.com/api"
+        )
+
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        results = list(executor.map(acquire, range(20)))
+    assert sum(1 for delay, _ in results if delay == 0) == 5
+    assert len({id(host_budget) for _, host_budget in results}) == 1
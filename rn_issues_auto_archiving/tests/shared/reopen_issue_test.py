@@ -4,7 +4,7 @@ from unittest.mock import patch, MagicMock
 from shared.reopen_issue import reopen_issue
 
 
-@patch("httpx.request")
+@patch("httpx.Client.request")
 def test_reopen_issue(mock_request):
     args_dict = {
         "http_header": {},
@@ -0,0 +1,143 @@
+import time
+from email.utils import formatdate
+from http import HTTPStatus
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from shared.retry_policy import (
+    RetryPolicy,
+    get_delay_from_headers,
+    is_rate_limited,
+)
+
+NOW = 1_700_000_000.0
+
+
+@pytest.mark.parametrize(
+    "headers, expected_delay",
+    [
+        ({}, None),
+        ({"Retry-After": "5"}, 5),
+        ({"Retry-After": formatdate(NOW + 30, usegmt=True)}, 30),
+        # 已经过了重置时间时不需要等待
+        ({"Retry-After": formatdate(NOW - 30, usegmt=True)}, 0),
+        ({"Retry-After": "invalid", "X-RateLimit-Reset": str(int(NOW) + 10)}, 10),
+        ({"RateLimit-Reset": str(int(NOW) + 20)}, 20),
+        ({"RateLimit-Reset": "7"}, 7),
+        ({"RateLimit-Reset": "invalid"}, None),
+    ],
+)
+def test_get_delay_from_headers(headers: dict[str, str], expected_delay: float | None):
+    assert get_delay_from_headers(httpx.Headers(headers), NOW) == expected_delay
+
+
+def test_get_delay_from_headers_not_rate_limited():
+    headers = httpx.Headers(
+        {"X-RateLimit-Reset": str(int(NOW) + 10), "RateLimit-Reset": "7"}
+    )
+    # 没有被限流时限流重置时间与重试无关
+    assert get_delay_from_headers(headers, NOW, rate_limited=False) is None
+    headers["Retry-After"] = "5"
+    assert get_delay_from_headers(headers, NOW, rate_limited=False) == 5
+
+
+@pytest.mark.parametrize(
+    "status_code, headers, expected",
+    [
+        (HTTPStatus.TOO_MANY_REQUESTS, {}, True),
+        (HTTPStatus.FORBIDDEN, {}, False),
+        (HTTPStatus.FORBIDDEN, {"Retry-After": "60"}, True),
+        (HTTPStatus.FORBIDDEN, {"X-RateLimit-Remaining": "0"}, True),
+        (HTTPStatus.FORBIDDEN, {"X-RateLimit-Remaining": "10"}, False),
+    ],
+)
+def test_is_rate_limited(status_code: int, headers: dict[str, str], expected: bool):
+    assert is_rate_limited(httpx.Response(status_code, headers=headers)) == expected
+
+
+class TestRetryPolicy:
+    @pytest.mark.parametrize(
+        "method, status_code, idempotent, expected",
+        [
+            ("GET", HTTPStatus.BAD_GATEWAY, None, True),
+            ("PUT", HTTPStatus.SERVICE_UNAVAILABLE, None, True),
+            # 非幂等请求可能已经被处理，不能重试
+            ("POST", HTTPStatus.BAD_GATEWAY, None, False),
+            ("POST", HTTPStatus.BAD_GATEWAY, True, True),
+            ("PUT", HTTPStatus.BAD_GATEWAY, False, False),
+            # 被限流的请求没有被处理，任何请求都可以重试
+            ("POST", HTTPStatus.TOO_MANY_REQUESTS, None, True),
+            ("GET", HTTPStatus.BAD_REQUEST, None, False),
+            ("GET", HTTPStatus.INTERNAL_SERVER_ERROR, None, False),
+        ],
+    )
+    def test_should_retry_response(
+        self, method: str, status_code: int, idempotent: bool | None, expected: bool
+    ):
+        assert (
+            RetryPolicy().should_retry_response(
+                method, httpx.Response(status_code), idempotent
+            )
+            == expected
+        )
+
+    def test_should_retry_exception(self):
+        policy = RetryPolicy()
+        assert policy.should_retry_exception("GET", httpx.ReadTimeout("timeout"))
+        assert not policy.should_retry_exception("POST", httpx.ReadTimeout("timeout"))
+        # 连接失败时请求没有发送出去
+        assert policy.should_retry_exception("POST", httpx.ConnectError("refused"))
+
+    def test_get_backoff_delay(self):
+        policy = RetryPolicy(base_delay=1, max_delay=5)
+        with patch("random.uniform", side_effect=lambda a, b: b):
+            assert [policy.get_backoff_delay(attempt) for attempt in range(5)] == [
+                1,
+                2,
+                4,
+                5,
+                5,
+            ]
+
+    def test_get_delay(self):
+        policy = RetryPolicy(base_delay=1, max_retry_after=60)
+        with patch("random.uniform", return_value=0.5):
+            assert policy.get_delay(0, httpx.Response(429)) == 0.5
+            assert (
+                policy.get_delay(0, httpx.Response(429, headers={"Retry-After": "10"}))
+                == 10.5
+            )
+            # 服务端要求等待的时间过长时不再重试
+            assert (
+                policy.get_delay(
+                    0, httpx.Response(429, headers={"Retry-After": "3600"})
+                )
+                is None
+            )
+
+    def test_get_delay_for_server_error_with_rate_limit_reset(self):
+        policy = RetryPolicy(base_delay=1, max_retry_after=60)
+        # github和gitlab的每个响应都带有限流重置时间，
+        # 还有剩余请求数时503应该使用指数退避重试，而不是等到重置时间或者不再重试
+        response = httpx.Response(
+            HTTPStatus.SERVICE_UNAVAILABLE,
+            headers={
+                "X-RateLimit-Remaining": "4000",
+                "X-RateLimit-Reset": str(int(time.time()) + 3600),
+            },
+        )
+        with patch("random.uniform", return_value=0.5):
+            assert policy.get_delay(0, response) == 0.5
+            response.headers["Retry-After"] = "10"
+            assert policy.get_delay(0, response) == 10.5
+
+    def test_counters(self):
+        policy = RetryPolicy()
+        with patch("shared.retry_policy.sleep") as mock_sleep:
+            policy.wait(0, 1.5, "502")
+            policy.wait(1, 2.5, "502")
+        assert mock_sleep.call_count == 2
+        assert policy.retry_count == 2
+        assert policy.wait_seconds == 4
@@ -0,0 +1,65 @@
+from pathlib import Path
+
+from shared.issue_info import IssueInfo
+from shared.scan_checkpoint import (
+    ScanCheckpoint,
+    ScanCheckpointIssueJson,
+    get_issue_content_sha256,
+)
+
+
+def create_issue_info(labels: list[str], comments: list[str]) -> IssueInfo:
+    return IssueInfo(
+        issue_labels=labels,
+        issue_comments=[
+            IssueInfo.Comment(author="user", body=body) for body in comments
+        ],
+    )
+
+
+def test_get_issue_content_sha256():
+    content_sha256 = get_issue_content_sha256(create_issue_info(["a", "b"], ["1"]))
+    # 标签的顺序不影响sha256值
+    assert content_sha256 == get_issue_content_sha256(
+        create_issue_info(["b", "a"], ["1"])
+    )
+    assert content_sha256 != get_issue_content_sha256(
+        create_issue_info(["a", "b"], ["1", "2"])
+    )
+    assert content_sha256 != get_issue_content_sha256(create_issue_info(["a"], ["1"]))
+
+
+def test_save_and_load(tmp_path: Path):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    checkpoint = ScanCheckpoint(checkpoint_path)
+    checkpoint.load()
+    assert checkpoint.get_cursor("内部Issue") is None
+    assert checkpoint.get_issue("内部Issue", 1) is None
+
+    checkpoint.set_cursor("内部Issue", "2024-01-02T00:00:00Z")
+    issue = ScanCheckpointIssueJson(
+        updated_at="2024-01-01T00:00:00Z",
+        content_sha256="sha256",
+        status="pending",
+        message="",
+    )
+    checkpoint.set_issue("内部Issue", 1, issue)
+    checkpoint.set_issue("内部Issue", 2, issue)
+    checkpoint.remove_issue("内部Issue", 2)
+    checkpoint.save()
+
+    loaded = ScanCheckpoint(checkpoint_path)
+    loaded.load()
+    assert loaded.get_cursor("内部Issue") == "2024-01-02T00:00:00Z"
+    assert loaded.get_cursor("外部Issue") is None
+    assert loaded.get_issue("内部Issue", 1) == issue
+    assert loaded.get_issue_ids("内部Issue") == [1]
+
+
+def test_load_invalid_checkpoint(tmp_path: Path):
+    checkpoint_path = tmp_path / "checkpoint.json"
+    checkpoint = ScanCheckpoint(str(checkpoint_path))
+    for content in ["not json", '{"version": 0, "repositories": {}}', "{}"]:
+        checkpoint_path.write_text(content, encoding="utf-8")
+        checkpoint.load()
+        assert checkpoint.repositories == {}
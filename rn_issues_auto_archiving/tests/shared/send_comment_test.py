@@ -4,7 +4,7 @@ from unittest.mock import patch, MagicMock
 from shared.send_comment import send_comment
 
 
-@patch("httpx.request")
+@patch("httpx.Client.request")
 def test_send_comment(mock_request):
     args_dict = {
         "http_header": {},
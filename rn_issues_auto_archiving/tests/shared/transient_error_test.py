@@ -0,0 +1,33 @@
+from http import HTTPStatus
+
+import httpx
+import pytest
+
+from shared.exception import ArchiveVersionError, PushConflictError
+from shared.transient_error import is_transient_error
+
+
+def create_status_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://example.com")
+    return httpx.HTTPStatusError(
+        "error", request=request, response=httpx.Response(status_code, request=request)
+    )
+
+
+@pytest.mark.parametrize(
+    "exc, expected",
+    [
+        (httpx.ConnectError("error"), True),
+        (httpx.ReadTimeout("error"), True),
+        (PushConflictError("error"), True),
+        (create_status_error(HTTPStatus.TOO_MANY_REQUESTS), True),
+        (create_status_error(HTTPStatus.BAD_GATEWAY), True),
+        (create_status_error(HTTPStatus.INTERNAL_SERVER_ERROR), True),
+        (create_status_error(HTTPStatus.NOT_FOUND), False),
+        # issue内容不满足归档条件时重试也不会成功
+        (ArchiveVersionError("error"), False),
+        (ValueError("error"), False),
+    ],
+)
+def test_is_transient_error(exc: Exception, expected: bool):
+    assert is_transient_error(exc) == expected
@@ -0,0 +1,322 @@
+import json
+import asyncio
+from http import HTTPStatus
+from unittest.mock import patch, MagicMock
+
+import httpx
+import pytest
+
+from issue_processor.git_service_client import GithubClient, GitlabClient
+from shared.archive_status import ArchiveStatus
+from shared.exception import ArchiveVersionError, WebhookRequestError
+from shared.issue_info import IssueInfo
+from shared.event_coalescer import EventCoalescer
+from utils.send_fake_webhook import build_webhook_headers, send_webhook
+from webhook_server import (
+    WEBHOOK_PATH,
+    WebhookEvent,
+    WebhookEventProcessor,
+    WebhookServer,
+    parse_webhook_event,
+    verify_webhook_secret,
+)
+
+GITLAB_ISSUE_PAYLOAD = {
+    "object_kind": "issue",
+    "event_type": "issue",
+    "object_attributes": {"iid": 1, "action": "close"},
+}
+GITHUB_ISSUE_PAYLOAD = {"action": "closed", "issue": {"number": 1}}
+
+
+def lower_headers(headers: dict[str, str]) -> dict[str, str]:
+    return {name.lower(): value for name, value in headers.items()}
+
+
+@pytest.mark.parametrize("platform_type", [GitlabClient.name, GithubClient.name])
+def test_verify_webhook_secret(platform_type: str):
+    body = json.dumps(GITLAB_ISSUE_PAYLOAD).encode("utf-8")
+    headers = lower_headers(build_webhook_headers(platform_type, body, "secret"))
+    assert verify_webhook_secret(platform_type, headers, body, "secret")
+    assert not verify_webhook_secret(platform_type, headers, body, "other")
+    assert not verify_webhook_secret(platform_type, {}, body, "secret")
+    # 没有设置密钥时不校验
+    assert verify_webhook_secret(platform_type, {}, body, "")
+
+
+@pytest.mark.parametrize(
+    "platform_type, headers, payload, expected",
+    [
+        (GitlabClient.name, {}, GITLAB_ISSUE_PAYLOAD, True),
+        (GitlabClient.name, {}, {"object_kind": "push", "event_name": "push"}, False),
+        (GithubClient.name, {"x-github-event": "issues"}, GITHUB_ISSUE_PAYLOAD, True),
+        (
+            GithubClient.name,
+            {"x-github-event": "issues"},
+            {**GITHUB_ISSUE_PAYLOAD, "action": "reopened"},
+            False,
+        ),
+        (GithubClient.name, {"x-github-event": "push"}, GITHUB_ISSUE_PAYLOAD, False),
+    ],
+)
+def test_parse_webhook_event(
+    platform_type: str, headers: dict[str, str], payload: dict, expected: bool
+):
+    event = parse_webhook_event(
+        platform_type, headers, json.dumps(payload).encode("utf-8")
+    )
+    assert (event is not None) == expected
+    if event is not None:
+        assert event.payload == payload
+        assert event.platform_type == platform_type
+
+
+@pytest.mark.parametrize("body", [b"not json", b"[]"])
+def test_parse_invalid_webhook(body: bytes):
+    with pytest.raises(WebhookRequestError) as context:
+        parse_webhook_event(GitlabClient.name, {}, body)
+    assert context.value.status_code == HTTPStatus.BAD_REQUEST
+
+
+class TestWebhookServer:
+    def test_fake_webhook_sender(self):
+        """启动服务后用本地的模拟发送方发送webhook，
+        事件按接收顺序由同一个worker处理"""
+        handled_events: list[WebhookEvent] = []
+
+        def handler(events: list[WebhookEvent]) -> list:
+            handled_events.extend(events)
+            return []
+
+        async def run() -> list[int]:
+            webhook_server = WebhookServer(
+                GitlabClient.name, handler, "secret", EventCoalescer(20, 0)
+            )
+            server = await webhook_server.start("127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            url = f"http://127.0.0.1:{port}{WEBHOOK_PATH}"
+            worker = asyncio.create_task(webhook_server.worker())
+            status_codes: list[int] = []
+            for payload, secret in [
+                ({**GITLAB_ISSUE_PAYLOAD, "id": 1}, "secret"),
+                ({"object_kind": "push", "event_name": "push"}, "secret"),
+                ({**GITLAB_ISSUE_PAYLOAD, "id": 2}, "wrong"),
+                ({**GITLAB_ISSUE_PAYLOAD, "id": 3}, "secret"),
+            ]:
+                response = await asyncio.to_thread(
+                    send_webhook, url, GitlabClient.name, payload, secret
+                )
+                status_codes.append(response.status_code)
+            async with httpx.AsyncClient() as client:
+                status_codes.append(
+                    (await client.get(f"http://127.0.0.1:{port}/other")).status_code
+                )
+                status_codes.append((await client.get(url)).status_code)
+                await webhook_server.queue.join()
+                health = await client.get(f"http://127.0.0.1:{port}/health")
+                assert health.json() == {"queued": 0, "processed": 2}
+            worker.cancel()
+            server.close()
+            await server.wait_closed()
+            return status_codes
+
+        assert asyncio.run(run()) == [
+            HTTPStatus.ACCEPTED,
+            HTTPStatus.OK,
+            HTTPStatus.UNAUTHORIZED,
+            HTTPStatus.ACCEPTED,
+            HTTPStatus.NOT_FOUND,
+            HTTPStatus.METHOD_NOT_ALLOWED,
+        ]
+        assert [event.payload["id"] for event in handled_events] == [1, 3]
+
+    def test_worker_continue_after_failure(self):
+        handler = MagicMock(side_effect=[Exception("error"), []])
+
+        async def run():
+            webhook_server = WebhookServer(
+                GitlabClient.name, handler, coalescer=EventCoalescer(1, 0)
+            )
+            for _ in range(2):
+                webhook_server.queue.put_nowait(
+                    WebhookEvent(GitlabClient.name, GITLAB_ISSUE_PAYLOAD)
+                )
+            worker = asyncio.create_task(webhook_server.worker())
+            await webhook_server.queue.join()
+            worker.cancel()
+            return webhook_server.processed_count
+
+        assert asyncio.run(run()) == 2
+        assert handler.call_count == 2
+
+    def test_coalesce_events(self):
+        """短时间内连续到达的事件合并成一批处理"""
+        handler = MagicMock(return_value=[])
+
+        async def run():
+            webhook_server = WebhookServer(
+                GitlabClient.name, handler, coalescer=EventCoalescer(3, 0.1)
+            )
+            worker = asyncio.create_task(webhook_server.worker())
+            for index in range(5):
+                webhook_server.queue.put_nowait(
+                    WebhookEvent(GitlabClient.name, GITLAB_ISSUE_PAYLOAD, str(index))
+                )
+            await webhook_server.queue.join()
+            worker.cancel()
+            return webhook_server.processed_count
+
+        assert asyncio.run(run()) == 5
+        assert [
+            [event.delivery_id for event in call.args[0]]
+            for call in handler.call_args_list
+        ] == [["0", "1", "2"], ["3", "4"]]
+
+
+class TestEventCoalescer:
+    def test_window(self):
+        """窗口结束后到达的事件进入下一批"""
+
+        async def run() -> list[list[int]]:
+            queue: asyncio.Queue[int] = asyncio.Queue()
+            coalescer = EventCoalescer(10, 0.05)
+
+            async def produce():
+                queue.put_nowait(1)
+                await asyncio.sleep(0.01)
+                queue.put_nowait(2)
+                await asyncio.sleep(0.2)
+                queue.put_nowait(3)
+
+            producer = asyncio.create_task(produce())
+            batches = [await coalescer.next_batch(queue) for _ in range(2)]
+            await producer
+            return batches
+
+        assert asyncio.run(run()) == [[1, 2], [3]]
+
+    def test_max_count(self):
+        async def run() -> list[int]:
+            queue: asyncio.Queue[int] = asyncio.Queue()
+            for index in range(5):
+                queue.put_nowait(index)
+            return await EventCoalescer(2, 10).next_batch(queue)
+
+        assert asyncio.run(run()) == [0, 1]
+
+
+class TestWebhookEventProcessor:
+    @pytest.fixture
+    def processor(self):
+        config = MagicMock()
+        platform = MagicMock()
+        post_archive = MagicMock()
+        with patch("webhook_server.ArchiveDocument") as mock_archive_document:
+            processor = WebhookEventProcessor(config, platform, post_archive)
+            processor.mock_archive_document = mock_archive_document
+            yield processor
+
+    @staticmethod
+    def create_issue_info(issue_id: int) -> IssueInfo:
+        issue_info = IssueInfo(issue_id=issue_id, platform_type=GitlabClient.name)
+        issue_info.links.issue_url = f"https://example.com/issues/{issue_id}"
+        issue_info.links.comment_url = f"https://example.com/issues/{issue_id}/notes"
+        return issue_info
+
+    @staticmethod
+    def create_events(issue_ids: list[int]) -> list[WebhookEvent]:
+        return [
+            WebhookEvent(
+                GitlabClient.name,
+                {
+                    **GITLAB_ISSUE_PAYLOAD,
+                    "object_attributes": {"iid": issue_id, "action": "close"},
+                },
+            )
+            for issue_id in issue_ids
+        ]
+
+    def init_issue_info(self, _platform, payload: dict) -> IssueInfo:
+        return self.create_issue_info(payload["object_attributes"]["iid"])
+
+    def test_archived(self, processor: WebhookEventProcessor):
+        """一批事件只写入和推送一次归档文件，同一个issue只归档一次"""
+
+        def write_issue_to_document(issue_info: IssueInfo, *_args) -> str:
+            issue_info.set_archived_success()
+            return ArchiveStatus.archived
+
+        with patch(
+            "webhook_server.IssueProcessor.init_issue_info_by_webhook_payload",
+            side_effect=self.init_issue_info,
+        ), patch(
+            "batch_archiving.prepare_issue_info", return_value=ArchiveStatus.pending
+        ), patch(
+            "batch_archiving.write_issue_to_document",
+            side_effect=write_issue_to_document,
+        ) as mock_write:
+            results = processor(self.create_events([1, 2, 1, 3]))
+        assert [result["issue_id"] for result in results] == [1, 2, 3]
+        assert mock_write.call_count == 3
+        processor.mock_archive_document.return_value.save.assert_called_once()
+        processor.post_archive.assert_called_once()
+        archived_issue_infos = processor.post_archive.call_args.args[0]
+        assert [issue_info.issue_id for issue_info in archived_issue_infos] == [1, 2, 3]
+        assert all(
+            issue_info.should_document_changed() for issue_info in archived_issue_infos
+        )
+
+    def test_skipped(self, processor: WebhookEventProcessor):
+        with patch(
+            "webhook_server.IssueProcessor.init_issue_info_by_webhook_payload",
+            side_effect=self.init_issue_info,
+        ), patch(
+            "batch_archiving.prepare_issue_info",
+            return_value=ArchiveStatus.not_archived_object,
+        ):
+            results = processor(self.create_events([1]))
+        assert results[0]["status"] == ArchiveStatus.not_archived_object
+        processor.mock_archive_document.return_value.save.assert_not_called()
+        processor.post_archive.assert_not_called()
+
+    def test_archive_failed(self, processor: WebhookEventProcessor):
+        """单个issue归档失败时告警，其他issue依然归档"""
+
+        def prepare_issue_info(issue_info: IssueInfo, *_args) -> str:
+            if issue_info.issue_id == 1:
+                raise ArchiveVersionError("error")
+            return ArchiveStatus.pending
+
+        def write_issue_to_document(issue_info: IssueInfo, *_args) -> str:
+            issue_info.set_archived_success()
+            return ArchiveStatus.archived
+
+        with patch(
+            "webhook_server.IssueProcessor.init_issue_info_by_webhook_payload",
+            side_effect=self.init_issue_info,
+        ), patch(
+            "batch_archiving.prepare_issue_info", side_effect=prepare_issue_info
+        ), patch(
+            "batch_archiving.write_issue_to_document",
+            side_effect=write_issue_to_document,
+        ):
+            results = processor(self.create_events([1, 2]))
+        assert [result["status"] for result in results] == [
+            ArchiveStatus.failed,
+            ArchiveStatus.archived,
+        ]
+        processor.platform.reopen_issue.assert_called_once()
+        processor.platform.send_comment.assert_called_once()
+        assert [
+            issue_info.issue_id
+            for issue_info in processor.post_archive.call_args.args[0]
+        ] == [2]
+
+    def test_invalid_payload(self, processor: WebhookEventProcessor):
+        with patch(
+            "webhook_server.IssueProcessor.init_issue_info_by_webhook_payload",
+            side_effect=KeyError("issue"),
+        ):
+            assert processor(self.create_events([1])) == []
+        processor.mock_archive_document.assert_not_called()
+
@@ -0,0 +1,87 @@
+import os
+import sys
+import hmac
+import json
+import uuid
+import hashlib
+from pathlib import Path
+
+import httpx
+
+
+# 本地调试webhook_server.py用的脚本，
+# 不属于归档流程范围内，所以log信息没有放到shared.log里
+class Log:
+    payload_not_found = """未在命令行参数中获取到webhook内容文件，请使用"-f"或"--file"参数传入json文件路径"""
+    send_webhook = """正在向 {url} 发送 {platform_type} webhook"""
+    send_webhook_done = """webhook服务返回：{status_code} {content}"""
+
+
+DEFAULT_URL = "http://127.0.0.1:8080/webhook"
+
+
+def get_value_from_args(short_arg: str, long_arg: str) -> str | None:
+    argv = sys.argv
+    result = None
+    if long_arg in argv:
+        result = argv[argv.index(long_arg) + 1]
+    if short_arg in argv:
+        result = argv[argv.index(short_arg) + 1]
+    return result
+
+
+def build_webhook_headers(
+    platform_type: str, body: bytes, secret: str
+) -> dict[str, str]:
+    """模拟平台发送webhook时携带的请求头"""
+    headers = {"Content-Type": "application/json"}
+    if platform_type == "gitlab":
+        headers["X-Gitlab-Event"] = "Issue Hook"
+        headers["X-Gitlab-Event-UUID"] = str(uuid.uuid4())
+        if secret != "":
+            headers["X-Gitlab-Token"] = secret
+    else:
+        headers["X-GitHub-Event"] = "issues"
+        headers["X-GitHub-Delivery"] = str(uuid.uuid4())
+        if secret != "":
+            headers["X-Hub-Signature-256"] = (
+                "sha256="
+                + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            )
+    return headers
+
+
+def send_webhook(
+    url: str, platform_type: str, payload: dict, secret: str = ""
+) -> httpx.Response:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return httpx.post(
+        url, content=body, headers=build_webhook_headers(platform_type, body, secret)
+    )
+
+
+def main():
+    payload_file = get_value_from_args(short_arg="-f", long_arg="--file")
+    if payload_file is None:
+        print(Log.payload_not_found)
+        return
+    url = get_value_from_args(short_arg="-u", long_arg="--url") or DEFAULT_URL
+    platform_type = (
+        get_value_from_args(short_arg="-pt", long_arg="--platform-type") or "gitlab"
+    )
+    print(Log.send_webhook.format(url=url, platform_type=platform_type))
+    response = send_webhook(
+        url,
+        platform_type,
+        json.loads(Path(payload_file).read_text(encoding="utf-8")),
+        os.environ.get("WEBHOOK_SECRET", ""),
+    )
+    print(
+        Log.send_webhook_done.format(
+            status_code=response.status_code, content=response.text
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+import os
+import hmac
+import json
+import time
+import asyncio
+import hashlib
+from http import HTTPStatus
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from issue_processor.git_service_client import (
+    GitServiceClient,
+    GithubClient,
+    GitlabClient,
+)
+from issue_processor.issues_processor import IssueProcessor
+from auto_archiving.archive_document import ArchiveDocument
+from shared.config_manager import ConfigManager
+from shared.config_data_source import EnvConfigDataSource, JsonConfigDataSource
+from shared.issue_info import IssueInfo
+from shared.json_config import Config
+from shared.json_dumps import json_dumps
+from shared.env import Env, should_run_in_local
+from shared.get_args import get_value_from_args
+from shared.log import Log
+from shared.event_coalescer import EventCoalescer
+from shared.exception import WebhookRequestError
+from batch_archiving import BatchResultJson, archive_issues
+from pipeline import run_push_stage, run_success_stage, save_archive_document
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+WEBHOOK_PATH = "/webhook"
+HEALTH_PATH = "/health"
+MAX_BODY_SIZE = 1024 * 1024
+"""issue webhook的内容通常只有几十KB"""
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_BATCH_WINDOW = 5.0
+"""收到第一个事件后等待更多事件合并成一次提交的秒数"""
+
+WEBHOOK_CI_EVENT_TYPE = {GithubClient.name: "issues", GitlabClient.name: "trigger"}
+"""webhook服务处理的事件等同于由issue事件触发的流水线"""
+
+
+@dataclass
+class WebhookEvent:
+    platform_type: str
+    payload: dict[str, Any]
+    delivery_id: str = str()
+
+
+def verify_webhook_secret(
+    platform_type: str, headers: dict[str, str], body: bytes, secret: str
+) -> bool:
+    """gitlab在 X-Gitlab-Token 中原样发送密钥：
+    https://docs.gitlab.com/ee/user/project/integrations/webhooks.html#validate-payloads-by-using-a-secret-token \n
+    github在 X-Hub-Signature-256 中发送请求内容的HMAC签名：
+    https://docs.github.com/zh/webhooks/using-webhooks/validating-webhook-deliveries
+    """
+    if secret == "":
+        return True
+    if platform_type == GitlabClient.name:
+        return hmac.compare_digest(headers.get("x-gitlab-token", ""), secret)
+    signature = (
+        "sha256="
+        + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    )
+    return hmac.compare_digest(headers.get("x-hub-signature-256", ""), signature)
+
+
+def parse_webhook_event(
+    platform_type: str, headers: dict[str, str], body: bytes
+) -> WebhookEvent | None:
+    """解析webhook内容，不需要归档的事件返回None"""
+    try:
+        payload: dict[str, Any] = json.loads(body)
+    except ValueError:
+        raise WebhookRequestError(HTTPStatus.BAD_REQUEST, Log.webhook_payload_not_found)
+    if not isinstance(payload, dict):
+        raise WebhookRequestError(HTTPStatus.BAD_REQUEST, Log.webhook_payload_not_found)
+
+    if platform_type == GitlabClient.name:
+        if not GitlabClient.should_issue_type_webhook_payload(payload):
+            return None
+        delivery_id = headers.get("x-gitlab-event-uuid", "")
+    else:
+        # 与github流水线一致，只处理issue关闭事件
+        if headers.get("x-github-event") != "issues" or payload.get("action") != (
+            "closed"
+        ):
+            print(Log.other_type_webhook_detected)
+            return None
+        print(Log.issue_type_webhook_detected)
+        delivery_id = headers.get("x-github-delivery", "")
+    return WebhookEvent(platform_type, payload, delivery_id)
+
+
+class WebhookEventProcessor:
+    """在同一个进程内按顺序处理一批webhook事件，
+    一批事件按接收顺序写入同一个归档文件，只写入和推送一次，
+    每个issue依然单独发送归档成功评论。\n
+    配置和平台客户端（连接池、HTTP缓存、请求预算）在各批事件之间复用，
+    归档文件在各批事件之间可能被推送流程或者其他人修改过，
+    所以每批事件都重新读取文件末尾，索引根据文件大小和修改时间复用，
+    读取的代价与归档文件长度无关
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        platform: GitServiceClient,
+        post_archive: Callable[[list[IssueInfo]], None] | None = None,
+    ):
+        self.config = config
+        self.platform = platform
+        self.post_archive = post_archive
+        """归档成功后执行的推送文档和发送归档成功评论流程"""
+
+    def init_issue_infos(self, events: list[WebhookEvent]) -> list[IssueInfo]:
+        """同一个issue在一批事件中出现多次时（例如关闭后又重新打开），
+        只保留最后一次事件，位置以第一次出现的位置为准"""
+        issue_infos: dict[tuple[str, int], IssueInfo] = {}
+        for event in events:
+            try:
+                issue_info = IssueProcessor.init_issue_info_by_webhook_payload(
+                    self.platform, event.payload
+                )
+            except Exception as exc:
+                print(
+                    Log.webhook_event_failed.format(
+                        delivery_id=event.delivery_id, exc=repr(exc)
+                    )
+                )
+                continue
+            issue_infos[(issue_info.issue_repository, issue_info.issue_id)] = (
+                issue_info
+            )
+        return list(issue_infos.values())
+
+    def __call__(self, events: list[WebhookEvent]) -> list[BatchResultJson]:
+        issue_infos = self.init_issue_infos(events)
+        if len(issue_infos) == 0:
+            return []
+        archive_document = ArchiveDocument()
+        archive_document.file_load_tail(
+            self.config.archived_document_path,
+            self.config.archived_document.table_separator,
+        )
+        results = archive_issues(
+            issue_infos, self.platform, self.config, archive_document
+        )
+        archived_issue_infos = [
+            issue_info
+            for issue_info in issue_infos
+            if issue_info.should_archived_success()
+        ]
+        if len(archived_issue_infos) == 0:
+            return results
+
+        save_archive_document(
+            archive_document, archived_issue_infos, self.config.archived_document_path
+        )
+        if self.post_archive is not None:
+            self.post_archive(archived_issue_infos)
+        return results
+
+
+def run_post_archive_stages(issue_infos: list[IssueInfo]) -> None:
+    """与流水线的第二步和第三步一致：
+    将这一批issue的归档内容合并成一次提交推送，然后发送归档成功评论"""
+    run_push_stage(issue_infos)
+    run_success_stage(issue_infos, os.environ[Env.TOKEN])
+
+
+class WebhookServer:
+    """接收issue webhook的asyncio http服务，
+    收到的事件放入队列后立即响应，由一个worker把短时间内连续到达的事件
+    合并成一批按顺序处理，处理过程是同步的，在线程中执行以免阻塞接收新的webhook
+    """
+
+    def __init__(
+        self,
+        platform_type: str,
+        handler: Callable[[list[WebhookEvent]], list[BatchResultJson]],
+        secret: str = "",
+        coalescer: EventCoalescer[WebhookEvent] | None = None,
+    ):
+        self.platform_type = platform_type
+        self.handler = handler
+        self.secret = secret
+        self.coalescer: EventCoalescer[WebhookEvent] = (
+            coalescer if coalescer is not None else EventCoalescer()
+        )
+        self.queue: asyncio.Queue[WebhookEvent] = asyncio.Queue()
+        self.processed_count: int = 0
+
+    async def read_request(
+        self, reader: asyncio.StreamReader
+    ) -> tuple[str, str, dict[str, str], bytes]:
+        try:
+            request_line = (await reader.readline()).decode("latin-1")
+            method, path, _ = request_line.split(" ", 2)
+            headers: dict[str, str] = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            content_length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise WebhookRequestError(HTTPStatus.BAD_REQUEST, Log.webhook_bad_request)
+        if content_length < 0:
+            raise WebhookRequestError(HTTPStatus.BAD_REQUEST, Log.webhook_bad_request)
+        if content_length > MAX_BODY_SIZE:
+            raise WebhookRequestError(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE, Log.webhook_bad_request
+            )
+        body = await reader.readexactly(content_length)
+        return method, path.split("?")[0], headers, body
+
+    def handle_request(
+        self, method: str, path: str, headers: dict[str, str], body: bytes
+    ) -> tuple[int, dict[str, Any]]:
+        if path == HEALTH_PATH and method == "GET":
+            return HTTPStatus.OK, {
+                "queued": self.queue.qsize(),
+                "processed": self.processed_count,
+            }
+        if path != WEBHOOK_PATH:
+            raise WebhookRequestError(HTTPStatus.NOT_FOUND, Log.webhook_bad_request)
+        if method != "POST":
+            raise WebhookRequestError(
+                HTTPStatus.METHOD_NOT_ALLOWED, Log.webhook_bad_request
+            )
+        if not verify_webhook_secret(self.platform_type, headers, body, self.secret):
+            raise WebhookRequestError(
+                HTTPStatus.UNAUTHORIZED, Log.webhook_secret_mismatch
+            )
+        event = parse_webhook_event(self.platform_type, headers, body)
+        if event is None:
+            return HTTPStatus.OK, {"status": "ignored"}
+        self.queue.put_nowait(event)
+        print(
+            Log.webhook_event_queued.format(
+                delivery_id=event.delivery_id, queued=self.queue.qsize()
+            )
+        )
+        return HTTPStatus.ACCEPTED, {"status": "queued"}
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            try:
+                status_code, content = self.handle_request(
+                    *await self.read_request(reader)
+                )
+            except WebhookRequestError as exc:
+                status_code, content = exc.status_code, {"error": str(exc)}
+            except asyncio.IncompleteReadError:
+                return
+            body = json.dumps(content, ensure_ascii=False).encode("utf-8")
+            writer.write(
+                (
+                    f"HTTP/1.1 {status_code} {HTTPStatus(status_code).phrase}\r\n"
+                    "Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    "Connection: close\r\n\r\n"
+                ).encode("latin-1")
+                + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def worker(self) -> None:
+        while True:
+            events = await self.coalescer.next_batch(self.queue)
+            delivery_ids = ", ".join(event.delivery_id for event in events)
+            print(
+                Log.webhook_batch_start.format(
+                    count=len(events), delivery_ids=delivery_ids
+                )
+            )
+            start_time = time.time()
+            try:
+                results = await asyncio.to_thread(self.handler, events)
+                print(
+                    Log.webhook_batch_done.format(
+                        summary=json_dumps(results),
+                        time="{:.4f}".format(time.time() - start_time),
+                    )
+                )
+            except Exception as exc:
+                # 一批事件处理失败不应该让服务停止
+                print(
+                    Log.webhook_event_failed.format(
+                        delivery_id=delivery_ids, exc=repr(exc)
+                    )
+                )
+            finally:
+                self.processed_count += len(events)
+                for _ in events:
+                    self.queue.task_done()
+
+    async def start(self, host: str, port: int) -> asyncio.Server:
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(
+            Log.webhook_server_started.format(
+                address=", ".join(
+                    str(sock.getsockname()) for sock in server.sockets
+                ),
+                path=WEBHOOK_PATH,
+            )
+        )
+        return server
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await self.start(host, port)
+        worker = asyncio.create_task(self.worker())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            worker.cancel()
+
+
+def main() -> None:
+    if should_run_in_local():
+        print(Log.non_platform_action_env)
+        from dotenv import load_dotenv
+
+        load_dotenv()
+
+    test_platform_type = get_value_from_args(
+        short_arg="-pt",
+        long_arg="--platform-type",
+    )
+    config_path = get_value_from_args(
+        short_arg="-c",
+        long_arg="--config",
+    )
+    host = get_value_from_args(short_arg="-H", long_arg="--host") or DEFAULT_HOST
+    port = int(
+        get_value_from_args(short_arg="-p", long_arg="--port") or DEFAULT_PORT
+    )
+    batch_size = int(
+        get_value_from_args(short_arg="-bs", long_arg="--batch-size")
+        or DEFAULT_BATCH_SIZE
+    )
+    batch_window = float(
+        get_value_from_args(short_arg="-bw", long_arg="--batch-window")
+        or DEFAULT_BATCH_WINDOW
+    )
+
+    if config_path is None:
+        print(Log.config_path_not_found)
+        return
+
+    config = IssueProcessor.init_config(
+        ConfigManager([EnvConfigDataSource(), JsonConfigDataSource(config_path)])
+    )
+    platform = IssueProcessor.init_git_service_client(test_platform_type, config)
+    # .env中可能配置的是手动流水线，webhook服务处理的都是issue事件
+    os.environ[Env.CI_EVENT_TYPE] = WEBHOOK_CI_EVENT_TYPE[platform.name]
+
+    secret = os.environ.get(Env.WEBHOOK_SECRET, "")
+    if secret == "":
+        print(Log.webhook_secret_not_set)
+
+    webhook_server = WebhookServer(
+        platform.name,
+        WebhookEventProcessor(config, platform, run_post_archive_stages),
+        secret,
+        EventCoalescer(batch_size, batch_window),
+    )
+    try:
+        asyncio.run(webhook_server.serve(host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        platform.close()
+        print(Log.job_done)
+
+
+if __name__ == "__main__":
+    main()